@@ -1,6 +1,8 @@
+import collections
+import functools
+
 import pyrogue as pr
 import numpy as np
-import sympy
 
 class SaAmplifier(pr.Device):
     def __init__(self, **kwargs):
@@ -260,88 +262,48 @@ class FEAmplifier3(SaAmplifier):
 
         return vin
 
-class FEAmplifier4(SaAmplifier):
-    _model_ready = False
-
-    @classmethod
-    def _init_circuit_model(cls):
-        if cls._model_ready:
-            return
-
-        # --- Symbols: bias network ---
-        cls.sa_bias_out_p = sympy.symbols('sa_bias_out_p')
-        cls.sa_bias_out_n = sympy.symbols('sa_bias_out_n')
-
-        # --- Symbols: signal path nodes ---
-        cls.sa_signal_out0_p = sympy.symbols('sa_signal_out0_p')
-        cls.sa_signal_out0_n = sympy.symbols('sa_signal_out0_n')
-        cls.sa_signal_out2_p = sympy.symbols('sa_signal_out2_p')
-        cls.sa_signal_out2_n = sympy.symbols('sa_signal_out2_n')
-        cls.sa_signal_out3_p = sympy.symbols('sa_signal_out3_p')
-        cls.sa_signal_out3_n = sympy.symbols('sa_signal_out3_n')
-        cls.sa_offset_p = sympy.symbols('sa_offset_p')
-        cls.sa_offset_n = sympy.symbols('sa_offset_n')
-
-        # --- Symbols: resistors ---
-        cls.rf1 = sympy.symbols('rf1')
-        cls.rg1 = sympy.symbols('rg1')
-        cls.rf2 = sympy.symbols('rf2')
-        cls.rgnd2 = sympy.symbols('rgnd2')
-        cls.roff2 = sympy.symbols('roff2')
-        cls.rf3 = sympy.symbols('rf3')
-        cls.rg3 = sympy.symbols('rg3')
-        cls.v = sympy.symbols('v')
-
-        # --- Equations: Stage 1 instrumentation amp ---
-        eq1 = sympy.Eq((cls.sa_signal_out0_p - cls.sa_bias_out_p) / cls.rf1,
-                        (cls.sa_bias_out_p - cls.sa_bias_out_n) / cls.rg1)
-        eq2 = sympy.Eq((cls.sa_signal_out0_n - cls.sa_bias_out_n) / cls.rf1,
-                        (cls.sa_bias_out_n - cls.sa_bias_out_p) / cls.rg1)
-
-        # --- Equations: Stage 2 offset summing amp ---
-        eq3 = sympy.Eq((cls.sa_signal_out2_p - cls.sa_signal_out0_p) / cls.rf2,
-                        cls.sa_signal_out0_p / cls.rgnd2 + (cls.sa_signal_out0_p - cls.sa_offset_p) / cls.roff2)
-        eq4 = sympy.Eq((cls.sa_signal_out2_n - cls.sa_signal_out0_n) / cls.rf2,
-                        cls.sa_signal_out0_n / cls.rgnd2 + (cls.sa_signal_out0_n - cls.sa_offset_n) / cls.roff2)
-
-        # --- Equations: Stage 3 differential output amp ---
-        eq5 = sympy.Eq((cls.sa_signal_out2_p - cls.v) / cls.rg3,
-                        (cls.v - cls.sa_signal_out3_n) / cls.rf3)
-        eq6 = sympy.Eq((cls.sa_signal_out2_n - cls.v) / cls.rg3,
-                        (cls.v - cls.sa_signal_out3_p) / cls.rf3)
-
-        eqs = [eq1, eq2, eq3, eq4, eq5, eq6]
-
-        # --- Solve: inverse (output → input) ---
-        inv_vars = [cls.sa_bias_out_p, cls.sa_bias_out_n,
-                    cls.sa_signal_out0_p, cls.sa_signal_out0_n,
-                    cls.sa_signal_out2_p, cls.sa_signal_out2_n]
-        solutions = sympy.solve(eqs, inv_vars)
-        cls.sa_bias_expr = sympy.simplify(solutions[cls.sa_bias_out_p] - solutions[cls.sa_bias_out_n])
-
-        # --- Solve: forward (input → output) ---
-        fwd_vars = [cls.sa_bias_out_p, cls.sa_bias_out_n,
-                    cls.sa_signal_out0_p, cls.sa_signal_out0_n,
-                    cls.sa_signal_out2_p, cls.sa_signal_out2_n,
-                    cls.sa_signal_out3_p, cls.sa_signal_out3_n]
-        solutions2 = sympy.solve(eqs, list(reversed(fwd_vars)))
-
-        # --- Gain expressions ---
-        out3 = sympy.simplify(solutions2[cls.sa_signal_out3_p] - solutions2[cls.sa_signal_out3_n])
-        out2 = sympy.simplify(solutions2[cls.sa_signal_out2_p] - solutions2[cls.sa_signal_out2_n])
-        out1 = sympy.simplify(solutions2[cls.sa_signal_out0_p] - solutions2[cls.sa_signal_out0_n])
-
-        unity_input = {cls.sa_bias_out_p: .5, cls.sa_bias_out_n: -.5, cls.sa_offset_p: 0, cls.sa_offset_n: 0}
-        cls.gain3_expr = (out3 / out2).subs(unity_input)
-        cls.gain2_expr = (out2 / out1).subs(unity_input)
-        cls.gain1_expr = out1.subs(unity_input)
-        cls.offset_gain_expr = out3.subs({cls.sa_bias_out_p: 0, cls.sa_bias_out_n: 0,
-                                          cls.sa_offset_p: .5, cls.sa_offset_n: -.5})
-
-        cls._model_ready = True
+class _CircuitModel(collections.namedtuple('_CircuitModel', ['gain1', 'gain2', 'gain3', 'offsetGain'])):
+    """ Differential gains of a linear three stage SA amplifier chain.
+        offsetGain is the ADC voltage for a differential offset voltage of 1V.
+    """
+
+    def ampVin(self, vadc, voffsetP):
+        """ SA input voltage for an ADC voltage and a positive offset DAC voltage, which drives the offset
+            differentially (voffsetN = -voffsetP). vadc and voffsetP can be scalars or arrays.
+        """
+        vadc = np.asarray(vadc, np.float64)
+        voffsetP = np.asarray(voffsetP, np.float64)
+        ret = (vadc - self.offsetGain * 2.0 * voffsetP) / (self.gain1 * self.gain2 * self.gain3)
+        return float(ret) if ret.ndim == 0 else ret
+
+
+@functools.lru_cache(maxsize=64)
+def _feAmplifier4Model(rf1, rg1, rf2, rgnd2, roff2, rf3, rg3):
+    """ Closed form solution of the FEAmplifier4 node equations, per side (p shown):
+        Stage 1 instrumentation amp: (out0_p - bias_p) / rf1 = (bias_p - bias_n) / rg1
+        Stage 2 offset summing amp:  (out2_p - out0_p) / rf2 = out0_p / rgnd2 + (out0_p - offset_p) / roff2
+        Stage 3 differential amp:    (out2_p - v) / rg3 = (v - out3_n) / rf3
+    """
+    gain1 = 1.0 + 2.0 * rf1 / rg1
+    gain2 = 1.0 + rf2 / rgnd2 + rf2 / roff2
+    gain3 = rf3 / rg3
+    return _CircuitModel(gain1, gain2, gain3, -gain3 * rf2 / roff2)
+
+
+@functools.lru_cache(maxsize=64)
+def _awaXeLnaModel(lnaGain, rf2, roff2, rf3, rg3):
+    """ Closed form solution of the AwaXeLna node equations, per side (p shown):
+        Stage 1 LNA:        lna_out_p = sa_signal_p * lnaGain
+        Stage 2 offset amp: (offset_out_p - lna_out_p) / rf2 = (lna_out_p - sa_offset_p) / roff2
+        Stage 3 ADC amp:    (offset_out_p - v) / rg3 = (v - adc_n) / rf3
+    """
+    gain2 = 1.0 + rf2 / roff2
+    gain3 = rf3 / rg3
+    return _CircuitModel(lnaGain, gain2, gain3, -gain3 * rf2 / roff2)
+
 
+class FEAmplifier4(SaAmplifier):
     def __init__(self, **kwargs):
-        self._init_circuit_model()
         super().__init__(**kwargs)
 
         self.add(pr.LocalVariable(
@@ -409,27 +371,14 @@ class FEAmplifier4(SaAmplifier):
             self.RG3]
 
         def setConversions():
-            resistors = {
-                self.rf1: self.RF1.value(),
-                self.rg1: self.RG1.value(),
-                self.rf2: self.RF2.value(),
-                self.rgnd2: self.RGND2.value(),
-                self.roff2 : self.ROFF2.value(),
-                self.rf3: self.RF3.value(),
-                self.rg3: self.RG3.value()}
-
-            self.sa_bias_func = sympy.lambdify([self.sa_signal_out3_p, self.sa_signal_out3_n, self.sa_offset_p, self.sa_offset_n],
-                                               self.sa_bias_expr.subs(resistors),
-                                               'numpy')
-
-            g3=  self.gain3_expr.subs(resistors)
-            g2=  self.gain2_expr.subs(resistors)
-            g1=  self.gain1_expr.subs(resistors)
-
-            self.gain3_func = sympy.lambdify([], self.gain3_expr.subs(resistors), 'numpy')
-            self.gain2_func = sympy.lambdify([], self.gain2_expr.subs(resistors), 'numpy')
-            self.gain1_func = sympy.lambdify([], self.gain1_expr.subs(resistors), 'numpy')
-            self.offset_gain_func = sympy.lambdify([], self.offset_gain_expr.subs(resistors), 'numpy')
+            self._circuit = _feAmplifier4Model(
+                self.RF1.value(),
+                self.RG1.value(),
+                self.RF2.value(),
+                self.RGND2.value(),
+                self.ROFF2.value(),
+                self.RF3.value(),
+                self.RG3.value())
             return 0
 
         setConversions()
@@ -448,7 +397,7 @@ class FEAmplifier4(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.gain1_func()))
+            linkedGet = lambda read: self._circuit.gain1))
 
         self.add(pr.LinkVariable(
             name = 'GAIN_2',
@@ -456,7 +405,7 @@ class FEAmplifier4(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.gain2_func()))
+            linkedGet = lambda read: self._circuit.gain2))
 
         self.add(pr.LinkVariable(
             name = 'GAIN_3',
@@ -464,7 +413,7 @@ class FEAmplifier4(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.gain3_func()))
+            linkedGet = lambda read: self._circuit.gain3))
 
         self.add(pr.LinkVariable(
             name = 'OFFSET_GAIN',
@@ -472,7 +421,7 @@ class FEAmplifier4(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.offset_gain_func()))
+            linkedGet = lambda read: self._circuit.offsetGain))
 
 
     def saBiasCurrent(self, saBiasDacVoltageP, saBiasDacVoltageN=0.0):
@@ -495,88 +444,13 @@ class FEAmplifier4(SaAmplifier):
 
 
     def ampVin(self, vadc, voffsetP, voffsetN=0.0):
-        ret = self.sa_bias_func(vadc/2, -vadc/2, voffsetP, -voffsetP)
-        return ret
+        return self._circuit.ampVin(vadc, voffsetP)
 
 class AwaXeLna(SaAmplifier):
-    _model_ready = False
-
-    @classmethod
-    def _init_circuit_model(cls):
-        if cls._model_ready:
-            return
-
-        # --- Symbols: signal path ---
-        cls.sa_signal_p = sympy.symbols('sa_signal_p')
-        cls.sa_signal_n = sympy.symbols('sa_signal_n')
-
-        # --- Symbols: LNA stage ---
-        cls.lna_out_p = sympy.symbols('lna_out_p')
-        cls.lna_out_n = sympy.symbols('lna_out_n')
-        cls.lna_gain = sympy.symbols('awaxe_lna_gain')
-
-        # --- Symbols: offset amp ---
-        cls.sa_offset_p = sympy.symbols('sa_offset_p')
-        cls.sa_offset_n = sympy.symbols('sa_offset_n')
-        cls.offset_out_p = sympy.symbols('offset_out_p')
-        cls.offset_out_n = sympy.symbols('offset_out_n')
-        cls.rf2 = sympy.symbols('rf2')
-        cls.roff2 = sympy.symbols('roff2')
-
-        # --- Symbols: ADC amp ---
-        cls.adc_p = sympy.symbols('adc_p')
-        cls.adc_n = sympy.symbols('adc_n')
-        cls.rf3 = sympy.symbols('rf3')
-        cls.rg3 = sympy.symbols('rg3')
-        cls.v = sympy.symbols('v')
-
-        # --- Equations: Stage 1 LNA ---
-        eq1 = sympy.Eq(cls.lna_out_p, cls.sa_signal_p * cls.lna_gain)
-        eq2 = sympy.Eq(cls.lna_out_n, cls.sa_signal_n * cls.lna_gain)
-
-        # --- Equations: Stage 2 offset amp ---
-        eq3 = sympy.Eq((cls.offset_out_p - cls.lna_out_p) / cls.rf2,
-                        (cls.lna_out_p - cls.sa_offset_p) / cls.roff2)
-        eq4 = sympy.Eq((cls.offset_out_n - cls.lna_out_n) / cls.rf2,
-                        (cls.lna_out_n - cls.sa_offset_n) / cls.roff2)
-
-        # --- Equations: Stage 3 ADC differential amp ---
-        eq5 = sympy.Eq((cls.offset_out_p - cls.v) / cls.rg3,
-                        (cls.v - cls.adc_n) / cls.rf3)
-        eq6 = sympy.Eq((cls.offset_out_n - cls.v) / cls.rg3,
-                        (cls.v - cls.adc_p) / cls.rf3)
-
-        eqs = [eq1, eq2, eq3, eq4, eq5, eq6]
-        solve_vars = [cls.sa_signal_p, cls.sa_signal_n,
-                      cls.lna_out_p, cls.lna_out_n,
-                      cls.offset_out_p, cls.offset_out_n,
-                      cls.adc_p, cls.adc_n]
-
-        # --- Solve: inverse (ADC → signal input) ---
-        solutions = sympy.solve(eqs, solve_vars)
-        cls.sa_bias_expr = sympy.simplify(solutions[cls.sa_signal_p] - solutions[cls.sa_signal_n])
-
-        # --- Solve: forward (signal input → ADC) ---
-        solutions2 = sympy.solve(eqs, list(reversed(solve_vars)))
-
-        adc_expr = sympy.simplify(solutions2[cls.adc_p] - solutions2[cls.adc_n])
-        offset_stage_expr = sympy.simplify(solutions2[cls.offset_out_p] - solutions2[cls.offset_out_n])
-        lna_expr = sympy.simplify(solutions2[cls.lna_out_p] - solutions2[cls.lna_out_n])
-
-        # --- Gain expressions ---
-        unity_input = {cls.sa_signal_p: .5, cls.sa_signal_n: -.5, cls.sa_offset_p: 0, cls.sa_offset_n: 0}
-        cls.gain3_expr = (adc_expr / offset_stage_expr).subs(unity_input)
-        cls.gain2_expr = (offset_stage_expr / lna_expr).subs(unity_input)
-        cls.offset_gain_expr = adc_expr.subs({cls.sa_signal_p: 0, cls.sa_signal_n: 0,
-                                              cls.sa_offset_p: .5, cls.sa_offset_n: -.5})
-
-        cls._model_ready = True
-
     def __init__(self, **kwargs):
         """AwaXe LNA amplifier chain consists of AwaXe LNA
         followed by a unity gain stage to allow offset subtraction
         followed by the ADC amplifier"""
-        self._init_circuit_model()
         super().__init__(**kwargs)
 
         self.add(pr.LocalVariable(
@@ -613,24 +487,12 @@ class AwaXeLna(SaAmplifier):
             self.RG3]
 
         def setConversions():
-            resistors = {
-                self.lna_gain: self.LNA_GAIN.value(),
-                self.rf2: self.RF2.value(),
-                self.roff2 : self.ROFF2.value(),
-                self.rf3: self.RF3.value(),
-                self.rg3: self.RG3.value()}
-
-            self.sa_bias_func = sympy.lambdify([self.adc_p, self.adc_n, self.sa_offset_p, self.sa_offset_n],
-                                               self.sa_bias_expr.subs(resistors),
-                                               'numpy')
-
-            g3=  self.gain3_expr.subs(resistors)
-            g2=  self.gain2_expr.subs(resistors)
-
-            self.gain3_func = sympy.lambdify([], self.gain3_expr.subs(resistors), 'numpy')
-            self.gain2_func = sympy.lambdify([], self.gain2_expr.subs(resistors), 'numpy')
-            self.gain1_func = lambda: self.LNA_GAIN.value()
-            self.offset_gain_func = sympy.lambdify([], self.offset_gain_expr.subs(resistors), 'numpy')
+            self._circuit = _awaXeLnaModel(
+                self.LNA_GAIN.value(),
+                self.RF2.value(),
+                self.ROFF2.value(),
+                self.RF3.value(),
+                self.RG3.value())
             return 0
 
         setConversions()
@@ -649,7 +511,7 @@ class AwaXeLna(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.gain1_func()))
+            linkedGet = lambda read: self._circuit.gain1))
 
         self.add(pr.LinkVariable(
             name = 'GAIN_2',
@@ -657,7 +519,7 @@ class AwaXeLna(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.gain2_func()))
+            linkedGet = lambda read: self._circuit.gain2))
 
         self.add(pr.LinkVariable(
             name = 'GAIN_3',
@@ -665,7 +527,7 @@ class AwaXeLna(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.gain3_func()))
+            linkedGet = lambda read: self._circuit.gain3))
 
         self.add(pr.LinkVariable(
             name = 'OFFSET_GAIN',
@@ -673,12 +535,11 @@ class AwaXeLna(SaAmplifier):
             mode = 'RO',
             disp = '{:0.3f}',
             dependencies = [self.Conv],
-            linkedGet = lambda read: self.offset_gain_func()))
+            linkedGet = lambda read: self._circuit.offsetGain))
 
 
     def ampVin(self, vadc, voffsetP, voffsetN=0.0):
-        ret = self.sa_bias_func(vadc/2, -vadc/2, voffsetP, -voffsetP)
-        return ret
+        return self._circuit.ampVin(vadc, voffsetP)
 
 
 class FastDacAmplifierSE(pr.Device):
@@ -761,6 +622,19 @@ class FastDacAmplifierSE(pr.Device):
             disp = '{:0.3f}',
             linkedGet = self.minCurrent))
 
+        # The conversions are affine in the DAC code. Their coefficients are cached
+        # against the circuit values they were computed from.
+        self._circuitVars = [self.FSADJ, self.Invert, self.LoadR, self.InputR, self.FbR, self.FilterR, self.ShuntR, self.CableR]
+        self._coefficients = (None, None)
+
+    def _coeffs(self):
+        """ Returns the cached (full scale output voltage, output resistance) """
+        key = tuple(v.value() for v in self._circuitVars)
+        cached, coeffs = self._coefficients
+        if cached != key:
+            coeffs = (self.IOUTFS.value() * self.LoadR.value() * self.gain(), self.rout())
+            self._coefficients = (key, coeffs)
+        return coeffs
 
     def gain(self):
         ret = self.FbR.value() / (self.InputR.value())
@@ -772,41 +646,26 @@ class FastDacAmplifierSE(pr.Device):
         return self.FilterR.value() + self.ShuntR.value() + self.CableR.value()
 
     def dacToOutVoltage(self, dac):
-        iOutFs = self.IOUTFS.value()
-        iOutA = (dac/16384) * iOutFs
-        iOutB = ((16383-dac)/16384) * iOutFs
-
-        gain = self.gain()
-        load = self.LoadR.value()
-
-        vin = [iOutA * load, iOutB * load]
-
-        vout = (vin[0] - vin[1]) * gain
-        return vout
+        """ Calculate output voltage. dac can be a scalar or an array """
+        # Difference of the two offset binary DAC output currents across the load, times the amplifier gain
+        full, _ = self._coeffs()
+        return (2.0 * np.asarray(dac, np.float64) - 16383.0) * (full / 16384.0)
 
     def dacToOutCurrent(self, dac):
-        """ Calculate output current in uA """
-        vout = self.dacToOutVoltage(dac)
-        iout = vout / self.rout()
-        return iout * 1e6
+        """ Calculate output current in uA. dac can be a scalar or an array """
+        full, rout = self._coeffs()
+        return (2.0 * np.asarray(dac, np.float64) - 16383.0) * (full / 16384.0 / rout * 1e6)
 
     def outVoltageToDac(self, voltage):
-        gain = self.gain()
-        load = self.LoadR.value()
-        ioutfs = self.IOUTFS.value()
-        vin = voltage / gain
-        iin = vin / load
-        iina = (iin + ioutfs) / 2 # Offset binary
-        dac =  int((iina / ioutfs) * 16384)
-        if dac > 16383:
-            dac = 16383
-        if dac < 0:
-            dac = 0
-        return int(dac)
+        """ Calculate DAC code for an output voltage. voltage can be a scalar or an array """
+        full, _ = self._coeffs()
+        dac = np.clip(np.trunc((np.asarray(voltage, np.float64) / full + 1.0) * 8192.0), 0, 16383).astype(np.int64)
+        return int(dac) if dac.ndim == 0 else dac
 
     def outCurrentToDac(self, current):
-        vout = current * 1e-6 * self.rout()
-        return self.outVoltageToDac(vout)
+        """ Calculate DAC code for an output current in uA. current can be a scalar or an array """
+        _, rout = self._coeffs()
+        return self.outVoltageToDac(np.asarray(current, np.float64) * 1e-6 * rout)
 
     def dacToLoadVoltage(self, dac):
         voltage = self.dacToOutVoltage(dac)
@@ -0,0 +1,394 @@
+import threading
+
+import numpy as np
+
+import pyrogue as pr
+import rogue.interfaces.stream
+
+import warm_tdm
+
+
+class _Hdf5Store():
+    """h5py backend of DataExporter"""
+
+    def __init__(self, path, compression):
+        try:
+            import h5py
+        except ImportError as e:
+            raise ImportError('HDF5 export requires the h5py package') from e
+
+        # Latest format so that the config attribute is not limited to 64kB
+        self._file = h5py.File(path, 'w', libver='latest')
+        self._compression = compression
+        self._stringType = h5py.string_dtype()
+        self.attrs = self._file.attrs
+
+    def create(self, name, shape, chunks, dtype, fill):
+        # Object arrays hold variable length strings
+        if dtype == object:
+            dtype, fill = self._stringType, None
+
+        return self._file.create_dataset(
+            name,
+            shape=shape,
+            maxshape=(None,) * len(shape),
+            chunks=chunks,
+            dtype=dtype,
+            fillvalue=fill,
+            compression=self._compression)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ZarrStore():
+    """zarr backend of DataExporter, arrays use the default zarr compressor"""
+
+    def __init__(self, path):
+        try:
+            import zarr
+        except ImportError as e:
+            raise ImportError('Zarr export requires the zarr package') from e
+
+        self._group = zarr.open_group(path, mode='w')
+        self.attrs = self._group.attrs
+
+    def create(self, name, shape, chunks, dtype, fill):
+        # Object arrays hold variable length strings
+        if dtype == object:
+            dtype, fill = str, ''
+
+        # zarr 3 renamed create_dataset to create_array
+        create = getattr(self._group, 'create_array', None) or self._group.create_dataset
+        return create(name, shape=shape, chunks=chunks, dtype=dtype, fill_value=fill)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DataExporter():
+    """Writes Warm-TDM run data as chunked, compressed columnar arrays in an HDF5 file or a Zarr store.
+
+    Layout:
+        readout/values          (time, row, col) float32 FLL values, NaN where a readout has no sample
+        readout/readoutCount    (time,) DataReadout header words
+        readout/rowSeqCount
+        readout/runTime
+        pid/col<N>/<field>      (entries,) PidDebugValuesType fields of the PID debug entries of column N
+        config/updates          (records,) variable length YAML strings
+
+    The first configuration stream record, the full configuration, is stored as the root
+    attribute 'config'. The following records are variable updates and are appended to
+    config/updates. DataReadout frames with a bad size are dropped and counted in rejectCount.
+
+    Frames are buffered until chunkSize readouts or PID debug entries are pending and then
+    appended in one write, so memory use is bounded by the chunk size. The row and col
+    dimensions grow when a readout has more rows or cols than seen so far. Arrays are
+    stored in chunks of at most CHUNK_BYTES uncompressed, fewer entries per chunk for the
+    wide arrays, so that a slice is read without decompressing a whole write.
+    h5py or zarr is only needed for the format in use.
+    """
+
+    CHUNK_BYTES = 1 << 20
+
+    def __init__(self, path, fmt=None, chunkSize=4096, compression='gzip'):
+        if fmt is None:
+            fmt = 'zarr' if str(path).rstrip('/').endswith('.zarr') else 'hdf5'
+
+        if fmt == 'zarr':
+            self._store = _ZarrStore(path)
+        elif fmt == 'hdf5':
+            self._store = _Hdf5Store(path, compression)
+        else:
+            raise ValueError(f'Unknown export format {fmt}')
+
+        self.path = path
+        self.format = fmt
+        self.chunkSize = chunkSize
+        self.frameCount = 0
+        self.rejectCount = 0
+        self._arrays = {}
+        self._readoutFrames = []
+        self._pidFrames = []
+        self._configUpdates = []
+        self._configCount = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _append(self, name, arr, fill=0):
+        """Append arr along the first axis of array name, growing the other axes as needed"""
+        ds = self._arrays.get(name)
+
+        if ds is None:
+            inner = tuple(max(d, 1) for d in arr.shape[1:])
+            entryBytes = arr.dtype.itemsize * int(np.prod(inner))
+            chunks = (max(1, min(self.chunkSize, self.CHUNK_BYTES // entryBytes)),) + inner
+            ds = self._store.create(name, (0,) + arr.shape[1:], chunks, arr.dtype, fill)
+            self._arrays[name] = ds
+
+        start = ds.shape[0]
+        shape = (start + len(arr),) + tuple(max(a, b) for a, b in zip(ds.shape[1:], arr.shape[1:]))
+        ds.resize(shape)
+        ds[(slice(start, shape[0]),) + tuple(slice(0, d) for d in arr.shape[1:])] = arr
+
+    def _flushReadouts(self):
+        if len(self._readoutFrames) == 0:
+            return
+
+        frames = self._readoutFrames
+        self._readoutFrames = []
+        self._writeReadouts(warm_tdm.decode_readouts(frames))
+
+    def _flushPid(self):
+        if len(self._pidFrames) == 0:
+            return
+
+        frames = self._pidFrames
+        self._pidFrames = []
+        self._writePidDebug(warm_tdm.decode_pid_debug(np.concatenate(frames)))
+
+    def _writeReadouts(self, readouts):
+        if len(readouts) == 0:
+            return
+        self._append('readout/values', readouts.values, np.nan)
+        self._append('readout/readoutCount', readouts.readoutCount)
+        self._append('readout/rowSeqCount', readouts.rowSeqCount)
+        self._append('readout/runTime', readouts.runTime)
+
+    def _writePidDebug(self, values):
+        for col in np.unique(values['col']):
+            sel = values[values['col'] == col]
+            for field in warm_tdm.PidDebugValuesType.names:
+                if field != 'col':
+                    self._append(f'pid/col{col}/{field}', np.ascontiguousarray(sel[field]))
+
+    def _flushConfig(self):
+        if len(self._configUpdates) == 0:
+            return
+
+        updates = np.array(self._configUpdates, object)
+        self._configUpdates = []
+        self._append('config/updates', updates, '')
+
+    def _writeConfig(self, yaml):
+        if self._configCount == 0:
+            self._store.attrs['config'] = yaml
+        else:
+            self._configUpdates.append(yaml)
+            if len(self._configUpdates) >= self.chunkSize:
+                self._flushConfig()
+        self._configCount += 1
+
+    def addFrame(self, channel, data):
+        """Add one raw frame payload (uint8 array) received on a DataWriter channel"""
+        with self._lock:
+            self.frameCount += 1
+
+            if channel == warm_tdm.READOUT_CHANNEL:
+                # Checked here so that one bad frame does not fail the decode of a whole chunk
+                if len(data) < 32 or len(data) % 8 != 0:
+                    self.rejectCount += 1
+                    return
+                self._readoutFrames.append(np.array(data, np.uint8))
+                if len(self._readoutFrames) >= self.chunkSize:
+                    self._flushReadouts()
+
+            elif channel in warm_tdm.PID_DEBUG_CHANNELS:
+                if len(data) == warm_tdm.PidDebugType.itemsize:
+                    self._pidFrames.append(np.array(data, np.uint8))
+                    if len(self._pidFrames) >= self.chunkSize:
+                        self._flushPid()
+
+            elif channel == warm_tdm.CONFIG_CHANNEL:
+                self._writeConfig(bytes(data).decode(errors='replace').rstrip('\0'))
+
+    def addReadouts(self, readouts):
+        """Append a ReadoutArrays"""
+        with self._lock:
+            self._flushReadouts()
+            self._writeReadouts(readouts)
+
+    def addPidDebug(self, values):
+        """Append a PidDebugValuesType array"""
+        with self._lock:
+            self._flushPid()
+            self._writePidDebug(values)
+
+    def addConfig(self, yaml):
+        """Store a configuration YAML string"""
+        with self._lock:
+            self._writeConfig(yaml)
+
+    def flush(self):
+        """Write the buffered frames"""
+        with self._lock:
+            self._flushReadouts()
+            self._flushPid()
+            self._flushConfig()
+            self._store.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._store.close()
+
+
+def export_data_file(dataPath, outPath, fmt=None, chunkSize=4096, compression='gzip'):
+    """Convert a rogue StreamWriter data file to HDF5 or Zarr with DataExporter.
+    The records are decoded and written chunkSize at a time.
+    """
+    with warm_tdm.DataFile(dataPath) as f, DataExporter(outPath, fmt, chunkSize, compression) as out:
+        for yaml in f.config():
+            out.addConfig(yaml)
+
+        entries = f.select(warm_tdm.READOUT_CHANNEL)
+        for i in range(0, len(entries), chunkSize):
+            out.addReadouts(f.decodeReadouts(entries[i:i+chunkSize]))
+
+        entries = f.select(list(warm_tdm.PID_DEBUG_CHANNELS))
+        for i in range(0, len(entries), chunkSize):
+            out.addPidDebug(f.decodePidDebug(entries[i:i+chunkSize]))
+
+
+class _ExportChannel(rogue.interfaces.stream.Slave):
+    def __init__(self, writer, channel):
+        rogue.interfaces.stream.Slave.__init__(self)
+        self._writer = writer
+        self._channel = channel
+
+    def _acceptFrame(self, frame):
+        # Nothing is copied while no export file is open
+        if frame.getError() or self._writer._exporter is None:
+            return
+
+        with frame.lock():
+            arr = frame.getNumpy()
+
+        self._writer._frame(self._channel, arr)
+
+
+class DataExportWriter(pr.Device):
+    """Live HDF5/Zarr export next to the StreamWriter.
+    Streams are connected to getChannel(channel) the same way as to the StreamWriter channels.
+    Each channel goes through its own Fifo of fifoDepth frames that drops frames when full, so
+    the decoding and compression run on the Fifo threads and never hold up the source streams.
+    The dropped frames are counted in DropCount.
+    configStream is a dictionary of channel to pyrogue.interfaces.stream.Variable, as for the
+    StreamWriter, and carries the configuration updates. The full configuration is read from
+    the root when a file is opened, without streaming it to the other slaves.
+    """
+
+    def __init__(self, configStream=None, fifoDepth=1000, **kwargs):
+        super().__init__(**kwargs)
+
+        self._exporter = None
+        self._channels = {}
+        self._fifos = {}
+        self._fifoDepth = fifoDepth
+        self._lock = threading.Lock()
+        self._configStream = {} if configStream is None else configStream
+
+        for channel, stream in self._configStream.items():
+            stream >> self.getChannel(channel)
+
+        self.add(pr.LocalVariable(
+            name = 'DataFile',
+            description = 'Output path, paths ending in .zarr are written as Zarr and others as HDF5',
+            mode = 'RW',
+            value = ''))
+
+        self.add(pr.LocalVariable(
+            name = 'ChunkSize',
+            description = 'Readouts or PID debug entries per write, the most kept in memory',
+            mode = 'RW',
+            value = 4096))
+
+        self.add(pr.LocalVariable(
+            name = 'IsOpen',
+            mode = 'RO',
+            value = False))
+
+        self.add(pr.LocalVariable(
+            name = 'FrameCount',
+            mode = 'RO',
+            value = 0,
+            pollInterval = 1,
+            localGet = lambda: self._exporter.frameCount if self._exporter is not None else 0))
+
+        self.add(pr.LocalVariable(
+            name = 'RejectCount',
+            description = 'DataReadout frames dropped because of a bad size',
+            mode = 'RO',
+            value = 0,
+            pollInterval = 1,
+            localGet = lambda: self._exporter.rejectCount if self._exporter is not None else 0))
+
+        self.add(pr.LocalVariable(
+            name = 'DropCount',
+            description = 'Frames dropped because the export fell behind, since the file was opened',
+            mode = 'RO',
+            value = 0,
+            pollInterval = 1,
+            localGet = lambda: sum(fifo.dropCnt() for fifo in self._fifos.values())))
+
+        @self.command()
+        def Open():
+            self._close()
+
+            # Snapshot of the full configuration, the updates follow on the config stream
+            yaml = self.root.getYaml(
+                readOnly=False,
+                modes=['RW', 'RO', 'WO'],
+                incGroups=None,
+                excGroups=['NoStream'],
+                recurse=True)
+
+            exporter = DataExporter(self.DataFile.value(), chunkSize=self.ChunkSize.value())
+            exporter.addConfig(yaml)
+
+            for fifo in self._fifos.values():
+                fifo.clearCnt()
+
+            with self._lock:
+                self._exporter = exporter
+            self.IsOpen.set(True)
+
+        @self.command()
+        def Close():
+            self._close()
+
+    def getChannel(self, channel):
+        if channel not in self._channels:
+            self._channels[channel] = _ExportChannel(self, channel)
+            self._fifos[channel] = rogue.interfaces.stream.Fifo(self._fifoDepth, 0, True)
+            self._fifos[channel] >> self._channels[channel]
+        return self._fifos[channel]
+
+    def _frame(self, channel, arr):
+        with self._lock:
+            if self._exporter is not None:
+                self._exporter.addFrame(channel, arr)
+
+    def _close(self):
+        with self._lock:
+            exporter = self._exporter
+            self._exporter = None
+
+        if exporter is not None:
+            exporter.close()
+        self.IsOpen.set(False)
+
+    def _stop(self):
+        self._close()
+        super()._stop()
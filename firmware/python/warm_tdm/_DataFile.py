@@ -0,0 +1,222 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+import warm_tdm
+
+# Channels of the column board data streams in the data files
+READOUT_CHANNEL = 9
+PID_DEBUG_CHANNELS = range(8)
+CONFIG_CHANNEL = 255
+
+# Rogue StreamWriter record header: record size (header word and payload),
+# flags, error and channel. The payload follows the header.
+_RECORD_HEADER = struct.Struct('<IHBB')
+
+# One entry per record. readoutCount and runTime are taken from the payload of
+# DataReadout and PID debug records and are 0 for other records.
+RecordIndexType = np.dtype([
+    ('offset', np.uint64),
+    ('size', np.uint32),
+    ('channel', np.uint8),
+    ('error', np.uint8),
+    ('flags', np.uint16),
+    ('readoutCount', np.uint64),
+    ('runTime', np.uint64)])
+
+_INDEX_VERSION = 2
+
+
+class DataFile():
+    """Memory mapped access to a rogue StreamWriter data file through a record index.
+
+    The index is built with one pass over the record headers and saved next to the data
+    file as <path>.idx. It is reused when the data file is opened again, and extended if the
+    data file has grown since. Records are selected by channel, readoutCount range and
+    runTime range, and returned as numpy views of the mapped file.
+
+    Example:
+        with warm_tdm.DataFile('run.dat') as f:
+            readouts = f.readouts(readoutRange=(1000, 2000))
+    """
+
+    def __init__(self, path, useIndexFile=True):
+        self._path = os.fspath(path)
+        self._indexPath = self._path + '.idx'
+        self._useIndexFile = useIndexFile
+        self._file = open(self._path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._size = stat.st_size
+        self._mtime = stat.st_mtime_ns
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size > 0 else b''
+        self._data = np.frombuffer(self._mmap, np.uint8)
+        self.index = self._loadIndex()
+
+    def close(self):
+        self._data = None
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Arrays returned by this file still use the mapping, it is closed when they are released
+                pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _loadIndex(self):
+        index = np.zeros(0, RecordIndexType)
+        end = 0
+
+        if self._useIndexFile and os.path.exists(self._indexPath):
+            try:
+                with np.load(self._indexPath) as f:
+                    # A saved index is only reused if the data file was at most appended to since:
+                    # the first and last indexed records must still be in place, and a file of
+                    # the same size must not have been rewritten (mtime).
+                    if (int(f['version']) == _INDEX_VERSION and int(f['end']) <= self._size and
+                        bytes(f['check']) == self._check(f['index']) and
+                        (int(f['end']) < self._size or int(f['mtime']) == self._mtime)):
+                        index = f['index']
+                        end = int(f['end'])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        if end < self._size:
+            new, end = self._scan(end)
+            index = np.concatenate([index, new])
+            if self._useIndexFile:
+                self._saveIndex(index, end)
+
+        return index
+
+    def _check(self, index):
+        """Returns the header and first payload bytes of the first and last records of index,
+        which identify the run written to the file
+        """
+        ret = b''
+        for entry in index[[0, -1]] if len(index) > 0 else []:
+            start = int(entry['offset']) - _RECORD_HEADER.size
+            ret += bytes(self._mmap[start:start + _RECORD_HEADER.size + min(int(entry['size']), 32)])
+        return ret
+
+    def _saveIndex(self, index, end):
+        tmp = self._indexPath + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez(f, index=index, end=end, version=_INDEX_VERSION,
+                         check=np.frombuffer(self._check(index), np.uint8), mtime=self._mtime)
+            os.replace(tmp, self._indexPath)
+        except OSError as e:
+            print(f'DataFile: could not write index {self._indexPath}: {e}')
+
+    def _scan(self, start):
+        """Index the records from offset start. Returns the index and the offset after the last whole record."""
+        buf = self._mmap
+        entries = []
+        pos = start
+
+        while pos + _RECORD_HEADER.size <= self._size:
+            size, flags, error, channel = _RECORD_HEADER.unpack_from(buf, pos)
+            payload = size - 4
+            offset = pos + _RECORD_HEADER.size
+
+            # Stop at a record which is still being written
+            if size < 4 or offset + payload > self._size:
+                break
+
+            readoutCount, runTime = self._recordCounts(offset, payload, channel)
+            entries.append((offset, payload, channel, error, flags, readoutCount, runTime))
+            pos = offset + payload
+
+        return np.array(entries, RecordIndexType), pos
+
+    def _recordCounts(self, offset, size, channel):
+        if channel == READOUT_CHANNEL and size >= 32:
+            readoutCount, rowSeqCount, runTime = struct.unpack_from('<QQQ', self._mmap, offset)
+            return readoutCount, runTime
+
+        if channel in PID_DEBUG_CHANNELS and size >= warm_tdm.PidDebugType.itemsize:
+            low, high = struct.unpack_from('<HI', self._mmap, offset + 2)
+            readoutCount, = struct.unpack_from('<I', self._mmap, offset + 76)
+            return readoutCount, low | (high << 16)
+
+        return 0, 0
+
+    def select(self, channel=None, readoutRange=None, runTimeRange=None):
+        """Returns the index entries of channel (an int or a list) with readoutCount and runTime
+        in the half open ranges (start, stop). None selects everything.
+        """
+        index = self.index
+        mask = np.ones(len(index), bool)
+
+        if channel is not None:
+            mask &= np.isin(index['channel'], np.atleast_1d(channel))
+
+        if readoutRange is not None:
+            mask &= (index['readoutCount'] >= readoutRange[0]) & (index['readoutCount'] < readoutRange[1])
+
+        if runTimeRange is not None:
+            mask &= (index['runTime'] >= runTimeRange[0]) & (index['runTime'] < runTimeRange[1])
+
+        return index[mask]
+
+    def payload(self, entry):
+        """Returns a uint8 view of the payload of an index entry"""
+        offset = int(entry['offset'])
+        return self._data[offset:offset + int(entry['size'])]
+
+    def frames(self, channel=None, readoutRange=None, runTimeRange=None):
+        """Returns a list of uint8 views of the selected record payloads"""
+        return [self.payload(e) for e in self.select(channel, readoutRange, runTimeRange)]
+
+    def _concatenate(self, entries, itemSize):
+        """Returns the payloads of entries as one array when they are all itemSize bytes"""
+        if len(entries) == 0:
+            return np.zeros((0, itemSize), np.uint8)
+
+        offsets = entries['offset'].astype(np.int64)
+
+        # Records are contiguous when each channel is written alone, return a view then
+        if np.all(np.diff(offsets) == itemSize + _RECORD_HEADER.size):
+            start = int(offsets[0])
+            stride = itemSize + _RECORD_HEADER.size
+            return np.lib.stride_tricks.as_strided(
+                self._data[start:], shape=(len(offsets), itemSize), strides=(stride, 1), writeable=False)
+
+        return self._data[offsets[:, None] + np.arange(itemSize)]
+
+    def decodeReadouts(self, entries, rows=None, cols=None):
+        """Returns a ReadoutArrays of the DataReadout records in entries"""
+        sizes = np.unique(entries['size'])
+
+        if len(sizes) == 1:
+            frames = self._concatenate(entries, int(sizes[0]))
+            return warm_tdm.decode_readouts(np.ascontiguousarray(frames), rows=rows, cols=cols)
+
+        return warm_tdm.decode_readouts([self.payload(e) for e in entries], rows=rows, cols=cols)
+
+    def decodePidDebug(self, entries):
+        """Returns a PidDebugValuesType array of the PID debug records in entries"""
+        itemSize = warm_tdm.PidDebugType.itemsize
+        entries = entries[entries['size'] == itemSize]
+        return warm_tdm.decode_pid_debug(self._concatenate(entries, itemSize))
+
+    def readouts(self, readoutRange=None, runTimeRange=None, rows=None, cols=None):
+        """Returns a ReadoutArrays of the selected DataReadout records"""
+        return self.decodeReadouts(self.select(READOUT_CHANNEL, readoutRange, runTimeRange), rows, cols)
+
+    def pidDebug(self, channel=PID_DEBUG_CHANNELS, readoutRange=None, runTimeRange=None):
+        """Returns a PidDebugValuesType array of the selected PID debug records"""
+        channel = list(channel) if isinstance(channel, range) else channel
+        return self.decodePidDebug(self.select(channel, readoutRange, runTimeRange))
+
+    def config(self):
+        """Returns the YAML strings of the configuration stream records"""
+        return [bytes(self.payload(e)).decode(errors='replace').rstrip('\0') for e in self.select(CONFIG_CHANNEL)]
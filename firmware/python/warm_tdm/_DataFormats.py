@@ -1,7 +1,7 @@
 import numpy as np
 
 from collections import defaultdict
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, InitVar
 from typing import List
 
 def signed_int(arr):
@@ -11,6 +11,114 @@ def unsigned_int(arr):
     return int.from_bytes(arr, 'little', signed=False)
 
 
+# DataReadout frames are little endian 64 bit words:
+# three header words, one word per sample and one trailing word
+READOUT_HEADER_DTYPE = np.dtype([
+    ('readoutCount', '<u8'),
+    ('rowSeqCount', '<u8'),
+    ('runTime', '<u8')])
+
+READOUT_SAMPLE_DTYPE = np.dtype([
+    ('value', '<f4'),
+    ('row', 'u1'),
+    ('col', 'u1'),
+    ('unused', '<u2')])
+
+def readout_dtype(numSamples):
+    """Returns the structured dtype of a whole DataReadout frame with numSamples samples"""
+    return np.dtype([
+        ('header', READOUT_HEADER_DTYPE),
+        ('samples', READOUT_SAMPLE_DTYPE, (numSamples,)),
+        ('tail', '<u8')])
+
+def readout_records(arr, frameSize=None):
+    """Returns a structured array view of one or more DataReadout frames of the same size.
+    arr is a uint8 frame, a (frames, frameSize) array, or frames concatenated into one
+    array with frameSize given. Nothing is copied.
+    """
+    arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    if frameSize is None:
+        frameSize = arr.shape[-1] if arr.ndim == 2 else arr.size
+
+    if frameSize < 32 or frameSize % 8 != 0 or arr.size % frameSize != 0:
+        raise ValueError(f'Bad DataReadout frame size {frameSize} for {arr.size} bytes')
+
+    return arr.reshape(-1).view(readout_dtype(frameSize // 8 - 4))
+
+
+@dataclass
+class ReadoutArrays:
+    """Columnar arrays of a batch of DataReadout frames.
+    values has shape (readouts, rows, cols) and is NaN where a readout has no sample.
+    """
+
+    readoutCount: np.ndarray
+    rowSeqCount: np.ndarray
+    runTime: np.ndarray
+    values: np.ndarray
+
+    def __len__(self):
+        return len(self.readoutCount)
+
+    def readout(self, index):
+        """Returns readout index as a DataReadout"""
+        rows, cols = np.nonzero(~np.isnan(self.values[index]))
+        samples = np.zeros(len(rows), READOUT_SAMPLE_DTYPE)
+        samples['value'] = self.values[index, rows, cols]
+        samples['row'] = rows
+        samples['col'] = cols
+        return DataReadout(
+            readoutCount = int(self.readoutCount[index]),
+            rowSeqCount = int(self.rowSeqCount[index]),
+            runTime = int(self.runTime[index]),
+            sampleArray = samples)
+
+def decode_readouts(frames, frameSize=None, rows=None, cols=None):
+    """Decode DataReadout frames into a ReadoutArrays.
+    frames is one frame, a batch accepted by readout_records, or a list of frames which can have
+    different sizes. rows and cols default to one more than the largest row and col present.
+    """
+    if isinstance(frames, np.ndarray):
+        batches = [readout_records(frames, frameSize)]
+    else:
+        # Group consecutive frames of the same size into batches
+        batches = []
+        run = []
+        for frame in frames:
+            if len(run) > 0 and frame.size != run[0].size:
+                batches.append(readout_records(np.stack(run)))
+                run = []
+            run.append(frame)
+        if len(run) > 0:
+            batches.append(readout_records(np.stack(run)))
+
+    if len(batches) == 0:
+        batches = [np.zeros(0, readout_dtype(0))]
+
+    header = np.concatenate([b['header'] for b in batches])
+    samples = [b['samples'] for b in batches]
+
+    if rows is None:
+        rows = max((int(s['row'].max()) + 1 for s in samples if s.size > 0), default=0)
+    if cols is None:
+        cols = max((int(s['col'].max()) + 1 for s in samples if s.size > 0), default=0)
+
+    values = np.full((len(header), rows, cols), np.nan, np.float32)
+
+    start = 0
+    for s in samples:
+        index = np.arange(start, start + len(s))[:, None]
+        use = (s['row'] < rows) & (s['col'] < cols)
+        values[np.broadcast_to(index, s.shape)[use], s['row'][use], s['col'][use]] = s['value'][use]
+        start += len(s)
+
+    return ReadoutArrays(
+        readoutCount = header['readoutCount'],
+        rowSeqCount = header['rowSeqCount'],
+        runTime = header['runTime'],
+        values = values)
+
+
 @dataclass
 class DataSample:
 
@@ -27,23 +135,138 @@ class DataSample:
 
 @dataclass
 class DataReadout:
+    """One DataReadout frame. The samples are kept as a READOUT_SAMPLE_DTYPE array.
+    A DataSample list passed as samples is converted to sampleArray, and reading
+    samples builds the DataSample list from sampleArray.
+    """
 
     readoutCount: int
     rowSeqCount: int
     runTime: int
-    samples: List[DataSample] = field(default_factory=list)
+    samples: InitVar[List[DataSample]] = None
+    sampleArray: np.ndarray = field(default=None, repr=False)
+
+    def __post_init__(self, samples):
+        if self.sampleArray is None:
+            self.sampleArray = np.array(
+                [(s.value, s.row, s.col, 0) for s in (samples or [])], READOUT_SAMPLE_DTYPE)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return ((self.readoutCount, self.rowSeqCount, self.runTime) ==
+                (other.readoutCount, other.rowSeqCount, other.runTime) and
+                np.array_equal(self.sampleArray, other.sampleArray))
+
+    @property
+    def values(self):
+        return self.sampleArray['value']
+
+    @property
+    def rows(self):
+        return self.sampleArray['row']
+
+    @property
+    def cols(self):
+        return self.sampleArray['col']
 
     @classmethod
     def from_numpy(cls, arr):
-        print(arr)
-        words = arr[:-8].reshape(-1, 8)
-        print(words)
+        rec = readout_records(arr)[0]
         return cls(
-            readoutCount = unsigned_int(words[0]),
-            rowSeqCount = unsigned_int(words[1]),
-            runTime = unsigned_int(words[2]),
-            samples = [DataSample.from_numpy(w) for w in words[3:]])
-        
+            readoutCount = int(rec['header']['readoutCount']),
+            rowSeqCount = int(rec['header']['rowSeqCount']),
+            runTime = int(rec['header']['runTime']),
+            sampleArray = rec['samples'])
+
+def _readout_samples(self):
+    s = self.sampleArray
+    return [DataSample(row=r, col=c, value=v) for r, c, v in zip(s['row'], s['col'], s['value'])]
+
+# Set after the dataclass is built so that the samples InitVar keeps its None default
+DataReadout.samples = property(_readout_samples)
+
+
+# PID debug frames are 80 bytes, ten little endian 64 bit words
+PidDebugType = np.dtype([
+    # Word 0
+    ('col', np.uint8),
+    ('row', np.uint8),
+    ('runTimeLow', np.uint16),
+    ('runTimeHigh', np.uint32),
+    # Word 1
+    ('baseline', np.uint32),
+    ('dummy1', np.uint32),
+    # Word 2
+    ('accumError', np.int32),# P-term
+    ('dummy2', np.uint32),
+    # Word 3
+    ('sq1FbStart', np.uint16),
+    ('dummy3_0', np.uint16),
+    ('dummy3_1', np.uint32),
+    # Word 4
+    ('sumAccumError', np.int32), # I-term
+    ('dummy4', np.uint32),
+    # Word 5
+    ('diffAccumError', np.int32), # D-term
+    ('dummy5', np.uint32),
+    # Word 6
+    ('pidResult', np.int64),
+    # Word 7
+    ('numFluxJumps', np.int8),
+    ('dummy7_0', np.uint8),
+    ('dummy7_1', np.uint16),
+    ('dummy7_2', np.uint32),
+    # Word 8
+    ('sq1FbEnd', np.uint16),
+    ('dummy8_0', np.uint16),
+    ('dropCount', np.uint32),
+    # Word 9
+    ('numSamples', np.uint32),
+    ('readoutCount', np.uint32)
+])
+
+# Decoded PID debug values, the accumulators are AdcDsp.ACCUM_BASE (18 bit) values
+# and pidResult is an AdcDsp.RESULT_BASE (48 bit, 23 fractional bits) value
+PidDebugValuesType = np.dtype([
+    ('col', np.uint8),
+    ('row', np.uint8),
+    ('runTime', np.uint64),
+    ('accumError', np.float64),
+    ('sumAccum', np.float64),
+    ('diff', np.float64),
+    ('pidResult', np.float64),
+    ('sq1FbPreRaw', np.uint16),
+    ('sq1FbPostRaw', np.uint16),
+    ('fluxJumps', np.int8),
+    ('dropCount', np.uint32),
+    ('numSamples', np.uint32),
+    ('readoutCount', np.uint32)
+])
+
+def _sign_extend(values, bits):
+    shift = 64 - bits
+    return (values.astype(np.int64) << shift) >> shift
 
+def decode_pid_debug(arr):
+    """Returns a PidDebugValuesType array from one or more concatenated 80 byte PID debug frames"""
+    arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    if arr.size % PidDebugType.itemsize != 0:
+        raise ValueError(f'Bad PID debug frame size {arr.size}')
 
-    
+    rec = arr.reshape(-1).view(PidDebugType)
+    ret = np.zeros(len(rec), PidDebugValuesType)
+    ret['col'] = rec['col'] & 0xF
+    ret['row'] = rec['row']
+    ret['runTime'] = rec['runTimeLow'].astype(np.uint64) | (rec['runTimeHigh'].astype(np.uint64) << np.uint64(16))
+    ret['accumError'] = _sign_extend(rec['accumError'], 18)
+    ret['sumAccum'] = _sign_extend(rec['sumAccumError'], 18)
+    ret['diff'] = _sign_extend(rec['diffAccumError'], 18)
+    ret['pidResult'] = _sign_extend(rec['pidResult'], 48) / 2**23
+    ret['sq1FbPreRaw'] = rec['sq1FbStart'] & 0x3FFF
+    ret['sq1FbPostRaw'] = rec['sq1FbEnd'] & 0x3FFF
+    ret['fluxJumps'] = rec['numFluxJumps']
+    ret['dropCount'] = rec['dropCount']
+    ret['numSamples'] = rec['numSamples']
+    ret['readoutCount'] = rec['readoutCount']
+    return ret
@@ -16,6 +16,13 @@ class FastDacMem(pr.Device):
         else:
             self.amps = [amp for i in range(size)]
 
+        # Indices of the values converted by each distinct amplifier, so that full arrays
+        # are converted with one array call per amplifier
+        groups = {}
+        for i, a in enumerate(self.amps):
+            groups.setdefault(id(a), (a, []))[1].append(i)
+        self._ampGroups = [(a, np.array(idx)) for a, idx in groups.values()]
+
         self.add(pr.RemoteVariable(
             name = f'Raw',
             offset = 0x0,
@@ -75,31 +82,35 @@ class FastDacMem(pr.Device):
 
 
 
+    def _convert(self, method, values, dtype):
+        # Apply the amplifier conversion method to a full array of values
+        values = np.asarray(values)
+        ret = np.zeros(len(self.amps), dtype)
+        for amp, idx in self._ampGroups:
+            ret[idx] = getattr(amp, method)(values[idx])
+        return ret
+
     def getCurrent(self, index, read):
         dacs = self.Raw.get(read=read, index=index)
         if index == -1:
-            currents = [self.amps[i].dacToOutCurrent(dac) for i, dac in enumerate(dacs)]
-            currents = np.array(currents, dtype=np.float64)
+            currents = self._convert('dacToOutCurrent', dacs, np.float64)
         else:
             currents = self.amps[index].dacToOutCurrent(dacs)
 
         return currents
 
     def setCurrent(self, value, index, write):
-        #print(f'{self.path}.setCurrent({value=}, {index=}, {write=})')
         if index == -1:
-            dacs = [self.amps[i].outCurrentToDac(current) for i, current in enumerate(value)]
+            dacs = self._convert('outCurrentToDac', value, np.int64)
         else:
             dacs = self.amps[index].outCurrentToDac(value)
 
-        #print(f'Raw.set({index=}, {write=}, value={dacs})')
         self.Raw.set(index=index, write=write, value=dacs)
 
     def getVoltage(self, index, read):
         dacs = self.Raw.get(read=read, index=index)
         if index == -1:
-            voltages = [self.amps[i].dacToOutVoltage(dac) for i, dac in enumerate(dacs)]
-            voltages = np.array(voltages, dtype=np.float64)
+            voltages = self._convert('dacToOutVoltage', dacs, np.float64)
         else:
             voltages = self.amps[index].dacToOutVoltage(dacs)
 
@@ -107,7 +118,7 @@ class FastDacMem(pr.Device):
 
     def setVoltage(self, value, index, write):
         if index == -1:
-            dacs = [self.amps[i].outVoltageToDac(voltage) for i, voltage in enumerate(value)]
+            dacs = self._convert('outVoltageToDac', value, np.int64)
         else:
             dacs = self.amps[index].outVoltageToDac(value)
 
@@ -48,8 +48,10 @@ class HardwareGroup(pyrogue.Device):
             rowBoardClass,
             rowFeClass,
             dataWriter,
+            dataExport=None,
             simulation=False,
             emulate=False,
+            squidModel=None,
             host='192.168.3.11',
             colBoards=1,
             rowBoards=1,
@@ -77,11 +79,18 @@ class HardwareGroup(pyrogue.Device):
         COL_SIM_SRP_PORTS = [10000 + (i * 1000) for i in range(colBoards)]
         ROW_SIM_SRP_PORTS = [10000 + (i * 1000) for i in range(colBoards, colBoards+rowBoards)]        
 
+        # One DataReadout collector per column board, used for stream based tuning sweeps
+        self.readoutCollectors = []
+
+        # SQUID model memories of the column boards in emulate mode
+        self.squidEmulators = []
+
         # Instantiate and link each board in the Group
         for index in range(colBoards):
 
             if emulate is True:
-                srp =  pyrogue.interfaces.simulation.MemEmulate()
+                # Column board registers are backed by a SQUID model so that tuning can run without hardware
+                srp = warm_tdm.SquidEmulate(model=squidModel)
                 dataStream = rogue.interfaces.stream.Master()
 
             elif simulation is True:
@@ -129,6 +138,10 @@ class HardwareGroup(pyrogue.Device):
                 memBase=srp,
                 expand=True,
                 rows=rows))
+
+            if emulate is True:
+                srp.attach(self.ColumnBoard[index])
+                self.squidEmulators.append(srp)
             
             pidDebug = [warm_tdm.PidDebugger(name=f'PidDebug[{i}]', hidden=False, numRows=rows, col=i, frontEnd=self.ColumnBoard[index].AnalogFrontEnd) for i in range(8)]
             saAmps = [self.ColumnBoard[index].AnalogFrontEnd.Channel[x].SAAmp for x in range(8)]
@@ -144,6 +157,8 @@ class HardwareGroup(pyrogue.Device):
                     fifo2 = rogue.interfaces.stream.Fifo(0, 0, False)
                     packetizer.application(i) >> fifo1
                     fifo1 >> fifo2 >> dataWriter.getChannel(i)
+                    if dataExport is not None:
+                        fifo2 >> dataExport.getChannel(i)
                     #fifo1 >> rateDrop >> pidDebug[i]
                     self.addInterface(fifo1, fifo2, pidDebug[i])
 
@@ -160,6 +175,13 @@ class HardwareGroup(pyrogue.Device):
                 packetizer.application(9) >> dataFifo
 
                 dataFifo >> dataWriter.getChannel(9)
+                if dataExport is not None:
+                    dataFifo >> dataExport.getChannel(9)
+
+                readoutCollector = warm_tdm.ReadoutCollector()
+                dataFifo >> readoutCollector
+                self.addInterface(readoutCollector)
+                self.readoutCollectors.append(readoutCollector)
 #                dataFifo >> dataDbg
 
 
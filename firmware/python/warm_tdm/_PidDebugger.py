@@ -1,5 +1,7 @@
+import threading
+import time
+
 import pyrogue as pr
-import pyrogue.interfaces.simulation
 import numpy as np
 import warm_tdm
 
@@ -9,7 +11,6 @@ class PidRowDebugger(pr.Device):
 
         self.debugDev = debugDev
         self.row = row
-        self.parsedVars = ['AccumError', 'SumAccum', 'Diff', 'PidResult', 'Sq1FbPre', 'Sq1FbPost', 'FluxJumps']
 
         self.add(pr.LocalVariable(
             name = 'Visits',
@@ -69,84 +70,95 @@ class PidRowDebugger(pr.Device):
             value = 0))
         
 
-    def updateFromParser(self):
-        with self.root.updateGroup():
-            for varName in self.parsedVars:
-                self.variables[varName].set(self.debugDev.variables[varName].get(read=False))
-            self.Visits.set(self.Visits.get() + 1)
-        
+    def update(self, values, visits, sq1FbPre, sq1FbPost):
+        """Set the variables from the PidDebugValuesType entry of the last frame of this row"""
+        self.AccumError.set(float(values['accumError']))
+        self.SumAccum.set(float(values['sumAccum']))
+        self.Diff.set(float(values['diff']))
+        self.PidResult.set(float(values['pidResult']))
+        self.Sq1FbPre.set(float(sq1FbPre))
+        self.Sq1FbPost.set(float(sq1FbPost))
+        self.FluxJumps.set(int(values['fluxJumps']))
+        self.NumSamples.set(int(values['numSamples']))
+        self.ReadoutCount.set(int(values['readoutCount']))
+        self.Visits.set(int(visits))
 
 
 class PidDebugger(pr.DataReceiver):
+    """Receives the PID debug frames of one column.
 
-    def __init__(self, numRows, col, frontEnd, **kwargs):
-        self.mem = pyrogue.interfaces.simulation.MemEmulate()
+    Frames are decoded with decode_pid_debug and kept in a per row ring buffer of the
+    last depth frames, see history(). The variables of this device and of the RowPids
+    are only updated for the rows which received frames, at most once per UpdatePeriod.
+    Frames received within UpdatePeriod of the last update are published by a timer
+    when UpdatePeriod has elapsed, so the variables catch up when a burst ends.
+    """
+
+    def __init__(self, numRows, col, frontEnd, depth=256, **kwargs):
+        super().__init__(**kwargs)
 
         self.col = col
+        self._frontEnd = frontEnd
+        self._numRows = numRows
+        self._depth = depth
+
+        # Ring buffers, visit n of a row is at [row, n % depth]
+        self._ring = np.zeros((numRows, depth), warm_tdm.PidDebugValuesType)
+        self._visits = np.zeros(numRows, np.int64)
+        self._last = np.zeros(1, warm_tdm.PidDebugValuesType)[0]
+        self._dirty = set()
+        self._published = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
 
-        super().__init__(memBase=self.mem, **kwargs)
+        self.add(pr.LocalVariable(
+            name = 'UpdatePeriod',
+            value = 0.5,
+            units = 's',
+            description = 'Minimum time between updates of the debug variables'))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'Column',
             mode = 'RO',
-            offset = 0 * 8,
-            base = pr.UInt,
-            bitSize = 4))
+            value = 0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'RowIndex',
             mode = 'RO',
-            offset = 0,
             disp = '{:d}',
-            base = pr.UInt,
-            bitOffset = 8,
-            bitSize = 8))
+            value = 0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'RunTime',
             mode = 'RO',
-            offset = 0,
-            bitOffset = 16,
-            bitSize = 48,
             disp = '{:d}',
-            base = pr.UInt))
+            value = 0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'AccumError',
             mode = 'RO',
-            offset = 2 * 8,
-            base = warm_tdm.AdcDsp.ACCUM_BASE,
-            bitSize = warm_tdm.AdcDsp.ACCUM_BASE.bitSize))
+            value = 0.0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'SumAccum',
             mode = 'RO',
-            offset = 4 * 8,
-            base = warm_tdm.AdcDsp.ACCUM_BASE,
-            bitSize = warm_tdm.AdcDsp.ACCUM_BASE.bitSize))
-
+            value = 0.0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'Diff',
             mode = 'RO',
-            offset = 5 * 8,
-            base = warm_tdm.AdcDsp.ACCUM_BASE,
-            bitSize = warm_tdm.AdcDsp.ACCUM_BASE.bitSize))
+            value = 0.0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'PidResult',
             mode = 'RO',
-            offset = 6 * 8,
             disp = '{:0.03f}',
-            base = warm_tdm.AdcDsp.RESULT_BASE,
-            bitSize = warm_tdm.AdcDsp.RESULT_BASE.bitSize))
+            value = 0.0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'Sq1FbPreRaw',
             mode = 'RO',
-            offset = 3 * 8,
-            base = pr.UInt,
-            bitSize = 14))
+            value = 0))
 
         self.add(pr.LinkVariable(
             name = 'Sq1FbPre',
@@ -156,12 +168,10 @@ class PidDebugger(pr.DataReceiver):
             dependencies = [self.Sq1FbPreRaw, self.Column],
             linkedGet = lambda: frontEnd.Channel[self.Column.value()].SQ1FbAmp.dacToOutCurrent(self.Sq1FbPreRaw.value())))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'Sq1FbPostRaw',
             mode = 'RO',
-            offset = 8 * 8,
-            base = pr.UInt,
-            bitSize = 14))
+            value = 0))
 
         self.add(pr.LinkVariable(
             name = 'Sq1FbPost',
@@ -171,37 +181,28 @@ class PidDebugger(pr.DataReceiver):
             dependencies = [self.Sq1FbPostRaw, self.Column],
             linkedGet = lambda: frontEnd.Channel[self.Column.value()].SQ1FbAmp.dacToOutCurrent(self.Sq1FbPostRaw.value())))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'FluxJumps',
             mode = 'RO',
-            offset = 7 * 8,
-            base = pr.Int,
-            bitSize = 8,
-            bitOffset = 0))
+            value = 0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'DropCount',
             mode = 'RO',
             disp = '{:d}',
-            base = pr.UInt,
-            offset = 8*8,
-            bitOffset = 32))
+            value = 0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'NumSamples',
             mode = 'RO',
             disp = '{:d}',
-            base = pr.UInt,
-            offset = 9 * 8))
+            value = 0))
 
-        self.add(pr.RemoteVariable(
+        self.add(pr.LocalVariable(
             name = 'ReadoutCount',
             mode = 'RO',
             disp = '{:d}',
-            base = pr.UInt,
-            bitOffset = 32,
-            offset = 9 * 8))
-        
+            value = 0))
 
         self.add(pr.ArrayDevice(
             name = 'RowPids',
@@ -213,25 +214,102 @@ class PidDebugger(pr.DataReceiver):
                 'row' : row,
                 'debugDev': self} for row in range(numRows)]))
 
+    def history(self, row):
+        """Returns a dict of the ring buffer arrays of row, oldest first. SQ1 FB values are in uA."""
+        with self._lock:
+            visits = int(self._visits[row])
+            count = min(visits, self._depth)
+            entries = np.roll(self._ring[row], -(visits % self._depth))[self._depth - count:]
+
+        amp = self._frontEnd.Channel[self.col].SQ1FbAmp
+        return {
+            'AccumError': entries['accumError'],
+            'SumAccum': entries['sumAccum'],
+            'Diff': entries['diff'],
+            'PidResult': entries['pidResult'],
+            'Sq1FbPre': amp.dacToOutCurrent(entries['sq1FbPreRaw']),
+            'Sq1FbPost': amp.dacToOutCurrent(entries['sq1FbPostRaw']),
+            'FluxJumps': entries['fluxJumps'],
+            'ReadoutCount': entries['readoutCount']}
 
     def process(self, frame):
-        channel = frame.getChannel()
         fl = frame.getPayload()
-        raw = bytearray(fl)
-        frame.read(raw, 0)
 
-        #print(f'Got PID Debug frame for col {self.col}, row {raw[1]}, size {fl}')
-        if fl != 80:
+        # A frame holds one or more 80 byte debug messages
+        if fl == 0 or fl % warm_tdm.PidDebugType.itemsize != 0:
             print(f'Got PID debug frame with wrong size {fl}')
             return
 
-        # Overwrite the MemEmulate data with new frame
-        for i, byte in enumerate(raw):
-            self.mem._data[i] = byte
+        values = warm_tdm.decode_pid_debug(frame.getNumpy(0, fl))
+        values = values[values['row'] < self._numRows]
+
+        with self._lock:
+            for v in values:
+                row = v['row']
+                self._ring[row, self._visits[row] % self._depth] = v
+                self._visits[row] += 1
+                self._dirty.add(int(row))
+            if len(values) > 0:
+                self._last = values[-1]
+
+        wait = self._published + self.UpdatePeriod.value() - time.monotonic()
+        if wait <= 0:
+            self._timerPublish()
+            return
+
+        # Publish the rows left over once UpdatePeriod has elapsed
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(wait, self._timerPublish)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timerPublish(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._published = time.monotonic()
+        self.publish()
+
+    def _stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        super()._stop()
+
+    def publish(self):
+        """Update the variables of the rows which received frames since the last update"""
+        with self._lock:
+            rows = np.array(sorted(self._dirty), np.int64)
+            self._dirty.clear()
+            last = self._ring[rows, (self._visits[rows] - 1) % self._depth]
+            visits = self._visits[rows]
+            v = self._last.copy()
+
+        if len(rows) == 0:
+            return
 
-        self.readBlocks()
-        self.checkBlocks()
+        # SQ1 FB conversions for all rows at once
+        amp = self._frontEnd.Channel[self.col].SQ1FbAmp
+        sq1FbPre = amp.dacToOutCurrent(last['sq1FbPreRaw'])
+        sq1FbPost = amp.dacToOutCurrent(last['sq1FbPostRaw'])
 
-        row = self.RowIndex.get(read=False)
-        #print(f'{self.name} Got Frame with row index {row}')
-        self.RowPids.PID[row].updateFromParser()
+        with self.root.updateGroup():
+            self.Column.set(int(v['col']))
+            self.RowIndex.set(int(v['row']))
+            self.RunTime.set(int(v['runTime']))
+            self.AccumError.set(float(v['accumError']))
+            self.SumAccum.set(float(v['sumAccum']))
+            self.Diff.set(float(v['diff']))
+            self.PidResult.set(float(v['pidResult']))
+            self.Sq1FbPreRaw.set(int(v['sq1FbPreRaw']))
+            self.Sq1FbPostRaw.set(int(v['sq1FbPostRaw']))
+            self.FluxJumps.set(int(v['fluxJumps']))
+            self.DropCount.set(int(v['dropCount']))
+            self.NumSamples.set(int(v['numSamples']))
+            self.ReadoutCount.set(int(v['readoutCount']))
+
+            for i, row in enumerate(rows):
+                self.RowPids.PID[int(row)].update(last[i], visits[i], sq1FbPre[i], sq1FbPost[i])
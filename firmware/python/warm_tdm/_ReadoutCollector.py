@@ -0,0 +1,73 @@
+import collections
+import threading
+import time
+
+import numpy as np
+import rogue
+
+import warm_tdm
+
+
+class ReadoutCollector(rogue.interfaces.stream.Slave):
+    """Keeps the most recent DataReadout frames of one column board EventBuilder stream.
+    Frames are decoded into numpy arrays as they arrive so that tuning code can
+    wait for readouts issued after a given point and average them per column.
+    """
+
+    def __init__(self, depth=4096):
+        rogue.interfaces.stream.Slave.__init__(self)
+        self._readouts = collections.deque(maxlen=depth)
+        self._cond = threading.Condition()
+        self._lastCount = -1
+
+    @staticmethod
+    def decode(arr):
+        """Returns (readoutCount, rowSeqCount, runTime, rows, cols, values) from a raw DataReadout frame"""
+        rec = warm_tdm.readout_records(arr)[0]
+        header = rec['header']
+        samples = rec['samples']
+        return (int(header['readoutCount']), int(header['rowSeqCount']), int(header['runTime']),
+                samples['row'], samples['col'], samples['value'])
+
+    def _acceptFrame(self, frame):
+        with frame.lock():
+            arr = frame.getNumpy()
+
+        readout = self.decode(arr)
+
+        with self._cond:
+            self._readouts.append(readout)
+            self._lastCount = readout[0]
+            self._cond.notify_all()
+
+    def marker(self):
+        """Returns the readoutCount of the most recently received frame, -1 if none"""
+        with self._cond:
+            return self._lastCount
+
+    def waitReadouts(self, after, count, timeout=1.0):
+        """Returns a list of count readouts with readoutCount > after.
+        Raises an Exception if they do not arrive within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ret = [r for r in self._readouts if r[0] > after]
+                if len(ret) >= count:
+                    return ret[:count]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(f'Timed out waiting for {count} DataReadout frames after readoutCount {after}, got {len(ret)}')
+                self._cond.wait(remaining)
+
+    def average(self, after, count, timeout=1.0):
+        """Returns an array with the mean sample value of each of the 8 columns,
+        over all rows of count readouts with readoutCount > after.
+        """
+        readouts = self.waitReadouts(after, count, timeout)
+        cols = np.concatenate([r[4] for r in readouts])
+        values = np.concatenate([r[5] for r in readouts]).astype(np.float64)
+        sums = np.bincount(cols, weights=values, minlength=8)[:8]
+        counts = np.bincount(cols, minlength=8)[:8]
+        return np.divide(sums, counts, out=np.zeros(8, np.float64), where=counts > 0)
@@ -0,0 +1,234 @@
+import threading
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import rogue.interfaces.memory
+import pyrogue.interfaces.simulation
+
+
+@dataclass
+class SquidModel:
+    """ Parameters of the emulated SQUID chain of each column.
+        All currents are in uA and all voltages are in V at the SA output, before the front end amplifier.
+
+        Attributes
+        ----------
+        saPhi0 : float
+            SA feedback current for one flux quantum
+        saBiasCenter : float
+            SA bias current with the largest V-phi amplitude
+        saBiasWidth : float
+            Gaussian width of the SA V-phi amplitude versus bias
+        saAmplitude : float
+            Largest SA V-phi amplitude (half of the peak to peak)
+        saResistance : float
+            SA dynamic resistance in Ohms, gives the DC level of the SA output
+        sq1Phi0 : float
+            SQ1 feedback current for one SQ1 flux quantum
+        sq1BiasCenter : float
+            SQ1 bias current with the largest V-phi amplitude
+        sq1BiasWidth : float
+            Gaussian width of the SQ1 V-phi amplitude versus bias
+        sq1Coupling : float
+            Largest SQ1 signal, in SA flux quanta
+        noise : float
+            RMS noise of each ADC average
+        spread : float
+            Relative column to column spread of the bias centers and phi0 values
+        seed : int
+            Random seed of the column spread, V-phi phases and noise
+    """
+    saPhi0: float = 60.0
+    saBiasCenter: float = 150.0
+    saBiasWidth: float = 60.0
+    saAmplitude: float = 2.0e-3
+    saResistance: float = 10.0
+    sq1Phi0: float = 40.0
+    sq1BiasCenter: float = 200.0
+    sq1BiasWidth: float = 80.0
+    sq1Coupling: float = 0.4
+    noise: float = 2.0e-6
+    spread: float = 0.05
+    seed: int = 0
+
+
+class _ColumnParams:
+    """ Per column SquidModel values with the column spread and V-phi phases applied """
+
+    def __init__(self, model, rng, channels):
+        def spread(value):
+            return value * (1.0 + model.spread * rng.standard_normal(channels))
+
+        self.saPhi0 = spread(model.saPhi0)
+        self.saBiasCenter = spread(model.saBiasCenter)
+        self.saBiasWidth = np.full(channels, model.saBiasWidth)
+        self.saPhase = rng.uniform(0.0, 1.0, channels)
+        self.sq1Phi0 = spread(model.sq1Phi0)
+        self.sq1BiasCenter = spread(model.sq1BiasCenter)
+        self.sq1BiasWidth = np.full(channels, model.sq1BiasWidth)
+        self.sq1Phase = rng.uniform(0.0, 1.0, channels)
+
+
+class SquidEmulate(pyrogue.interfaces.simulation.MemEmulate):
+    """ Emulated column board memory with a SQUID model behind the ADC averages.
+
+    Acts as a MemEmulate for every register. Writes to the SA bias and offset DACs and
+    to the SAFb, SQ1Bias and SQ1Fb override registers are tracked, and reads of
+    WaveformCapture.AdcAverageRaw return the ADC voltage that the SQUID model and the
+    front end amplifier models give for the current DAC values.
+
+    The fast DACs follow the override registers, as they do in firmware when the
+    row sequencer is not running. The per row DAC tables are only stored.
+    The SQ1 of every column is treated as selected.
+    """
+
+    CHANNELS = 8
+
+    def __init__(self, model=None, **kwargs):
+        super().__init__(**kwargs)
+        self._model = SquidModel() if model is None else model
+        self._rng = np.random.default_rng(self._model.seed)
+        self._params = _ColumnParams(self._model, self._rng, self.CHANNELS)
+        self._board = None
+        self._regs = None
+        self._words = {}
+        self._squidLock = threading.Lock()
+
+        # Transaction counts by type, used to benchmark the tuning code
+        self.reads = 0
+        self.writes = 0
+
+    @property
+    def model(self):
+        return self._model
+
+    def resetCounts(self):
+        with self._squidLock:
+            self.reads = 0
+            self.writes = 0
+
+    def attach(self, board):
+        """ Set the column board whose registers and front end are emulated.
+            Register addresses are resolved on the first transaction, once the tree is built.
+        """
+        self._board = board
+
+    @staticmethod
+    def _address(node, top):
+        addr = 0
+        while node is not None:
+            addr += getattr(node, 'offset', 0)
+            if node is top:
+                break
+            node = node.parent
+        return addr
+
+    def _resolve(self):
+        board = self._board
+        for name in ['SaBiasDac', 'SaOffsetDac', 'SAFb', 'SQ1Bias', 'SQ1Fb', 'AnalogFrontEnd', 'DataPath']:
+            if not hasattr(board, name):
+                print(f'SquidEmulate: {board.path} has no {name}, emulating plain memory')
+                return {}
+
+        chans = range(self.CHANNELS)
+        regs = {
+            'adc': self._address(board.DataPath.WaveformCapture.AdcAverageRaw, board),
+            'biasP': [self._address(board.SaBiasDac.Dac[2*ch], board) for ch in chans],
+            'offsetP': [self._address(board.SaOffsetDac.Dac[2*ch], board) for ch in chans],
+            'offsetN': [self._address(board.SaOffsetDac.Dac[2*ch+1], board) for ch in chans],
+            'saFb': [self._address(board.SAFb.OverrideRaw[ch], board) for ch in chans],
+            'sq1Bias': [self._address(board.SQ1Bias.OverrideRaw[ch], board) for ch in chans],
+            'sq1Fb': [self._address(board.SQ1Fb.OverrideRaw[ch], board) for ch in chans],
+        }
+        return regs
+
+    def _word(self, address, mask):
+        return self._words.get(address, 0) & mask
+
+    def _track(self, address, ba):
+        # Keep the 32 bit words of every write, registers are word aligned
+        for i in range(0, len(ba) - len(ba) % 4, 4):
+            self._words[address + i] = int.from_bytes(ba[i:i+4], 'little')
+
+    def _adcVoltages(self):
+        """ Returns the ADC voltage of every channel for the current DAC values """
+        board = self._board
+        regs = self._regs
+        p = self._params
+        m = self._model
+        ret = np.zeros(self.CHANNELS, np.float64)
+
+        for ch in range(self.CHANNELS):
+            saAmp = board.AnalogFrontEnd.Channel[ch].SAAmp
+            dacScale = 2.5 / 2**16
+
+            biasP = self._word(regs['biasP'][ch], 0xFFFF) * dacScale * board.SaBiasDac.gain
+            offsetP = self._word(regs['offsetP'][ch], 0xFFFF) * dacScale * board.SaOffsetDac.gain
+            offsetN = self._word(regs['offsetN'][ch], 0xFFFF) * dacScale * board.SaOffsetDac.gain
+
+            saBias = saAmp.saBiasCurrent(biasP, 0.0) * 1.0e6
+            saFb = board.SAFb.amps[ch].dacToOutCurrent(self._word(regs['saFb'][ch], 0x3FFF))
+            sq1Bias = board.SQ1Bias.amps[ch].dacToOutCurrent(self._word(regs['sq1Bias'][ch], 0x3FFF))
+            sq1Fb = board.SQ1Fb.amps[ch].dacToOutCurrent(self._word(regs['sq1Fb'][ch], 0x3FFF))
+
+            # SQ1 signal in SA flux quanta
+            sq1Amp = m.sq1Coupling * np.exp(-0.5 * ((sq1Bias - p.sq1BiasCenter[ch]) / p.sq1BiasWidth[ch])**2)
+            sq1Flux = sq1Amp * np.cos(2 * np.pi * (sq1Fb / p.sq1Phi0[ch] + p.sq1Phase[ch])) if sq1Bias > 0.0 else 0.0
+
+            # SA output voltage
+            saAmpl = m.saAmplitude * np.exp(-0.5 * ((saBias - p.saBiasCenter[ch]) / p.saBiasWidth[ch])**2)
+            saFlux = saFb / p.saPhi0[ch] + p.saPhase[ch] + sq1Flux
+            saOut = saBias * 1.0e-6 * m.saResistance
+            if saBias > 0.0:
+                saOut += saAmpl * np.cos(2 * np.pi * saFlux)
+            saOut += m.noise * self._rng.standard_normal()
+
+            # The amplifier models give the SA voltage from the ADC voltage and are affine in the ADC voltage
+            v0 = saAmp.ampVin(0.0, offsetP, offsetN)
+            v1 = saAmp.ampVin(1.0, offsetP, offsetN)
+            ret[ch] = (saOut - v0) / (v1 - v0) if v1 != v0 else 0.0
+
+        return ret
+
+    def _adcRaw(self):
+        """ Returns the AdcAverageRaw bytes, ADC voltages in the 14 bit fixed point format of the average """
+        codes = np.clip(np.round(self._adcVoltages() * 2**13), -2**13, 2**13 - 1).astype(np.int64)
+        raw = (codes << 18).astype(np.int32)
+        return bytearray(raw.astype('<i4').tobytes())
+
+    def _doTransaction(self, transaction):
+        if self._board is None:
+            return super()._doTransaction(transaction)
+
+        address = transaction.address()
+        size = transaction.size()
+        typ = transaction.type()
+
+        with self._squidLock:
+            if self._regs is None:
+                self._regs = self._resolve()
+
+            if typ == rogue.interfaces.memory.Write or typ == rogue.interfaces.memory.Post:
+                self.writes += 1
+                ba = bytearray(size)
+                transaction.getData(ba, 0)
+                self._track(address, ba)
+
+            else:
+                self.reads += 1
+                adc = self._regs.get('adc')
+                length = 4 * self.CHANNELS
+
+                if adc is not None and address <= adc and adc + length <= address + size:
+                    # Build the read from the tracked words with the ADC averages in place
+                    ba = bytearray(size)
+                    for i in range(0, size - size % 4, 4):
+                        ba[i:i+4] = self._words.get(address + i, 0).to_bytes(4, 'little')
+                    ba[adc-address:adc-address+length] = self._adcRaw()
+                    transaction.setData(ba, 0)
+                    transaction.done()
+                    return
+
+        return super()._doTransaction(transaction)
@@ -9,6 +9,8 @@ from scipy.signal import wiener
 import warm_tdm
 import time
 import os
+import queue
+import threading
 import numpy as np
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
@@ -151,13 +153,10 @@ class WaveformCapture(pr.Device):
         def conv(value):
             return 2*(value >> 18)/2**14
 
-        convVector = np.vectorize(conv)
-
         def _get(*, read, index, check):
             ret = self.AdcAverageRaw.get(read=read, index=index, check=check)
             if index == -1:
-                ret = ret.astype(np.int32)
-                return np.array([conv(v) for v in ret], np.float64)
+                return conv(ret.astype(np.int32))
             else:
                 return conv(ret)
 
@@ -191,19 +190,15 @@ class WaveformCaptureReceiver(pr.DataReceiver):
 
         self.amplifiers = amplifiers
 
+        # ADC counts to volts at ADC, adc can be a scalar or an array
         def _conv(adc):
-            return adc/2**13
+            return adc * (1.0 / 2**13)
 
-        self.conv = np.vectorize(_conv)
-        cols = list(range(8))
+        self.conv = _conv
 
         tmpAdc = np.array(np.random.default_rng().normal(1, 20, (8,0x2000)), dtype=np.int32)
         tmpVoltage = self.conv(tmpAdc)
-        tmpAmpVin = np.zeros_like(tmpVoltage)
-
-        for ch in range(len(tmpAmpVin)):
-            for sample in range(len(tmpAmpVin[0])):
-                tmpAmpVin[ch][sample] = tmpVoltage[ch][sample] / 200.0
+        tmpAmpVin = tmpVoltage / 200.0
 
         self.add(pr.LocalVariable(
             name = 'RawData',
@@ -214,6 +209,17 @@ class WaveformCaptureReceiver(pr.DataReceiver):
             groups = ['NoStream'],
             hidden = True))
 
+        self.add(pr.LocalVariable(
+            name = 'CaptureCount',
+            value = 0,
+            mode = 'RO',
+            description = 'Number of captures received, the sequence number of the products of the last capture'))
+
+        # Derived products of the last capture, precomputed by a worker thread
+        self.products = WaveformProducts(0, self.RawData.value())
+        self._productQueue = queue.Queue(maxsize=1)
+        threading.Thread(target=self._productWorker, daemon=True).start()
+
         self.add(pr.LocalVariable(
             name = 'PlotColumn',
             value = -1,
@@ -301,11 +307,8 @@ class WaveformCaptureReceiver(pr.DataReceiver):
 
         for i in range(8):
             def _getPkPk(read, x=i):
-                d = self.RawData.value()
-                v = d[x]['V@AmpIn'][0]
-                #v = np.array([self.loading.ampVin(a, 0.0, x) for a in v])
-                r = v.max()-v.min()
-                return r*1.0e6
+                vmin, vmax, vmean = self.products.stats(x)
+                return (vmax-vmin)*1.0e6
 
             self.add(pr.LinkVariable(
                 name = f'PkPkAmpIn[{i}]',
@@ -317,11 +320,8 @@ class WaveformCaptureReceiver(pr.DataReceiver):
                 linkedGet = _getPkPk))
 
             def _getAvg(read, x=i):
-                d = self.RawData.value()
-                v = d[x]['V@AmpIn'][0]
-                #v = np.array([self.loading.ampVin(a, 0.0, x) for a in v])
-                r = v.mean()
-                return r*1.0e6
+                vmin, vmax, vmean = self.products.stats(x)
+                return vmean*1.0e6
 
             self.add(pr.LinkVariable(
                 name = f'AvgAmpIn[{i}]',
@@ -369,68 +369,75 @@ class WaveformCaptureReceiver(pr.DataReceiver):
             while self.Updated.get() == False:
                 time.sleep(.1)
 
+    def _productWorker(self):
+        while True:
+            products = self._productQueue.get()
+            try:
+                channels, plots = self.MultiPlot.selection()
+                products.compute(channels, [(kind, src) for _, kind, src in plots])
+            except Exception as e:
+                print(f'WaveformCaptureReceiver: failed to compute capture {products.seq} products: {e}')
+
+    def _queueProducts(self, products):
+        # Only the latest capture is worth computing, replace any capture still waiting
+        try:
+            self._productQueue.get_nowait()
+        except queue.Empty:
+            pass
+        self._productQueue.put_nowait(products)
+
     def process(self, frame):
         if frame.getError():
             print('Frame Error!')
             return
 
         data = frame.getNumpy(0, frame.getPayload())
-        numBytes = data.size
-        print(f'PyDM - Got Frame on channel {frame.getChannel()}: {numBytes} bytes')
-
-        # Create a view of ADC values
-        frame = data.view(np.uint16)
 
         # Process header
-        channel = frame[0] & 0b1111
-        decimation = frame[1]
+        header = data[:16].view(np.uint16)
+        channel = int(header[0] & 0b1111)
+        decimation = header[1]
 
-        adcs = frame[8:].view(np.int16).copy()
-        markers = adcs & 0x3        
-        adcs = adcs//4
+        # Samples are views of the frame data
+        # Bits 0 and 1 indicate a marker, the ADC value is in the upper 14 bits
+        samples = data[16:].view(np.int16)
 
-        # Bits 0 and 1 indicate a marker
+        if channel >= 8:
+            # Samples of the 8 channels are interleaved, give each channel a contiguous row
+            samples = np.ascontiguousarray(samples[:samples.size - samples.size % 8].reshape(-1, 8).T)
+        else:
+            samples = samples.reshape(1, -1)
 
-        print(f'{adcs=}')
-        print(f'{markers=}')
+        channels = channel_iter(channel)
+        markers = samples & 0x3
+        adcs = samples >> 2
+        voltages = self.conv(adcs)
+        ampVin = np.empty_like(voltages)
+
+        for row, ch in enumerate(channels):
+            ampVin[row] = self.amplifiers[ch].ampVin(voltages[row], 0.0)
 
         with self.root.updateGroup():
+            rms = adcs.std(1)
             if channel >= 8:
-                # Construct a view of the adc data
-                adcs.resize(adcs.size//8, 8)
-                markers.resize(markers.size//8, 8)
-                self.RmsNoiseRaw.set(adcs.std(0))
+                self.RmsNoiseRaw.set(rms)
             else:
-                self.RmsNoiseRaw.set(value=adcs.std(), index=channel)
-
-            #adcs = adcs[5000:]
-
-            voltages = self.conv(adcs)
-            ampVin = np.zeros_like(voltages)
-
-            d = self.RawData.value()
-
-            if channel >= 8:
-                for sample in range(len(voltages)):
-                    for ch in range(len(voltages[0])):
-                        ampVin[sample, ch] = self.amplifiers[ch].ampVin(voltages[sample, ch], 0.0)
-
-                d = {ch: {
-                    'ADC Counts': (adcs[:, ch], markers[:, ch]),
-                    'V@ADC': (voltages[:, ch], markers[:, ch]),
-                    'V@AmpIn': (ampVin[:, ch], markers[:, ch])}
-                     for ch in range(8)}
-
-            else:
-                #print(f'Setting data for channel {channel}')
-                for sample in range(len(voltages)):
-                    ampVin[sample] = self.amplifiers[channel].ampVin(voltages[sample], 0.0)
-
-                d[channel]['ADC Counts'] = (adcs, markers)
-                d[channel]['V@ADC'] = (voltages, markers)
-                d[channel]['V@AmpIn'] = (ampVin, markers)
-
-            #print(d)
+                self.RmsNoiseRaw.set(value=rms[0], index=channel)
+
+            # Replace the data of the captured channels, the others keep their last capture.
+            # A copy is updated so that readers of RawData never see a partial capture
+            d = {ch: dict(v) for ch, v in self.RawData.value().items()}
+            for row, ch in enumerate(channels):
+                d[ch]['ADC Counts'] = (adcs[row], markers[row])
+                d[ch]['V@ADC'] = (voltages[row], markers[row])
+                d[ch]['V@AmpIn'] = (ampVin[row], markers[row])
+
+            # Publish the products before RawData so that its listeners see the new capture
+            seq = self.CaptureCount.value() + 1
+            self.products = WaveformProducts(seq, d)
+            self._queueProducts(self.products)
+
+            self.CaptureCount.set(seq)
             self.RawData.set(d)
 
             if self.SaveData.value():
@@ -452,16 +459,81 @@ class WaveformCaptureReceiver(pr.DataReceiver):
                 self.LastSavedFileName.set(str(filename))
 
 
-def plot_waveform_channel(ch, ax, values, src, multi_channel):
+class WaveformProducts():
+    """Products derived from one capture for the plots and the PkPk and Avg variables.
+
+    Holds a snapshot of RawData for capture number seq. Each product is computed once,
+    on first use or by the receiver's worker thread, and kept until the next capture.
+    """
+
+    def __init__(self, seq, data):
+        self.seq = seq
+        self._data = {ch: dict(d) for ch, d in data.items()}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, ch, src, func):
+        key = (kind, ch, src)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = func(*self._data[ch][src])
+            return self._cache[key]
+
+    def waveform(self, ch, src):
+        """Returns the plotted values and the first sample, last sample and row strobe marker indexes"""
+        def _calc(values, markers):
+            if src != 'ADC Counts':
+                values = values * 1.0e6
+            return (values,
+                    np.flatnonzero(markers == 1),
+                    np.flatnonzero(markers == 2),
+                    np.flatnonzero(markers == 3))
+        return self._get('waveform', ch, src, _calc)
+
+    def histogram(self, ch, src):
+        """Returns the histogram counts and edges"""
+        def _calc(values, markers):
+            if src == 'ADC Counts':
+                low = int(values.min())
+                high = int(values.max())
+                return np.histogram(values, bins=np.arange(low - 10, high + 10, 1))
+            else:
+                return np.histogram(np.asarray(values, dtype=np.float32) * 1.0e6, bins=50)
+        return self._get('histogram', ch, src, _calc)
+
+    def psd(self, ch, src):
+        """Returns the PSD frequencies and amplitude spectral density in nV/rt.Hz"""
+        def _calc(values, markers):
+            values = np.asarray(values, dtype=np.float32)
+            freqs, pxx_den = scipy.signal.periodogram(values - values.mean(), 125.0e6, scaling='density')
+            return freqs, 1e9 * np.sqrt(pxx_den)
+        return self._get('psd', ch, src, _calc)
+
+    def stats(self, ch, src='V@AmpIn'):
+        """Returns the min, max and mean"""
+        def _calc(values, markers):
+            return values.min(), values.max(), values.mean()
+        return self._get('stats', ch, src, _calc)
+
+    def compute(self, channels, plots):
+        """Compute the stats of every channel and the plots products of channels.
+        plots is a list of (kind, src) with kind one of waveform, histogram or psd.
+        """
+        for ch in self._data:
+            self.stats(ch)
+        for ch in channels:
+            for kind, src in plots:
+                getattr(self, kind)(ch, src)
+
+
+def plot_waveform_channel(ch, ax, products, src, multi_channel):
     ax.clear()
-    markers = values[1]
-    
+    plt_values, firstSamples, lastSamples, rowStrobes = products.waveform(ch, src)
+
     if src == 'ADC Counts':
         units = src
-        plt_values = values[0]
     else:
         units = f'{src} - \u03bcV'
-        plt_values = values[0] * 1.0e6
 
     if not multi_channel:
         ax.set_title(f'Channel {ch} waveform')
@@ -476,16 +548,6 @@ def plot_waveform_channel(ch, ax, values, src, multi_channel):
     ax.plot(plt_values)
 
     # Plot the markers as vlines
-    firstSamples = np.where(markers == 1)[0]
-    lastSamples = np.where(markers == 2)[0]
-    rowStrobes = np.where(markers == 3)[0]
-
-    print(f'{markers=}')
-    print(f'{firstSamples=}')    
-    print(f'{lastSamples=}')    
-    print(f'{rowStrobes=}')
-    
-
     ymin = plt_values.min()
     ymax = plt_values.max()
 
@@ -493,20 +555,14 @@ def plot_waveform_channel(ch, ax, values, src, multi_channel):
     ax.vlines(lastSamples, ymin=ymin, ymax=ymax, color='r')
     ax.vlines(rowStrobes,  ymin=ymin, ymax=ymax, color='b')
 
-def plot_histogram_channel(ch, ax, values, src, multi_channel):
+def plot_histogram_channel(ch, ax, products, src, multi_channel):
     ax.clear()
-    plot_values = values[0]
+    counts, edges = products.histogram(ch, src)
 
     if src == 'ADC Counts':
-        low = int(plot_values.min())
-        high = int(plot_values.max())
-        edges = np.arange(low - 10, high + 10, 1)
-        counts, edges = np.histogram(plot_values, bins=edges)
         units = src
         ax.stairs(counts, edges)
     else:
-        values_uv = np.asarray(plot_values, dtype=np.float32) * 1.0e6
-        counts, edges = np.histogram(values_uv, bins=50)
         units = f'{src} - ?V'
         ax.stairs(counts, edges, fill=True)
 
@@ -522,12 +578,8 @@ def plot_histogram_channel(ch, ax, values, src, multi_channel):
         ax.set_title(f'Channel {ch} Histogram')
 
 
-def plot_psd_channel(ch, ax, values, src, multi_channel):
-    plot_values = np.asarray(values[0], dtype=np.float32)
-    freq = 125.0e6
-    mean_subtracted = plot_values - plot_values.mean()
-    freqs, pxx_den = scipy.signal.periodogram(mean_subtracted, freq, scaling='density')
-    pxx = 1e9 * np.sqrt(pxx_den)
+def plot_psd_channel(ch, ax, products, src, multi_channel):
+    freqs, pxx = products.psd(ch, src)
 
     ax.clear()
     ax.set_ylim(1e-3, 1000)
@@ -566,44 +618,56 @@ class MultiPlot(pr.LinkVariable):
         self.plotEnables = [parent.PlotHistogram, parent.PlotPSD, parent.PlotWaveform]
 
         self.plot_functions = {
-            parent.PlotHistogram: (plot_histogram_channel, parent.HistogramSrc),
-            parent.PlotPSD: (plot_psd_channel, parent.PSDSrc),
-            parent.PlotWaveform: (plot_waveform_channel, parent.WaveformSrc)}
+            parent.PlotHistogram: (plot_histogram_channel, parent.HistogramSrc, 'histogram'),
+            parent.PlotPSD: (plot_psd_channel, parent.PSDSrc, 'psd'),
+            parent.PlotWaveform: (plot_waveform_channel, parent.WaveformSrc, 'waveform')}
 
         # Reuse a single matplotlib figure so GUI/Jupyter refreshes update
         # the existing canvas instead of materializing a new window.
         self._fig = plt.Figure(tight_layout=True, figsize=(20,20))
 
-        def _conv(adc):
-            return adc/2**13
+        # The figure is only redrawn when the capture or the plot settings change
+        self._renderKey = None
+        self._renderLock = threading.Lock()
 
-        self.conv = np.vectorize(_conv)
+    def selection(self):
+        """Returns the plotted channels and a list of (plot function, kind, src) for the enabled plots"""
+        plots = [(func, kind, srcVar.valueDisp())
+                 for enable, (func, srcVar, kind) in self.plot_functions.items()
+                 if enable.value() is True]
 
+        if self.parent.PlotColumn.valueDisp() == 'All':
+            channels = list(range(8))
+        else:
+            channels = [self.parent.PlotColumn.value()]
+
+        return channels, plots
 
     def linkedGet(self, read, index=-1):
+        products = self.parent.products
+        channels, plots = self.selection()
+        key = (products.seq, tuple(channels), tuple((kind, src) for _, kind, src in plots))
+
+        with self._renderLock:
+            if key != self._renderKey:
+                self._render(products, channels, plots)
+                self._renderKey = key
+
+        return self._fig
+
+    def _render(self, products, channels, plots):
         fig = self._fig
         fig.clear()
 
-        enabled_plot_functions = {
-            k: v for k, v in self.plot_functions.items()
-            if k.get(read=read) is True
-        }
-        num_plots = len(enabled_plot_functions)
-        data = self.parent.RawData.get(read=read)
-
-        if self.parent.PlotColumn.getDisp(read=read) == 'All':
-            plot_index = 1
-            for ch in range(8):
-                for func in enabled_plot_functions.values():
-                    ax = fig.add_subplot(8, num_plots, plot_index)
-                    src = func[1].getDisp(read=read)
-                    func[0](ch, ax, data[ch][src], src, multi_channel=True)
-                    plot_index += 1
-        else:
-            ch = self.parent.PlotColumn.get(read=read)
-            for plot_index, func in enumerate(enabled_plot_functions.values(), start=1):
-                ax = fig.add_subplot(num_plots, 1, plot_index)
-                src = func[1].getDisp(read=read)
-                func[0](ch, ax, data[ch][src], src, multi_channel=False)
+        num_plots = len(plots)
+        multi_channel = len(channels) > 1
+        plot_index = 1
 
-        return fig
+        for ch in channels:
+            for func, kind, src in plots:
+                if multi_channel:
+                    ax = fig.add_subplot(8, num_plots, plot_index)
+                else:
+                    ax = fig.add_subplot(num_plots, 1, plot_index)
+                func(ch, ax, products, src, multi_channel=multi_channel)
+                plot_index += 1
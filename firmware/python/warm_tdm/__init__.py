@@ -48,4 +48,8 @@ from ._SaBiasOffsetAwaXe import *
 from ._TesBiasAwaXe import *
 from ._GroupLinkVariable import *
 from ._DataFormats import *
+from ._ReadoutCollector import *
 from ._TesBiasAd5542 import *
+from ._SquidEmulate import *
+from ._DataFile import *
+from ._DataExport import *
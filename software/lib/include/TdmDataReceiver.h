@@ -1,16 +1,49 @@
-
 #ifndef __TDM_DATA_RECEIVER_H__
 #define __TDM_DATA_RECEIVER_H__
 
 #include <rogue/interfaces/stream/Slave.h>
 #include <rogue/interfaces/stream/Frame.h>
+#include <boost/python.hpp>
+#include <atomic>
+#include <mutex>
+#include <vector>
 
 namespace warm_tdm_lib {
 
+   // Receives the EventBuilder DataReadout frames of a column board and decodes them
+   // into a preallocated ring buffer of (depth, rows, cols) float32 values.
+   //
+   // Frame format, little endian 64 bit words:
+   //    readoutCount, rowSeqCount, runTime,
+   //    one word per sample: float32 value, uint8 row, uint8 col, 2 unused bytes,
+   //    one trailing word
+   //
+   // Readouts are written to slot (writeIndex % depth). The buffer and the per slot
+   // header values are exposed to python as numpy arrays which share the memory.
+   // Readouts between readIndex and writeIndex are unread. If the writer catches up
+   // with the reader the oldest unread readout is overwritten and overrunCount is incremented.
+   // getBuffers() returns the arrays and the indices together so that they are consistent.
    class TdmDataReceiver : public rogue::interfaces::stream::Slave {
 
          uint32_t rxFrameCount_;
          uint32_t rxByteCount_;
+         uint32_t dropCount_;
+         uint32_t overrunCount_;
+         uint32_t sampleDropCount_;
+
+         uint32_t depth_;
+         uint32_t rows_;
+         uint32_t cols_;
+
+         std::shared_ptr<std::vector<float>>    values_;
+         std::shared_ptr<std::vector<uint64_t>> readoutCount_;
+         std::shared_ptr<std::vector<uint64_t>> rowSeqCount_;
+         std::shared_ptr<std::vector<uint64_t>> runTime_;
+
+         std::atomic<uint64_t> writeIndex_;
+         std::atomic<uint64_t> readIndex_;
+
+         std::vector<uint8_t> scratch_;
 
          std::mutex mtx_;
 
@@ -22,12 +55,42 @@ namespace warm_tdm_lib {
 
          TdmDataReceiver ();
 
+         void configure(uint32_t depth, uint32_t rows, uint32_t cols);
+
          void countReset();
 
          uint32_t getRxFrameCount();
 
          uint32_t getRxByteCount();
 
+         uint32_t getDropCount();
+
+         uint32_t getOverrunCount();
+
+         uint32_t getSampleDropCount();
+
+         uint32_t getDepth();
+
+         uint32_t getRows();
+
+         uint32_t getCols();
+
+         uint64_t getWriteIndex();
+
+         uint64_t getReadIndex();
+
+         void release(uint64_t index);
+
+         boost::python::object getValues();
+
+         boost::python::object getReadoutCounts();
+
+         boost::python::object getRowSeqCounts();
+
+         boost::python::object getRunTimes();
+
+         boost::python::tuple getBuffers();
+
          void acceptFrame ( std::shared_ptr<rogue::interfaces::stream::Frame> frame );
    };
 
@@ -1,29 +1,97 @@
-
 #ifndef __TDM_GROUP_EMULATE_H__
 #define __TDM_GROUP_EMULATE_H__
 
 #include <rogue/interfaces/stream/Master.h>
 #include <rogue/interfaces/stream/Frame.h>
 #include <rogue/interfaces/stream/FrameIterator.h>
+#include <condition_variable>
+#include <deque>
+#include <mutex>
+#include <random>
 #include <thread>
+#include <vector>
 
 namespace warm_tdm_lib {
 
+   // Emulates the EventBuilder DataReadout frames of the column boards of a group.
+   //
+   // Each readout sends one frame per column board, on frame channel = board index, in the
+   // format decoded by TdmDataReceiver: readoutCount, rowSeqCount and runTime words, one
+   // word per (row, col) sample and a trailing word. A template frame is kept per board with
+   // the row and col bytes filled in, only the header and the sample values are patched
+   // before each frame is sent.
+   //
+   // Readouts are generated by a timer at rate Hz, using the elapsed time in timing clock
+   // cycles as runTime, and on each reqFrames() call, using the request timestamp as runTime.
+   // Requests are queued with their timestamps, up to MaxRequests. A rate of 0 disables the
+   // timer. If the timer falls more than 100ms behind it skips the missed readouts and adds
+   // them to lateCount, requests dropped from a full queue are also added to lateCount.
+   // The frames are built with the lock held and sent after it is released, so the setters
+   // only wait for the frame build and not for the downstream slaves.
+   //
+   // The sample values follow a signal model per row, evaluated at runTime:
+   //    ModelNoise : offset + noise
+   //    ModelSine  : offset + amplitude * sin(2pi * frequency * t + phase) + noise
+   //    ModelStep  : offset +/- amplitude, a square wave at frequency, + noise
+   // noise is gaussian with the given sigma. phase is spread over the columns of the group.
+   // Setters release the GIL as the generator thread may be waiting on a python slave.
    class TdmGroupEmulate : public rogue::interfaces::stream::Master {
 
+      public:
+
+         static const uint8_t ModelNoise = 0;
+         static const uint8_t ModelSine  = 1;
+         static const uint8_t ModelStep  = 2;
+
+         static const uint32_t MaxRows   = 256;
+         static const uint32_t BoardCols = 8;
+         static const uint32_t MaxRequests = 1000;
+
+         // Timing clock cycles per second, the unit of runTime
+         static constexpr double TimingClock = 125.0e6;
+
+      private:
+
+         struct RowModel {
+            uint8_t type;
+            float   offset;
+            float   amplitude;
+            float   frequency;
+            float   noise;
+         };
+
          uint32_t timestampA_;
          uint32_t timestampB_;
          uint32_t timestampC_;
-         uint32_t reqCount_;
-         uint32_t sequence_;
+         uint64_t readoutCount_;
          uint32_t txFrameCount_;
          uint32_t txByteCount_;
+         uint32_t lateCount_;
          uint8_t  groupId_;
          uint8_t  numColBoards_;
          uint8_t  numRows_;
-         bool runEnable_;
+         double   rate_;
+         bool     rateChanged_;
+         bool     rebuild_;
+         bool     runEnable_;
          std::thread* txThread_;
 
+         std::vector<RowModel> rowModels_;
+         std::vector<std::vector<uint8_t>> templates_;
+         std::deque<uint64_t> reqTimes_;
+
+         std::mt19937 rng_;
+         std::normal_distribution<float> normal_;
+
+         std::mutex mtx_;
+         std::condition_variable cond_;
+
+         void buildTemplates();
+
+         void genReadout(uint64_t runTime, std::vector<rogue::interfaces::stream::FramePtr> & frames);
+
+         void sendReadout(std::vector<rogue::interfaces::stream::FramePtr> & frames);
+
          void runThread();
 
       public:
@@ -44,6 +112,14 @@ namespace warm_tdm_lib {
 
          uint8_t getNumRows();
 
+         void setRate(double rate);
+
+         double getRate();
+
+         void setRowModel(uint32_t row, uint8_t type, float offset, float amplitude, float frequency, float noise);
+
+         void setAllRowModels(uint8_t type, float offset, float amplitude, float frequency, float noise);
+
          void start();
 
          void stop();
@@ -54,6 +130,10 @@ namespace warm_tdm_lib {
 
          uint32_t getTxByteCount();
 
+         uint64_t getReadoutCount();
+
+         uint32_t getLateCount();
+
          void reqFrames(uint32_t timestampA, uint32_t timestampB, uint32_t timestampC);
 
          void genFrames();
@@ -1,5 +1,12 @@
+
 #define __STDC_FORMAT_MACROS
+#define NO_IMPORT_ARRAY
+#define PY_ARRAY_UNIQUE_SYMBOL WARM_TDM_LIB_ARRAY_API
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
 #include <inttypes.h>
+#include <string.h>
+#include <math.h>
+#include <algorithm>
 #include <TdmDataReceiver.h>
 #include <rogue/interfaces/stream/Slave.h>
 #include <rogue/interfaces/stream/Frame.h>
@@ -8,10 +15,32 @@
 #include <rogue/interfaces/stream/FrameLock.h>
 #include <rogue/GilRelease.h>
 #include <boost/python.hpp>
+#include <numpy/arrayobject.h>
 
 namespace ris = rogue::interfaces::stream;
 namespace bp = boost::python;
 
+// Numpy arrays returned to python keep a reference to the vector they view,
+// so they stay valid if the buffer is reallocated by configure()
+template <typename T>
+static void freeCapsule(PyObject * capsule) {
+   delete (std::shared_ptr<std::vector<T>> *)PyCapsule_GetPointer(capsule, NULL);
+}
+
+template <typename T>
+static bp::object toNumpy(std::shared_ptr<std::vector<T>> vec, int nd, npy_intp * dims, int type) {
+   PyObject * arr = PyArray_SimpleNewFromData(nd, dims, type, vec->data());
+   if ( arr == NULL ) bp::throw_error_already_set();
+
+   PyObject * capsule = PyCapsule_New(new std::shared_ptr<std::vector<T>>(vec), NULL, freeCapsule<T>);
+   PyArray_SetBaseObject((PyArrayObject *)arr, capsule);
+
+   // The receiver is the only writer
+   PyArray_CLEARFLAGS((PyArrayObject *)arr, NPY_ARRAY_WRITEABLE);
+
+   return bp::object(bp::handle<>(arr));
+}
+
 warm_tdm_lib::TdmDataReceiverPtr warm_tdm_lib::TdmDataReceiver::create() {
    warm_tdm_lib::TdmDataReceiverPtr r = std::make_shared<warm_tdm_lib::TdmDataReceiver>();
    return(r);
@@ -19,19 +48,55 @@ warm_tdm_lib::TdmDataReceiverPtr warm_tdm_lib::TdmDataReceiver::create() {
 
 void warm_tdm_lib::TdmDataReceiver::setup_python() {
    bp::class_<warm_tdm_lib::TdmDataReceiver, warm_tdm_lib::TdmDataReceiverPtr, bp::bases<ris::Slave>, boost::noncopyable >("TdmDataReceiver",bp::init<>())
+      .def("configure",          &warm_tdm_lib::TdmDataReceiver::configure)
       .def("countReset",         &warm_tdm_lib::TdmDataReceiver::countReset)
       .def("getRxFrameCount",    &warm_tdm_lib::TdmDataReceiver::getRxFrameCount)
       .def("getRxByteCount",     &warm_tdm_lib::TdmDataReceiver::getRxByteCount)
+      .def("getDropCount",       &warm_tdm_lib::TdmDataReceiver::getDropCount)
+      .def("getOverrunCount",    &warm_tdm_lib::TdmDataReceiver::getOverrunCount)
+      .def("getSampleDropCount", &warm_tdm_lib::TdmDataReceiver::getSampleDropCount)
+      .def("getDepth",           &warm_tdm_lib::TdmDataReceiver::getDepth)
+      .def("getRows",            &warm_tdm_lib::TdmDataReceiver::getRows)
+      .def("getCols",            &warm_tdm_lib::TdmDataReceiver::getCols)
+      .def("getWriteIndex",      &warm_tdm_lib::TdmDataReceiver::getWriteIndex)
+      .def("getReadIndex",       &warm_tdm_lib::TdmDataReceiver::getReadIndex)
+      .def("release",            &warm_tdm_lib::TdmDataReceiver::release)
+      .def("getValues",          &warm_tdm_lib::TdmDataReceiver::getValues)
+      .def("getReadoutCounts",   &warm_tdm_lib::TdmDataReceiver::getReadoutCounts)
+      .def("getRowSeqCounts",    &warm_tdm_lib::TdmDataReceiver::getRowSeqCounts)
+      .def("getRunTimes",        &warm_tdm_lib::TdmDataReceiver::getRunTimes)
+      .def("getBuffers",         &warm_tdm_lib::TdmDataReceiver::getBuffers)
    ;
 }
 
 warm_tdm_lib::TdmDataReceiver::TdmDataReceiver () {
    countReset();
+   configure(1024, 256, 8);
+}
+
+void warm_tdm_lib::TdmDataReceiver::configure(uint32_t depth, uint32_t rows, uint32_t cols) {
+   std::lock_guard<std::mutex> lock(mtx_);
+
+   depth_ = std::max(depth, (uint32_t)1);
+   rows_  = rows;
+   cols_  = cols;
+
+   values_       = std::make_shared<std::vector<float>>((size_t)depth_ * rows_ * cols_, NAN);
+   readoutCount_ = std::make_shared<std::vector<uint64_t>>(depth_, 0);
+   rowSeqCount_  = std::make_shared<std::vector<uint64_t>>(depth_, 0);
+   runTime_      = std::make_shared<std::vector<uint64_t>>(depth_, 0);
+
+   writeIndex_ = 0;
+   readIndex_  = 0;
 }
 
 void warm_tdm_lib::TdmDataReceiver::countReset () {
+   std::lock_guard<std::mutex> lock(mtx_);
    rxFrameCount_ = 0;
    rxByteCount_ = 0;
+   dropCount_ = 0;
+   overrunCount_ = 0;
+   sampleDropCount_ = 0;
 }
 
 uint32_t warm_tdm_lib::TdmDataReceiver::getRxFrameCount() {
@@ -42,14 +107,152 @@ uint32_t warm_tdm_lib::TdmDataReceiver::getRxByteCount() {
    return rxByteCount_;
 }
 
-void warm_tdm_lib::TdmDataReceiver::acceptFrame ( ris::FramePtr frame ) {
+uint32_t warm_tdm_lib::TdmDataReceiver::getDropCount() {
+   return dropCount_;
+}
+
+uint32_t warm_tdm_lib::TdmDataReceiver::getOverrunCount() {
+   return overrunCount_;
+}
+
+uint32_t warm_tdm_lib::TdmDataReceiver::getSampleDropCount() {
+   return sampleDropCount_;
+}
+
+uint32_t warm_tdm_lib::TdmDataReceiver::getDepth() {
+   return depth_;
+}
+
+uint32_t warm_tdm_lib::TdmDataReceiver::getRows() {
+   return rows_;
+}
+
+uint32_t warm_tdm_lib::TdmDataReceiver::getCols() {
+   return cols_;
+}
+
+uint64_t warm_tdm_lib::TdmDataReceiver::getWriteIndex() {
+   return writeIndex_;
+}
+
+uint64_t warm_tdm_lib::TdmDataReceiver::getReadIndex() {
+   return readIndex_;
+}
+
+// Mark the readouts before index as read, their slots can then be reused
+void warm_tdm_lib::TdmDataReceiver::release(uint64_t index) {
    rogue::GilRelease noGil;
-   ris::FrameLockPtr lock = frame->lock();
+   std::lock_guard<std::mutex> lock(mtx_);
+
+   if ( index > writeIndex_ ) index = writeIndex_;
+   if ( index > readIndex_ ) readIndex_ = index;
+}
+
+bp::object warm_tdm_lib::TdmDataReceiver::getValues() {
+   npy_intp dims[3] = {depth_, rows_, cols_};
+   return toNumpy(values_, 3, dims, NPY_FLOAT32);
+}
+
+bp::object warm_tdm_lib::TdmDataReceiver::getReadoutCounts() {
+   npy_intp dims[1] = {depth_};
+   return toNumpy(readoutCount_, 1, dims, NPY_UINT64);
+}
+
+bp::object warm_tdm_lib::TdmDataReceiver::getRowSeqCounts() {
+   npy_intp dims[1] = {depth_};
+   return toNumpy(rowSeqCount_, 1, dims, NPY_UINT64);
+}
+
+bp::object warm_tdm_lib::TdmDataReceiver::getRunTimes() {
+   npy_intp dims[1] = {depth_};
+   return toNumpy(runTime_, 1, dims, NPY_UINT64);
+}
+
+// Returns (values, readoutCounts, rowSeqCounts, runTimes, readIndex, writeIndex) from one configuration
+bp::tuple warm_tdm_lib::TdmDataReceiver::getBuffers() {
+   std::shared_ptr<std::vector<float>>    values;
+   std::shared_ptr<std::vector<uint64_t>> readoutCount;
+   std::shared_ptr<std::vector<uint64_t>> rowSeqCount;
+   std::shared_ptr<std::vector<uint64_t>> runTime;
+   uint64_t readIndex;
+   uint64_t writeIndex;
+   npy_intp dims[3];
 
    {
+      rogue::GilRelease noGil;
       std::lock_guard<std::mutex> lock(mtx_);
-      rxFrameCount_++;
-      rxByteCount_ += frame->getPayload();
+
+      values       = values_;
+      readoutCount = readoutCount_;
+      rowSeqCount  = rowSeqCount_;
+      runTime      = runTime_;
+      readIndex    = readIndex_;
+      writeIndex   = writeIndex_;
+      dims[0] = depth_;
+      dims[1] = rows_;
+      dims[2] = cols_;
    }
+
+   return bp::make_tuple(toNumpy(values, 3, dims, NPY_FLOAT32),
+                         toNumpy(readoutCount, 1, dims, NPY_UINT64),
+                         toNumpy(rowSeqCount, 1, dims, NPY_UINT64),
+                         toNumpy(runTime, 1, dims, NPY_UINT64),
+                         readIndex, writeIndex);
 }
 
+void warm_tdm_lib::TdmDataReceiver::acceptFrame ( ris::FramePtr frame ) {
+   uint32_t size;
+   uint32_t samples;
+   uint32_t slot;
+   uint64_t index;
+   uint8_t  row;
+   uint8_t  col;
+   uint8_t  * word;
+   float    * dst;
+
+   rogue::GilRelease noGil;
+   ris::FrameLockPtr frLock = frame->lock();
+   std::lock_guard<std::mutex> lock(mtx_);
+
+   size = frame->getPayload();
+   rxFrameCount_++;
+   rxByteCount_ += size;
+
+   // Three header words, the samples and one trailing word
+   if ( frame->getError() || size < 32 || (size % 8) != 0 ) {
+      dropCount_++;
+      return;
+   }
+
+   scratch_.resize(size);
+   ris::FrameIterator it = frame->begin();
+   ris::fromFrame(it, size, scratch_.data());
+
+   // Overwrite the oldest unread readout if the reader has fallen behind
+   index = writeIndex_;
+   if ( index - readIndex_ >= depth_ ) {
+      readIndex_ = index - depth_ + 1;
+      overrunCount_++;
+   }
+
+   slot = index % depth_;
+   memcpy(&(*readoutCount_)[slot], &scratch_[0], 8);
+   memcpy(&(*rowSeqCount_)[slot], &scratch_[8], 8);
+   memcpy(&(*runTime_)[slot], &scratch_[16], 8);
+
+   // Entries without a sample in this readout are NaN
+   dst = values_->data() + (size_t)slot * rows_ * cols_;
+   std::fill(dst, dst + (size_t)rows_ * cols_, NAN);
+
+   samples = (size / 8) - 4;
+   for (uint32_t i=0; i < samples; i++) {
+      word = &scratch_[24 + (i * 8)];
+      row = word[4];
+      col = word[5];
+
+      if ( row < rows_ && col < cols_ ) memcpy(dst + (row * cols_) + col, word, 4);
+      else sampleDropCount_++;
+   }
+
+   writeIndex_ = index + 1;
+}
@@ -1,5 +1,8 @@
 #define __STDC_FORMAT_MACROS
 #include <inttypes.h>
+#include <string.h>
+#include <math.h>
+#include <chrono>
 #include <TdmGroupEmulate.h>
 #include <rogue/interfaces/stream/Master.h>
 #include <rogue/interfaces/stream/Frame.h>
@@ -12,6 +15,19 @@
 namespace ris = rogue::interfaces::stream;
 namespace bp = boost::python;
 
+const uint8_t  warm_tdm_lib::TdmGroupEmulate::ModelNoise;
+const uint8_t  warm_tdm_lib::TdmGroupEmulate::ModelSine;
+const uint8_t  warm_tdm_lib::TdmGroupEmulate::ModelStep;
+const uint32_t warm_tdm_lib::TdmGroupEmulate::MaxRows;
+const uint32_t warm_tdm_lib::TdmGroupEmulate::BoardCols;
+const uint32_t warm_tdm_lib::TdmGroupEmulate::MaxRequests;
+constexpr double warm_tdm_lib::TdmGroupEmulate::TimingClock;
+
+// DataReadout frame layout, in bytes
+static const uint32_t HeaderSize = 24;
+static const uint32_t SampleSize = 8;
+static const uint32_t TailSize   = 8;
+
 warm_tdm_lib::TdmGroupEmulatePtr warm_tdm_lib::TdmGroupEmulate::create(uint8_t groupId) {
    warm_tdm_lib::TdmGroupEmulatePtr r = std::make_shared<warm_tdm_lib::TdmGroupEmulate>(groupId);
    return(r);
@@ -25,27 +41,38 @@ void warm_tdm_lib::TdmGroupEmulate::setup_python() {
       .def("setNumColBoards",    &warm_tdm_lib::TdmGroupEmulate::setNumColBoards)
       .def("getNumRows",         &warm_tdm_lib::TdmGroupEmulate::getNumRows)
       .def("setNumRows",         &warm_tdm_lib::TdmGroupEmulate::setNumRows)
+      .def("getRate",            &warm_tdm_lib::TdmGroupEmulate::getRate)
+      .def("setRate",            &warm_tdm_lib::TdmGroupEmulate::setRate)
+      .def("setRowModel",        &warm_tdm_lib::TdmGroupEmulate::setRowModel)
+      .def("setAllRowModels",    &warm_tdm_lib::TdmGroupEmulate::setAllRowModels)
       .def("reqFrames",          &warm_tdm_lib::TdmGroupEmulate::reqFrames)
+      .def("genFrames",          &warm_tdm_lib::TdmGroupEmulate::genFrames)
       .def("countReset",         &warm_tdm_lib::TdmGroupEmulate::countReset)
       .def("getTxFrameCount",    &warm_tdm_lib::TdmGroupEmulate::getTxFrameCount)
       .def("getTxByteCount",     &warm_tdm_lib::TdmGroupEmulate::getTxByteCount)
+      .def("getReadoutCount",    &warm_tdm_lib::TdmGroupEmulate::getReadoutCount)
+      .def("getLateCount",       &warm_tdm_lib::TdmGroupEmulate::getLateCount)
    ;
 }
 
-warm_tdm_lib::TdmGroupEmulate::TdmGroupEmulate (uint8_t groupId) {
+warm_tdm_lib::TdmGroupEmulate::TdmGroupEmulate (uint8_t groupId) : rng_(groupId), normal_(0.0, 1.0) {
    countReset();
 
    groupId_ = groupId;
    timestampA_ = 0;
    timestampB_ = 0;
    timestampC_ = 0;
-   reqCount_ = 0;
-   sequence_ = 0;
+   readoutCount_ = 0;
    numColBoards_ = 1;
    numRows_ = 1;
+   rate_ = 0.0;
+   rateChanged_ = false;
+   rebuild_ = true;
    runEnable_ = false;
    txThread_ = NULL;
-   sequence_ = 0;
+
+   RowModel model = {ModelSine, 0.0, 1.0, 1.0, 0.01};
+   rowModels_.assign(MaxRows, model);
 }
 
 warm_tdm_lib::TdmGroupEmulate::~TdmGroupEmulate () {
@@ -53,7 +80,10 @@ warm_tdm_lib::TdmGroupEmulate::~TdmGroupEmulate () {
 }
 
 void warm_tdm_lib::TdmGroupEmulate::setNumColBoards(uint8_t number) {
+   rogue::GilRelease noGil;
+   std::lock_guard<std::mutex> lock(mtx_);
    numColBoards_ = number;
+   rebuild_ = true;
 }
 
 uint8_t warm_tdm_lib::TdmGroupEmulate::getNumColBoards() {
@@ -61,14 +91,51 @@ uint8_t warm_tdm_lib::TdmGroupEmulate::getNumColBoards() {
 }
 
 void warm_tdm_lib::TdmGroupEmulate::setNumRows(uint8_t number) {
+   rogue::GilRelease noGil;
+   std::lock_guard<std::mutex> lock(mtx_);
    numRows_ = number;
+   rebuild_ = true;
 }
 
 uint8_t warm_tdm_lib::TdmGroupEmulate::getNumRows() {
    return numRows_;
 }
 
+void warm_tdm_lib::TdmGroupEmulate::setRate(double rate) {
+   rogue::GilRelease noGil;
+   std::lock_guard<std::mutex> lock(mtx_);
+   rate_ = (rate > 0.0) ? rate : 0.0;
+   rateChanged_ = true;
+   cond_.notify_all();
+}
+
+double warm_tdm_lib::TdmGroupEmulate::getRate() {
+   return rate_;
+}
+
+void warm_tdm_lib::TdmGroupEmulate::setRowModel(uint32_t row, uint8_t type, float offset, float amplitude, float frequency, float noise) {
+   rogue::GilRelease noGil;
+   std::lock_guard<std::mutex> lock(mtx_);
+
+   if ( row >= MaxRows ) return;
+
+   rowModels_[row].type      = (type <= ModelStep) ? type : ModelNoise;
+   rowModels_[row].offset    = offset;
+   rowModels_[row].amplitude = amplitude;
+   rowModels_[row].frequency = frequency;
+   rowModels_[row].noise     = noise;
+}
+
+void warm_tdm_lib::TdmGroupEmulate::setAllRowModels(uint8_t type, float offset, float amplitude, float frequency, float noise) {
+   rogue::GilRelease noGil;
+   std::lock_guard<std::mutex> lock(mtx_);
+
+   RowModel model = {(type <= ModelStep) ? type : ModelNoise, offset, amplitude, frequency, noise};
+   rowModels_.assign(MaxRows, model);
+}
+
 void warm_tdm_lib::TdmGroupEmulate::start() {
+   rogue::GilRelease noGil;
    if ( txThread_ == NULL ) {
       runEnable_ = true;
       txThread_ = new std::thread(&TdmGroupEmulate::runThread, this);
@@ -76,8 +143,13 @@ void warm_tdm_lib::TdmGroupEmulate::start() {
 }
 
 void warm_tdm_lib::TdmGroupEmulate::stop() {
+   rogue::GilRelease noGil;
    if ( txThread_ != NULL ) {
-      runEnable_ = false;
+      {
+         std::lock_guard<std::mutex> lock(mtx_);
+         runEnable_ = false;
+         cond_.notify_all();
+      }
       txThread_->join();
       delete txThread_;
       txThread_ = NULL;
@@ -87,6 +159,7 @@ void warm_tdm_lib::TdmGroupEmulate::stop() {
 void warm_tdm_lib::TdmGroupEmulate::countReset () {
    txFrameCount_ = 0;
    txByteCount_ = 0;
+   lateCount_ = 0;
 }
 
 uint32_t warm_tdm_lib::TdmGroupEmulate::getTxFrameCount() {
@@ -97,74 +170,175 @@ uint32_t warm_tdm_lib::TdmGroupEmulate::getTxByteCount() {
    return txByteCount_;
 }
 
+uint64_t warm_tdm_lib::TdmGroupEmulate::getReadoutCount() {
+   return readoutCount_;
+}
+
+uint32_t warm_tdm_lib::TdmGroupEmulate::getLateCount() {
+   return lateCount_;
+}
+
 void warm_tdm_lib::TdmGroupEmulate::reqFrames(uint32_t timestampA, uint32_t timestampB, uint32_t timestampC) {
-   ++reqCount_;
-   timestampA = timestampA;
-   timestampB = timestampB;
-   timestampC = timestampC;
+   rogue::GilRelease noGil;
+   std::lock_guard<std::mutex> lock(mtx_);
+   timestampA_ = timestampA;
+   timestampB_ = timestampB;
+   timestampC_ = timestampC;
+
+   if ( reqTimes_.size() >= MaxRequests ) {
+      reqTimes_.pop_front();
+      ++lateCount_;
+   }
+   reqTimes_.push_back(((uint64_t)timestampB << 32) | timestampA);
+   cond_.notify_all();
 }
 
 void warm_tdm_lib::TdmGroupEmulate::genFrames() {
-   rogue::interfaces::stream::FramePtr frame;
-   rogue::interfaces::stream::FrameIterator it;
+   std::vector<ris::FramePtr> frames;
+
+   rogue::GilRelease noGil;
+   {
+      std::lock_guard<std::mutex> lock(mtx_);
+      genReadout(((uint64_t)timestampB_ << 32) | timestampA_, frames);
+   }
+   sendReadout(frames);
+}
 
-   uint8_t  col;
-   uint8_t  row;
-   uint8_t  x;
-   uint32_t size;
-   uint8_t  tmp8;
-   uint32_t tmp32;
-   uint64_t tmp64;
+// Build the frame of each board with the row and col bytes in place, called with mtx_ held
+void warm_tdm_lib::TdmGroupEmulate::buildTemplates() {
+   uint32_t size = HeaderSize + (numRows_ * BoardCols * SampleSize) + TailSize;
 
-   size = 24 + (36 * numRows_);
+   templates_.assign(numColBoards_, std::vector<uint8_t>(size, 0));
 
-   for ( col=0; col < numColBoards_; col++ ) {
-      frame = reqFrame(size, true);
-      frame->setPayload(size);
-      it = frame->begin();
+   for (uint32_t board=0; board < numColBoards_; board++) {
+      uint8_t * data = templates_[board].data();
+
+      for (uint32_t row=0; row < numRows_; row++) {
+         for (uint32_t col=0; col < BoardCols; col++) {
+            uint8_t * sample = data + HeaderSize + (row * BoardCols + col) * SampleSize;
+            sample[4] = row;
+            sample[5] = col;
+         }
+      }
+   }
+   rebuild_ = false;
+}
+
+// Patch the templates for one readout and copy them to frames, called with mtx_ held
+void warm_tdm_lib::TdmGroupEmulate::genReadout(uint64_t runTime, std::vector<ris::FramePtr> & frames) {
+   ris::FramePtr frame;
+   ris::FrameIterator it;
+   uint64_t header[3];
+   float value;
 
-      tmp8 = 0xAA;
-      toFrame(it, 1, &tmp8);
+   if ( rebuild_ ) buildTemplates();
+   frames.clear();
 
-      toFrame(it, 1, &groupId_);
-      toFrame(it, 1, &x);
-      toFrame(it, 1, &numRows_);
-      toFrame(it, 4, &timestampA_);
-      toFrame(it, 4, &timestampB_);
-      toFrame(it, 4, &timestampC_);
+   double t = (double)runTime / TimingClock;
+   double totalCols = (double)(numColBoards_ * BoardCols);
 
-      toFrame(it, 4, &sequence_);
+   // Every column completes one readout per row sequence
+   header[0] = readoutCount_;
+   header[1] = readoutCount_;
+   header[2] = runTime;
 
-      tmp8 = 0;
-      toFrame(it, 1, &tmp8);
+   for (uint32_t board=0; board < numColBoards_; board++) {
+      std::vector<uint8_t> & tmpl = templates_[board];
+      uint8_t * data = tmpl.data();
+      uint32_t size = tmpl.size();
 
-      tmp32 = 0;
-      toFrame(it, 3, &tmp32);
+      memcpy(data, header, HeaderSize);
 
-      for (row=0; row < numRows_; row++) {
-         toFrame(it, 1, &row);
+      for (uint32_t row=0; row < numRows_; row++) {
+         const RowModel & model = rowModels_[row];
+         double cycle = model.frequency * t;
 
-         tmp32 = 0;
-         toFrame(it, 3, &tmp32);
+         for (uint32_t col=0; col < BoardCols; col++) {
+            double phase = cycle + (board * BoardCols + col) / totalCols;
 
-         for (x=0; x < 8; x++) {
-            toFrame(it, 1, &x);
-            toFrame(it, 1, &row);
-            toFrame(it, 1, &col);
-            toFrame(it, 1, &groupId_);
+            value = model.offset;
+            if ( model.type == ModelSine ) value += model.amplitude * sin(2.0 * M_PI * phase);
+            else if ( model.type == ModelStep ) value += (phase - floor(phase) < 0.5) ? model.amplitude : -model.amplitude;
+            if ( model.noise != 0.0 ) value += model.noise * normal_(rng_);
+
+            memcpy(data + HeaderSize + (row * BoardCols + col) * SampleSize, &value, 4);
          }
       }
-      sendFrame(frame);
+
+      frame = reqFrame(size, true);
+      frame->setPayload(size);
+      frame->setChannel(board);
+      it = frame->begin();
+      ris::toFrame(it, size, data);
+      frames.push_back(frame);
+
       ++txFrameCount_;
       txByteCount_ += size;
    }
-   ++sequence_;
+   ++readoutCount_;
+}
+
+// Send the frames of one readout, called without mtx_ held
+void warm_tdm_lib::TdmGroupEmulate::sendReadout(std::vector<ris::FramePtr> & frames) {
+   for (ris::FramePtr & frame : frames) sendFrame(frame);
+   frames.clear();
 }
 
 void warm_tdm_lib::TdmGroupEmulate::runThread() {
+   typedef std::chrono::steady_clock clock;
+
+   std::vector<ris::FramePtr> frames;
+   std::unique_lock<std::mutex> lock(mtx_);
+   clock::time_point start = clock::now();
+   clock::time_point next = start;
+   clock::duration period;
+
    while (runEnable_) {
-      if ( reqCount_ > sequence_ ) genFrames();
-      else usleep(10);
+
+      // Requested readouts first
+      if ( ! reqTimes_.empty() ) {
+         uint64_t runTime = reqTimes_.front();
+         reqTimes_.pop_front();
+         genReadout(runTime, frames);
+
+         lock.unlock();
+         sendReadout(frames);
+         lock.lock();
+         continue;
+      }
+
+      if ( rate_ == 0.0 ) {
+         cond_.wait(lock);
+         continue;
+      }
+
+      period = std::chrono::duration_cast<clock::duration>(std::chrono::duration<double>(1.0 / rate_));
+
+      if ( rateChanged_ ) {
+         rateChanged_ = false;
+         next = clock::now();
+      }
+
+      clock::time_point now = clock::now();
+
+      if ( now < next ) {
+         cond_.wait_until(lock, next);
+         continue;
+      }
+
+      // Skip ahead rather than sending a burst when too far behind
+      if ( now - next > std::chrono::milliseconds(100) && period.count() > 0 ) {
+         uint64_t missed = (now - next) / period;
+         lateCount_ += missed;
+         next += period * missed;
+      }
+
+      genReadout((uint64_t)(std::chrono::duration<double>(next - start).count() * TimingClock), frames);
+      next += period;
+
+      lock.unlock();
+      sendReadout(frames);
+      lock.lock();
    }
 }
 
@@ -1,11 +1,21 @@
 #define __STDC_FORMAT_MACROS
+#define PY_ARRAY_UNIQUE_SYMBOL WARM_TDM_LIB_ARRAY_API
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
 #include <inttypes.h>
 #include <boost/python.hpp>
+#include <numpy/arrayobject.h>
 #include <TdmDataReceiver.h>
 #include <TdmGroupEmulate.h>
 
 BOOST_PYTHON_MODULE(warm_tdm_lib) {
    PyEval_InitThreads();
+
+   // Numpy C API, used for the TdmDataReceiver buffer views
+   if ( _import_array() < 0 ) {
+      printf("Failed to load module. numpy import failed\n");
+      return;
+   }
+
    try {
       warm_tdm_lib::TdmDataReceiver::setup_python();
       warm_tdm_lib::TdmGroupEmulate::setup_python();
@@ -24,6 +24,12 @@ class WarmTdmArgparse(argparse.ArgumentParser):
             action = 'store_true',
             default = False)
 
+        self.add_argument(
+            "--dataExport",
+            action = 'store_true',
+            default = False,
+            help = 'Add the DataExport HDF5/Zarr writer next to the DataWriter')
+
         self.add_argument(
             "--ip",
             type     = str,
@@ -125,6 +131,7 @@ def arg_dict(args):
     ret['pollEn'] = args.pollEn
     ret['simulation'] = args.sim
     ret['emulate'] = args.emulate
+    ret['dataExport'] = args.dataExport
     ret['numRowSelects'] = args.numRowSelects
     ret['numChipSelects'] = args.numChipSelects
 #    ret['numRows'] = args.maxRows
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+
+
+class ArrayPid():
+    """ PID controller operating on an array of independent channels.
+
+    Follows the same update rules as simple_pid.PID (proportional on error,
+    derivative on measurement, integral and output clamped to output_limits)
+    but keeps the state for every channel in numpy arrays so that all
+    channels are updated in a single call.
+
+    Parameters
+    ----------
+    kp, ki, kd : float
+        PID coefficients, shared by all channels
+    size : int
+        Number of channels
+    setpoint : float
+        Target value for every channel
+    output_limits : tuple
+        (low, high) clamp applied to the integral term and the output.
+        None disables that side of the clamp.
+    """
+
+    def __init__(self, kp, ki, kd, size, setpoint=0.0, output_limits=(None, None)):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.size = size
+        self.setpoint = setpoint
+        self.output_limits = output_limits
+        self.reset()
+
+    def reset(self):
+        self._integral = np.zeros(self.size, np.float64)
+        self._lastInput = np.full(self.size, np.nan, np.float64)
+        self._lastTime = np.full(self.size, time.monotonic(), np.float64)
+
+    def _clamp(self, value):
+        low, high = self.output_limits
+        return np.clip(value,
+                       -np.inf if low is None else low,
+                       np.inf if high is None else high)
+
+    def __call__(self, inputs, active=None):
+        """Returns an array of outputs, one per channel.
+        Channels where active is False are not updated and return 0.
+        """
+        inputs = np.asarray(inputs, np.float64)
+        if active is None:
+            active = np.ones(self.size, bool)
+
+        now = time.monotonic()
+        dt = now - self._lastTime
+        dt[dt <= 0.0] = 1e-16
+
+        error = self.setpoint - inputs
+        dInput = np.where(np.isnan(self._lastInput), 0.0, inputs - self._lastInput)
+
+        integral = self._clamp(self._integral + self.ki * error * dt)
+        output = self._clamp((self.kp * error) + integral - (self.kd * dInput / dt))
+
+        # Only commit state for the channels that were updated
+        self._integral = np.where(active, integral, self._integral)
+        self._lastInput = np.where(active, inputs, self._lastInput)
+        self._lastTime = np.where(active, now, self._lastTime)
+
+        return np.where(active, output, 0.0)
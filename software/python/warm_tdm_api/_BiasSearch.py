@@ -0,0 +1,141 @@
+import pyrogue as pr
+import numpy as np
+
+
+def addBiasSearchVariables(process):
+    """Add the bias search configuration variables to a tuning process"""
+
+    process.add(pr.LocalVariable(
+        name='BiasSearchMode',
+        value=0,
+        enum={0: 'Linear', 1: 'EarlyStop', 2: 'GoldenSection'},
+        mode='RW',
+        description='How the bias steps are chosen. Linear sweeps every bias step. '
+                    'EarlyStop sweeps the bias steps in order and stops each column once its peak to peak amplitude '
+                    'has fallen for BiasSearchPatience steps past the largest amplitude seen. '
+                    'GoldenSection treats the amplitude as a unimodal function of bias and runs a golden section search '
+                    'over the bias steps of each column. Columns are searched in lockstep, each column at its own bias.'))
+
+    process.add(pr.LocalVariable(
+        name='BiasSearchPatience',
+        value=1,
+        minimum=1,
+        mode='RW',
+        description='Number of consecutive bias steps with a smaller amplitude than the maximum before EarlyStop ends a column.'))
+
+    process.add(pr.LocalVariable(
+        name='BiasSearchSteps',
+        value=0,
+        mode='RO',
+        description='Number of feedback sweeps run by the bias search in the last run.'))
+
+
+def _linear(numSteps, values):
+    yield from range(numSteps)
+
+
+def _earlyStop(numSteps, values, patience):
+    best = -np.inf
+    worse = 0
+    for i in range(numSteps):
+        yield i
+        if values[i] > best:
+            best = values[i]
+            worse = 0
+        else:
+            worse += 1
+            if worse >= patience:
+                return
+
+
+def _goldenSection(numSteps, values):
+    # Golden section search for a maximum on the integer grid 0..numSteps-1.
+    # The maximum is kept inside [a, b], evaluated points are reused.
+    a, b = 0, numSteps - 1
+    ratio = (np.sqrt(5.0) - 1.0) / 2.0
+
+    while b - a > 2:
+        c = a + int(round((1.0 - ratio) * (b - a)))
+        d = a + int(round(ratio * (b - a)))
+        c = min(max(c, a + 1), b - 2)
+        d = min(max(d, c + 1), b - 1)
+
+        for i in (c, d):
+            if i not in values:
+                yield i
+
+        if values[c] >= values[d]:
+            b = d
+        else:
+            a = c
+
+    # Finish with the remaining points of the bracket
+    for i in range(a, b + 1):
+        if i not in values:
+            yield i
+
+
+class BiasSearch():
+    """Chooses the bias step to sweep next for every column.
+
+    Each enabled column runs its own search over the bias step indices 0..numSteps-1.
+    next() returns the step index of every column for the next feedback sweep, with -1
+    for columns which are finished or disabled, and report() passes back the peak to peak
+    amplitude measured at those steps. Disabled columns are only stepped in Linear mode,
+    where every column follows the same index as in a plain bias sweep.
+    """
+
+    MODES = ['Linear', 'EarlyStop', 'GoldenSection']
+
+    def __init__(self, *, mode, numSteps, enable, patience=1):
+        if mode not in BiasSearch.MODES:
+            raise ValueError(f'Unknown bias search mode {mode}')
+
+        self.mode = mode
+        self.values = [dict() for _ in enable]
+        self.steps = 0
+        self._pending = np.full(len(enable), -1, int)
+        self._searches = []
+
+        for col, en in enumerate(enable):
+            if mode == 'Linear':
+                self._searches.append(_linear(numSteps, self.values[col]))
+            elif not en:
+                self._searches.append(None)
+            elif mode == 'EarlyStop':
+                self._searches.append(_earlyStop(numSteps, self.values[col], patience))
+            else:
+                self._searches.append(_goldenSection(numSteps, self.values[col]))
+
+    @staticmethod
+    def create(*, process, numSteps, enable):
+        """Returns the BiasSearch configured by the process variables"""
+        if process is None:
+            return BiasSearch(mode='Linear', numSteps=numSteps, enable=enable)
+        return BiasSearch(
+            mode=process.BiasSearchMode.valueDisp(),
+            numSteps=numSteps,
+            enable=enable,
+            patience=process.BiasSearchPatience.value())
+
+    def next(self):
+        """Returns the array of step indices to sweep next, or None when every column is finished"""
+        for col, search in enumerate(self._searches):
+            self._pending[col] = -1
+            if search is None:
+                continue
+            try:
+                self._pending[col] = next(search)
+            except StopIteration:
+                self._searches[col] = None
+
+        if np.all(self._pending < 0):
+            return None
+
+        self.steps += 1
+        return self._pending.copy()
+
+    def report(self, peaks):
+        """Record the peak to peak amplitude of every column at the indices returned by next()"""
+        for col in np.flatnonzero(self._pending >= 0):
+            self.values[col][self._pending[col]] = peaks[col]
@@ -24,10 +24,15 @@ def plotCurveDataDict(ax, curveDataDict, ax_title, xlabel, ylabel, legend_title)
             return
 
         xValues = curveDataDict['xValues']
+        curveXValues = curveDataDict.get('curveXValues', None)
 
         # Plot each curve with heavier line for curve with highest amplitude
         for biasIndex, value in enumerate(curveDataDict['biasValues']):
-                
+            # Adaptive sweeps sample each curve at its own x positions
+            if curveXValues is not None:
+                xValues = curveXValues[biasIndex]
+
+
             linewidth = 1.0
             if biasIndex == curveDataDict['bestIndex']:
                 linewidth = 2.0
@@ -86,6 +91,7 @@ class CurveData():
             'xValues': self.xValues,
             'biasValues': np.array([c.bias for c in self.curveList], np.float32),
             'curves': [np.array(c.points, np.float32) for c in self.curveList],
+            'curveXValues': [np.array(self.xValues if c.xValues is None else c.xValues, np.float32) for c in self.curveList],
             'peaks': np.array([c.peakheight for c in self.curveList], np.float32),
             'phinots': np.array([c.phinot for c in self.curveList], np.float32),
             'minSlopePoints': np.array([c.min_slope_point for c in self.curveList], np.float32),
@@ -108,10 +114,14 @@ class CurveData():
 class Curve():
     #plotting offset as a function of FB, with each curve being a different bias
 
-    def __init__(self, bias):
+    def __init__(self, bias, xValues=None):
         self.bias = bias
         self.points = [] #np.zeros(parent.xValues.size, float)
 
+        # Curve specific x values, used when the curve was not
+        # sampled on the common CurveData grid (adaptive sweeps)
+        self.xValues = xValues
+
         # Calculated curve parameters
         self.phinot = 0.0
         self.peakheight = 0
@@ -125,9 +135,18 @@ class Curve():
         #print(f'bias curve {self.bias} - updatePeak()')
         np_points = np.array(self.points)
 
+        if self.xValues is not None:
+            xValues = np.asarray(self.xValues)
+
         # Use FFT to find phy_not
-        ff = np.fft.fftfreq(xValues.size, xValues[1]-xValues[0])
-        Fyy = abs(np.fft.fft(np_points))
+        # Non-uniform x values are resampled onto a uniform grid first
+        xUniform = np.linspace(xValues[0], xValues[-1], xValues.size)
+        if np.allclose(xValues, xUniform):
+            yUniform = np_points
+        else:
+            yUniform = np.interp(xUniform, xValues, np_points)
+        ff = np.fft.fftfreq(xUniform.size, xUniform[1]-xUniform[0])
+        Fyy = abs(np.fft.fft(yUniform))
         self.phinot = 1.0/abs(ff[np.argmax(Fyy[1:])+1])
 
         # Slice the curve for 1.25 phy_not
@@ -164,3 +183,263 @@ class Curve():
 
     def __repr__(self):
         return(str(self.bias) + ": " + str(self.points))
+
+
+def _interpBatch(xNew, x, y):
+    """Linear interpolation of each curve along the last axis.
+    Equivalent to np.interp applied to every curve, x must be increasing along the last axis.
+    """
+    shape = y.shape
+    n = shape[-1]
+    x = x.reshape(-1, n)
+    y = y.reshape(-1, n)
+    xNew = xNew.reshape(-1, n)
+    m = x.shape[0]
+
+    # Offset each curve so that all x values form a single increasing array
+    span = (x.max() - x.min()) + 1.0
+    offset = (np.arange(m) * span)[:, np.newaxis]
+    idx = np.searchsorted((x + offset).ravel(), (xNew + offset).ravel(), side='right') - 1
+    base = np.repeat(np.arange(m) * n, n)
+    idx = np.clip(idx, base, base + n - 2)
+
+    xf, yf = x.ravel(), y.ravel()
+    dx = xf[idx+1] - xf[idx]
+    t = np.divide(xNew.ravel() - xf[idx], dx, out=np.zeros_like(dx), where=dx != 0)
+    return (yf[idx] + t * (yf[idx+1] - yf[idx])).reshape(shape)
+
+
+class CurveArrayColumn():
+    """View of a single column of a CurveArray, with the same result attributes as CurveData"""
+
+    def __init__(self, parent, col):
+        self._parent = parent
+        self._col = col
+
+    @property
+    def biasOut(self):
+        return self._parent._result(self._parent.biasOut, self._col)
+
+    @property
+    def xOut(self):
+        return self._parent._result(self._parent.xOut, self._col)
+
+    @property
+    def yOut(self):
+        return self._parent._result(self._parent.yOut, self._col)
+
+    def asDict(self):
+        return self._parent.asDict(self._col)
+
+    def __repr__(self):
+        return str(self.asDict())
+
+
+class CurveArray():
+    """Columnar storage and analysis for a set of tuning curves.
+
+    Curves are held in preallocated (columns, biases, steps) arrays which are filled
+    one bias step at a time. update() analyzes every curve in a single batched pass,
+    producing the same results as Curve.updatePeak and CurveData.update.
+
+    Parameters
+    ----------
+    xValues : np.ndarray
+        (columns, steps) swept values, used for every bias unless replaced in setCurves()
+    biasValues : np.ndarray
+        (columns, biases) bias value of each curve
+    """
+
+    def __init__(self, xValues, biasValues):
+        self.xValues = np.asarray(xValues, np.float64)
+        self.biasValues = np.asarray(biasValues, np.float64)
+
+        columns, biases = self.biasValues.shape
+        steps = self.xValues.shape[-1]
+
+        self.curveX = np.repeat(self.xValues[:, np.newaxis, :], biases, axis=1)
+        self.curves = np.zeros((columns, biases, steps), np.float64)
+        self.valid = np.zeros((columns, biases), bool)
+        self.analyzed = np.zeros(biases, bool)
+
+        # Calculated curve parameters
+        self.phinots = np.zeros((columns, biases), np.float64)
+        self.peaks = np.zeros((columns, biases), np.float64)
+        self.minSlopePoints = np.zeros((columns, biases, 2), np.float64)
+        self.maxSlopePoints = np.zeros((columns, biases, 2), np.float64)
+        self.lowPoints = np.zeros((columns, biases, 2), np.float64)
+        self.highPoints = np.zeros((columns, biases, 2), np.float64)
+
+        # Selected operating point for each column
+        self.bestIndex = np.full(columns, -1, int)
+        self.biasOut = np.full(columns, np.nan)
+        self.xOut = np.full(columns, np.nan)
+        self.yOut = np.full(columns, np.nan)
+
+        # Peak to peak amplitude and phi0 of the selected curve
+        # phi0 is twice the spacing of the high and low points, which is a finer
+        # measure than the FFT estimate when only a short sweep is taken
+        self.bestPeak = np.full(columns, np.nan)
+        self.bestPhi0 = np.full(columns, np.nan)
+
+    def setCurves(self, biasIndex, points, xValues=None, enable=None):
+        """Store the curves of every column for one bias step.
+        biasIndex may also be an array with the bias index of each column, as used
+        by bias searches, columns with a negative index are not stored.
+        enable is an optional per column mask, disabled columns are excluded from the results.
+        """
+        if np.ndim(biasIndex) == 0:
+            self.curves[:, biasIndex] = points
+            if xValues is not None:
+                self.curveX[:, biasIndex] = xValues
+            self.valid[:, biasIndex] = True if enable is None else enable
+            return
+
+        biasIndex = np.asarray(biasIndex)
+        cols = np.flatnonzero(biasIndex >= 0)
+        idx = biasIndex[cols]
+        self.curves[cols, idx] = np.asarray(points)[cols]
+        if xValues is not None:
+            self.curveX[cols, idx] = np.asarray(xValues)[cols]
+        self.valid[cols, idx] = True if enable is None else np.asarray(enable, bool)[cols]
+
+    def update(self, biasIndex=None):
+        """Analyze the curves of every bias, or only those of biasIndex,
+        then select the best curve of each column among the analyzed biases.
+        biasIndex may be a single index or an array of indices, negative indices are ignored.
+        Bias steps can be analyzed while later bias steps are still being filled.
+        """
+        if biasIndex is None:
+            sl = slice(None)
+        elif np.ndim(biasIndex) == 0:
+            sl = slice(biasIndex, biasIndex+1)
+        else:
+            biasIndex = np.asarray(biasIndex)
+            sl = np.unique(biasIndex[biasIndex >= 0])
+            if len(sl) == 0:
+                return
+        x = self.curveX[:, sl]
+        y = self.curves[:, sl]
+        n = x.shape[-1]
+        if n < 2:
+            return
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Use FFT to find phy_not
+            # Non-uniform curves are resampled onto a uniform grid first
+            x0, x1 = x[..., :1], x[..., -1:]
+            xUniform = x0 + (x1 - x0) * np.linspace(0.0, 1.0, n)
+            uniform = np.all(np.isclose(x, xUniform), axis=-1)
+            if np.all(uniform):
+                yUniform = y
+            else:
+                yUniform = np.where(uniform[..., np.newaxis], y, _interpBatch(xUniform, x, y))
+
+            Fyy = np.abs(np.fft.rfft(yUniform, axis=-1))
+            k = np.argmax(Fyy[..., 1:], axis=-1) + 1
+            dx = (x1[..., 0] - x0[..., 0]) / (n - 1)
+            phinots = (n * dx) / k
+
+            # Window of 1.25 phy_not starting at x=0
+            # This finds min and max slope points closest to x=0
+            window = (x >= 0) & (x < phinots[..., np.newaxis] * 1.25)
+            short = window.sum(axis=-1) < 2
+            window[short] = True
+            lo = np.argmax(window, axis=-1)[..., np.newaxis]
+            hi = (n - np.argmax(window[..., ::-1], axis=-1))[..., np.newaxis]
+
+            # Second order central differences inside the window,
+            # first order differences at the window edges, as np.gradient does on a slice
+            fwd = np.diff(y, axis=-1) / np.diff(x, axis=-1)
+            grad = np.empty_like(y)
+            if n > 2:
+                hs = x[..., 1:-1] - x[..., :-2]
+                hd = x[..., 2:] - x[..., 1:-1]
+                grad[..., 1:-1] = (hs**2 * y[..., 2:] + (hd**2 - hs**2) * y[..., 1:-1] - hd**2 * y[..., :-2]) / (hs * hd * (hd + hs))
+            np.put_along_axis(grad, lo, np.take_along_axis(fwd, lo, axis=-1), axis=-1)
+            np.put_along_axis(grad, hi-1, np.take_along_axis(fwd, hi-2, axis=-1), axis=-1)
+
+        def _point(idx):
+            idx = idx[..., np.newaxis]
+            return np.stack((np.take_along_axis(x, idx, axis=-1)[..., 0],
+                             np.take_along_axis(y, idx, axis=-1)[..., 0]), axis=-1)
+
+        self.phinots[:, sl] = phinots
+        self.minSlopePoints[:, sl] = _point(np.argmin(np.where(window, grad, np.inf), axis=-1))
+        self.maxSlopePoints[:, sl] = _point(np.argmax(np.where(window, grad, -np.inf), axis=-1))
+        self.lowPoints[:, sl] = _point(np.argmin(np.where(window, y, np.inf), axis=-1))
+        self.highPoints[:, sl] = _point(np.argmax(np.where(window, y, -np.inf), axis=-1))
+        self.peaks[:, sl] = y.max(axis=-1) - y.min(axis=-1)
+        self.analyzed[sl] = True
+
+        # Find the best curve of each column
+        valid = self.valid & self.analyzed[np.newaxis, :]
+        found = np.any(valid, axis=1)
+        cols = np.arange(valid.shape[0])
+        best = np.argmax(np.where(valid, self.peaks, -np.inf), axis=1)
+        self.bestIndex = np.where(found, best, -1)
+        self.biasOut = np.where(found, self.biasValues[cols, best], np.nan)
+        self.xOut = np.where(found, self.maxSlopePoints[cols, best, 0], np.nan)
+        self.yOut = np.where(found, self.maxSlopePoints[cols, best, 1], np.nan)
+        self.bestPeak = np.where(found, self.peaks[cols, best], np.nan)
+        self.bestPhi0 = np.where(found, 2.0 * np.abs(self.highPoints[cols, best, 0] - self.lowPoints[cols, best, 0]), np.nan)
+
+    @staticmethod
+    def _result(arr, col):
+        return None if np.isnan(arr[col]) else float(arr[col])
+
+    def asDict(self, col):
+        """Returns the results of one column in the CurveData.asDict() format"""
+        idx = np.flatnonzero(self.valid[col] & self.analyzed)
+        best = self.bestIndex[col]
+        return {
+            'xValues': self.xValues[col],
+            'biasValues': self.biasValues[col, idx].astype(np.float32),
+            'curves': [self.curves[col, i].astype(np.float32) for i in idx],
+            'curveXValues': [self.curveX[col, i].astype(np.float32) for i in idx],
+            'peaks': self.peaks[col, idx].astype(np.float32),
+            'phinots': self.phinots[col, idx].astype(np.float32),
+            'minSlopePoints': self.minSlopePoints[col, idx].astype(np.float32),
+            'maxSlopePoints': self.maxSlopePoints[col, idx].astype(np.float32),
+            'lowPoints': self.lowPoints[col, idx].astype(np.float32),
+            'highPoints': self.highPoints[col, idx].astype(np.float32),
+            'bestIndex': None if best < 0 else int(np.searchsorted(idx, best)),
+            'biasOut': self._result(self.biasOut, col),
+            'xOut': self._result(self.xOut, col),
+            'yOut': self._result(self.yOut, col),
+        }
+
+    def asDicts(self):
+        return [self.asDict(col) for col in range(len(self))]
+
+    def asRecord(self):
+        """Returns the raw curve arrays and operating points, for checkpointing"""
+        return {
+            'xValues': self.xValues,
+            'biasValues': self.biasValues,
+            'curveX': self.curveX,
+            'curves': self.curves,
+            'valid': self.valid,
+            'biasOut': self.biasOut,
+            'xOut': self.xOut,
+            'yOut': self.yOut,
+        }
+
+    @classmethod
+    def fromRecord(cls, record):
+        """Rebuild and analyze a CurveArray from asRecord() output"""
+        ret = cls(xValues=record['xValues'], biasValues=record['biasValues'])
+        ret.curveX[:] = record['curveX']
+        ret.curves[:] = record['curves']
+        ret.valid[:] = record['valid']
+        ret.update()
+        return ret
+
+    def __len__(self):
+        return self.curves.shape[0]
+
+    def __getitem__(self, col):
+        return CurveArrayColumn(self, col)
+
+    def __iter__(self):
+        return (self[col] for col in range(len(self)))
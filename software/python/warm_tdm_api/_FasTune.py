@@ -127,6 +127,32 @@ class FasTuneProcess(pr.Process):
                                   mode='RW',
                                   description="Number of steps for Fas Flux Tuning"))
 
+        self.add(pr.LocalVariable(
+            name='ParallelRows',
+            value=False,
+            mode='RW',
+            description='When true, the FAS flux of all rows is tuned at once while the hardware cycles through the readout sequence. '
+                        'The FasOn value of every row is written into the row board memory at each step and the SA response of every row '
+                        'is read from the AdcDsp AccumError RAM.'))
+
+        self.add(pr.LocalVariable(
+            name='ParallelSampleDelay',
+            value=0.001,
+            mode='RW',
+            units='s',
+            description='Wait time between writing the FasOn values and reading AccumError in ParallelRows mode.'))
+
+        self.add(pr.LocalVariable(
+            name='FasParallelCalStep',
+            value=1.0,
+            mode='RW',
+            units=u'\u03bcA',
+            description='SaFb step used to measure the AccumError response of each row in ParallelRows mode. '
+                        'The response is used to express the curves as the SaFb value a servo would settle on.'))
+
+        # Tuning time breakdown
+        warm_tdm_api.addTuneTimingVariables(self)
+
         # FAS Tuning Results
         self.add(pr.LocalVariable(name='FasTuneOutput',
                                   hidden=True,
@@ -149,6 +175,6 @@ class FasTuneProcess(pr.Process):
             dependencies = [self.FasTuneOutput]))
 
     def _fasTuneWrap(self):
-        with self.root.updateGroup(0.25):
+        with self.root.updateGroup(0.25), warm_tdm_api.TuneTimer.get(self).run():
             ret = warm_tdm_api.fasTune(group=self.parent, process=self)
             self.FasTuneOutput.set(value=[r.asDict() for r in ret])
@@ -135,23 +135,47 @@ class FastDacVariable(GroupLinkVariable):
 
         super().__init__(disp = '{:0.04f}', **kwargs)
 
+    def _expand(self, value):
+        """Returns value as a full (cols, rows) array.
+        A scalar is used for every column and row, a 1D array holds one value per column
+        which is used for every row of that column, and a 2D array with fewer than 256
+        rows replaces only the first rows, the others keep their current values.
+        """
+        rows = 256 #self._config.numRows
+        cols = len(self._config.columnMap)
+        value = np.asarray(value, np.float64)
+
+        if value.ndim == 0:
+            return np.full((cols, rows), float(value))
+
+        if value.ndim == 1:
+            return np.repeat(value[:, np.newaxis], rows, axis=1)
+
+        if value.shape[1] == rows:
+            return value
+
+        ret = self._get(index=-1, read=False)
+        ret[:, :value.shape[1]] = value
+        return ret
+
     def _set(self, value, index, write):
-        print(f'{self.path}.set({value=}, {index=}')
         with self.parent.root.updateGroup():
 
             # index access
             if index != -1:
                 colIndex = index[0]
                 rowIndex = index[1]
-                print(f'{colIndex=}, {rowIndex=}')
                 self.dependencies[colIndex].set(value=value, index=rowIndex, write=write)
 
             # Full array access
+            # Each column is converted and assigned as a whole, then all columns are written together
             else:
-                for colIndex in range(self._config.numColumns):
-                    colBoard = self._config.columnMap[colIndex].board
-                    colChan = self._config.columnMap[colIndex].channel
-                    self.dependencies[colIndex].set(value=value[colIndex], index=-1, write=write)
+                value = self._expand(value)
+                for colIndex, var in enumerate(self.dependencies):
+                    var.set(value=value[colIndex], index=-1, write=False)
+
+                if write:
+                    pr.writeAndVerifyBlocks(self.depBlocks)
 
 
     def _get(self, index, read):
@@ -202,6 +226,7 @@ class Group(pr.Device):
                  num_chip_selects,
 #                 rows,
                  dataWriter,
+                 dataExport=None,
                  simulation=False,
                  emulate=False,
                  **kwargs):
@@ -230,6 +255,7 @@ class Group(pr.Device):
             groupId=groupId,
 #            frontEndClass=frontEndClass,
             dataWriter=dataWriter,
+            dataExport=dataExport,
             simulation=simulation,
             emulate=emulate,
             host=groupConfig.host,
@@ -817,6 +843,40 @@ class Group(pr.Device):
     #            linkedGet=self._fllEnableGet,
                 description="FLL Enable Control."))
 
+            # Stream based sweep acquisition
+            self.add(pr.LocalVariable(
+                name='StreamAcquire',
+                value=False,
+                mode='RW',
+                groups='TopApi',
+                description='When true, the open loop tuning sweeps sample each step from the DataReadout event stream '
+                            'of each column board instead of sleeping and reading SaOut. '
+                            'Requires a running readout (TimingTx StartRun). Ignored in emulation mode.'))
+
+            self.add(pr.LocalVariable(
+                name='StreamSettleReadouts',
+                value=2,
+                minimum=0,
+                mode='RW',
+                groups='TopApi',
+                description='Number of DataReadout frames to skip after each sweep step is written.'))
+
+            self.add(pr.LocalVariable(
+                name='StreamAverageReadouts',
+                value=1,
+                minimum=1,
+                mode='RW',
+                groups='TopApi',
+                description='Number of DataReadout frames averaged for each sweep step.'))
+
+            self.add(pr.LocalVariable(
+                name='StreamTimeout',
+                value=1.0,
+                mode='RW',
+                units='s',
+                groups='TopApi',
+                description='Maximum time to wait for the DataReadout frames of a sweep step.'))
+
             self.add(warm_tdm_api.ConfigSelect(self,groups=['NoDoc', 'NoConfig']))
 
             #############################################
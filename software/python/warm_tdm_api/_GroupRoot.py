@@ -1,11 +1,12 @@
 import pyrogue
 import pyrogue.utilities.fileio
 import pyrogue.interfaces.stream
+import warm_tdm
 import warm_tdm_api
 
 
 class GroupRoot(pyrogue.Root):
-    def __init__(self, colBoardClass, colFeClass, rowBoardClass, rowFeClass, numRowSelects, numChipSelects, groupConfig, simulation=False, emulate=False, **kwargs):
+    def __init__(self, colBoardClass, colFeClass, rowBoardClass, rowFeClass, numRowSelects, numChipSelects, groupConfig, simulation=False, emulate=False, dataExport=False, **kwargs):
         """
         Root class container for Warm-TDM Groups.
         Parameters
@@ -14,6 +15,8 @@ class GroupRoot(pyrogue.Root):
             Group configuration
         emulate: bool
            Flag to determine if emulation mode should be used
+        dataExport: bool
+           Add the DataExport HDF5/Zarr writer and connect it to the data streams
         """
 
         if simulation:
@@ -52,6 +55,14 @@ class GroupRoot(pyrogue.Root):
         self.DataWriter.MaxFileSize.addToGroup('NoDoc')
         self.DataWriter.CurrentSize.addToGroup('NoDoc')
 
+        # Columnar HDF5/Zarr copy of the same streams, only connected when enabled
+        # since every frame it receives goes through python
+        if dataExport:
+            self.add(warm_tdm.DataExportWriter(
+                name='DataExport',
+                configStream = {255: configStream},
+                groups=['NoConfig']))
+
         self.add(warm_tdm_api.Group(
             colBoardClass=colBoardClass,
             colFeClass=colFeClass,
@@ -63,6 +74,7 @@ class GroupRoot(pyrogue.Root):
             num_chip_selects=numChipSelects,
             expand=True,
             dataWriter=self.DataWriter,
+            dataExport=self.DataExport if dataExport else None,
             simulation=simulation,
             emulate=emulate))
 
@@ -14,7 +14,8 @@ class RunEmulate(pr.RunControl):
 
         while (self.runState.valueDisp() == 'Running'):
             time.sleep(1.0 / self.runRate.value())
-            ts = int(time.time() * 10000)
+            # Request timestamp in timing clock cycles, used as the readout runTime
+            ts = int(time.time() * 125.0e6)
 
             for kn,n in self.root.getNodes(typ=warm_tdm_api.TdmGroupEmulate).items():
                 n._request(ts)
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class SaFbServoModel():
+    """Linear model of SaOutAdc versus SaFb around the SA operating point, used by saFbServo to take Newton steps.
+
+    The initial slope of each column is the slope of the selected SA tuning curve at its
+    max slope point, read from SaTuneOutput. The curves are SaOut (mV) versus SaFb (uA), so the
+    slope is converted to SaOutAdc (V) with the gain of the column's SA amplifier model.
+    Newton steps are limited to a quarter of the curve's phi0 so that the servo stays on the same
+    side of the V-phi curve. The slope of each column is refined from the change measured on every step.
+    """
+
+    def __init__(self, *, group, process):
+        tune = group.SaTuneProcess.SaTuneOutput.value()
+        colCount = len(group.config.columnMap)
+
+        self.slope = np.full(colCount, np.nan)
+        self.maxStep = np.full(colCount, np.inf)
+
+        for col, m in enumerate(group.config.columnMap):
+            if col >= len(tune) or tune[col]['bestIndex'] is None:
+                continue
+
+            d = tune[col]
+            best = d['bestIndex']
+            x = np.asarray(d['curveXValues'][best] if 'curveXValues' in d else d['xValues'], np.float64)
+            y = np.asarray(d['curves'][best], np.float64)
+            if len(x) < 2:
+                continue
+
+            # SaOut slope in mV/uA at the tuned point
+            slope = np.gradient(y, x)[np.argmin(np.abs(x - d['xOut']))]
+
+            # SaOut (mV) per SaOutAdc (V), the amplifier model is affine in the ADC voltage
+            amp = group.HardwareGroup.ColumnBoard[m.board].AnalogFrontEnd.Channel[m.channel].SAAmp
+            gain = (amp.ampVin(1.0, 0.0) - amp.ampVin(0.0, 0.0)) * 1e3
+
+            if gain != 0.0 and slope != 0.0:
+                self.slope[col] = slope / gain
+                self.maxStep[col] = abs(d['phinots'][best]) / 4.0
+
+        if hasattr(process, 'ServoMaxDela'):
+            self.maxStep = np.minimum(self.maxStep, abs(process.ServoMaxDela.get()))
+
+    @staticmethod
+    def create(*, group, process):
+        """Returns a SaFbServoModel if the process is set to the Newton servo mode, otherwise None"""
+        if process is None or process.ServoMode.valueDisp() != 'Newton':
+            return None
+        return SaFbServoModel(group=group, process=process)
+
+    def ready(self, enable):
+        """True if every enabled column has a slope"""
+        return bool(np.all(np.isfinite(self.slope[np.asarray(enable, bool)])))
+
+    def step(self, adcs):
+        """Returns the SaFb change of every column which moves SaOutAdc to zero"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = -np.asarray(adcs, np.float64) / self.slope
+        return np.clip(np.nan_to_num(delta, nan=0.0, posinf=0.0, neginf=0.0), -self.maxStep, self.maxStep)
+
+    def learn(self, dFb, dAdc):
+        """Update the slopes with the SaOutAdc change measured for a SaFb change.
+        Measurements with a different sign or far from the current slope are ignored,
+        as they come from noise or from a step across a curve extreme.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            measured = np.asarray(dAdc, np.float64) / np.asarray(dFb, np.float64)
+            ratio = measured / self.slope
+        use = np.isfinite(ratio) & (ratio > 0.25) & (ratio < 4.0)
+        self.slope = np.where(use, measured, self.slope)
@@ -56,6 +56,12 @@ class SaOffsetProcess(pr.Process):
             mode='RW',
             description="Max number of loops for PID convergance"))
 
+        # Settle detection after each offset update
+        warm_tdm_api.addSettleVariables(self)
+
+        # Tuning time breakdown
+        warm_tdm_api.addTuneTimingVariables(self)
+
 
         # FAS Tuning Results
         self.add(pr.LocalVariable(
@@ -70,7 +76,7 @@ class SaOffsetProcess(pr.Process):
         self.WriteDevice.addToGroup('NoDoc')
 
     def _saOffsetWrap(self):
-        with self.root.updateGroup(0.25):
+        with self.root.updateGroup(0.25), warm_tdm_api.TuneTimer.get(self).run():
             ret = warm_tdm_api.saOffset(
                 group=self.parent,
                 process=self)
@@ -179,6 +185,17 @@ class SaOffsetSweepProcess(pr.Process):
                 except:
                     print('saOffset timed out')
                 
+                if warm_tdm_api.StreamSampler.enabled(group):
+                    fbValues = mask[:, np.newaxis] * np.asarray(fbPoints, np.float64)[np.newaxis, :]
+                    with warm_tdm_api.StreamSampler(group) as sampler:
+                        curves[i] = sampler.sweep(variable=group.SaFbForceCurrent, values=fbValues, process=self).T
+
+                    if self._runEn is False:
+                        self.Message.set('Stopped by user')
+                        return
+
+                    continue
+
                 for j, fb in enumerate(fbPoints):
                     saFb = mask * fb
                     group.SaFbForceCurrent.set(saFb)
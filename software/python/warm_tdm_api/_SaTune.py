@@ -88,6 +88,9 @@ class SaTuneProcess(pr.Process):
                                         'The resulting curves are available as a dictionary of numpy arrays.',
                             **kwargs)
 
+        # Set by the Resume command
+        self._resumeRequested = False
+
         # Low offset for SA FB Tuning
         self.add(pr.LocalVariable(name='SaFbLowOffset',
                                   value=0.0,
@@ -118,6 +121,33 @@ class SaTuneProcess(pr.Process):
                                   mode='RW',
                                   description="Wait time between FB set and SA Out sampling in seconds"))
 
+        self.add(pr.LocalVariable(
+            name='AdaptiveSweep',
+            value=False,
+            mode='RW',
+            description='When true, each SA FB sweep is done in two passes. A coarse pass over AdaptiveCoarseSteps of the SaFbNumSteps points '
+                        'locates phi0 and the curve extrema, then a fine pass samples AdaptiveRefineSteps of the remaining points '
+                        'closest to the max slope, high and low points.'))
+
+        self.add(pr.LocalVariable(
+            name='AdaptiveCoarseSteps',
+            minimum=2,
+            maximum=10000,
+            value=64,
+            mode='RW',
+            description='Number of evenly spaced SA FB points in the coarse pass of an adaptive sweep.'))
+
+        self.add(pr.LocalVariable(
+            name='AdaptiveRefineSteps',
+            minimum=0,
+            maximum=10000,
+            value=36,
+            mode='RW',
+            description='Number of SA FB points in the fine pass of an adaptive sweep, shared between the max slope, high and low points.'))
+
+        # Settle detection in place of SaFbSampleDelay
+        warm_tdm_api.addSettleVariables(self)
+
 
         # Low offset for SA Bias Tuning
         self.add(pr.LocalVariable(name='SaBiasLowOffset',
@@ -149,6 +179,28 @@ class SaTuneProcess(pr.Process):
             description='When true, sweep SA bias across the configured range. '
                         'When false, only take curves at the currently loaded SA bias values.'))
 
+        # Bias search in place of the linear bias sweep
+        warm_tdm_api.addBiasSearchVariables(self)
+
+        # Tuning time breakdown
+        warm_tdm_api.addTuneTimingVariables(self)
+
+        # Tune result cache and warm start
+        warm_tdm_api.addWarmStartVariables(self, biasWindow=10.0)
+
+        self.add(pr.LocalVariable(
+            name='CheckpointFile',
+            value='',
+            mode='RW',
+            description='Checkpoint journal file. When set, every completed bias step is appended to this file '
+                        'so that a stopped or crashed tune can be continued with the Resume command. Empty disables checkpointing.'))
+
+        self.add(pr.LocalCommand(
+            name='Resume',
+            function=self._resume,
+            description='Start the process, skipping the work already recorded in CheckpointFile. '
+                        'A new tune is started if the journal was written with different tuning parameters.'))
+
         # Set values after finish
         self.add(pr.LocalVariable(name='SetAfterFinish',
                                   value=False,
@@ -165,6 +217,7 @@ class SaTuneProcess(pr.Process):
                                               "This is a list of dictionaries, with one dictionary for each column in the system (ColumBoards * 8). "
                                               "Each dctionary contains the following fields: . "
                                               "xValues: x-axis values (SaFb) for each curve. "
+                                              "curveXValues: x-axis values (SaFb) of each individual curve, these differ from xValues for adaptive sweeps. "
                                               "biasValues: array of SaBias values, one for each SaBias step. "
                                               "curves: SaOffset vs SaFb curves, one for each SaBias value. "
                                               "biasOut: Selected SaBias value after fitting. "
@@ -247,14 +300,55 @@ class SaTuneProcess(pr.Process):
     def _saOutGet(self):
         return self._getHelper('yOut')
 
+    def _resume(self):
+        self._resumeRequested = True
+        self.Start()
+
+    def _journalParams(self):
+        group = self.parent
+        return {
+            'SaFbLowOffset': self.SaFbLowOffset.value(),
+            'SaFbHighOffset': self.SaFbHighOffset.value(),
+            'SaFbNumSteps': self.SaFbNumSteps.value(),
+            'AdaptiveSweep': self.AdaptiveSweep.value(),
+            'AdaptiveCoarseSteps': self.AdaptiveCoarseSteps.value(),
+            'AdaptiveRefineSteps': self.AdaptiveRefineSteps.value(),
+            'SaBiasLowOffset': self.SaBiasLowOffset.value(),
+            'SaBiasHighOffset': self.SaBiasHighOffset.value(),
+            'SaBiasNumSteps': self.SaBiasNumSteps.value(),
+            'DoBiasRamp': self.DoBiasRamp.value(),
+            'BiasSearchMode': self.BiasSearchMode.value(),
+            'BiasSearchPatience': self.BiasSearchPatience.value(),
+            'WarmStart': self.WarmStart.value(),
+            'TuneCacheFile': self.TuneCacheFile.value(),
+            'ColTuneEnable': list(group.ColTuneEnable.value()),
+        }
+
     def _saTuneWrap(self):
-        with self.root.updateGroup(0.25):
-            ret = warm_tdm_api.saTune(
-                group=self.parent,
-                process=self,
-                doSet=self.SetAfterFinish.value(),
-                doBiasRamp=self.DoBiasRamp.value())
-            self.SaTuneOutput.set(value=[r.asDict() for r in ret])
+        resume = self._resumeRequested
+        self._resumeRequested = False
+
+        journal = warm_tdm_api.TuneJournal.create(
+            filename=self.CheckpointFile.value(),
+            params=self._journalParams(),
+            resume=resume)
+
+        cache = warm_tdm_api.TuneCache.create(self.TuneCacheFile.value())
+        self.WarmStartResult.set('')
+
+        try:
+            with self.root.updateGroup(0.25), warm_tdm_api.TuneTimer.get(self).run():
+                ret = warm_tdm_api.saTune(
+                    group=self.parent,
+                    process=self,
+                    doSet=self.SetAfterFinish.value(),
+                    doBiasRamp=self.DoBiasRamp.value(),
+                    journal=journal,
+                    cache=cache)
+                self.SaTuneOutput.set(value=ret.asDicts())
+        finally:
+            if journal is not None:
+                journal.close()
 
     def _saveData(self,arg):
         print(f"SaTune - Save data called with {arg=}")
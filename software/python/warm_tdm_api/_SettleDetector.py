@@ -0,0 +1,110 @@
+import pyrogue as pr
+import numpy as np
+import time
+
+
+def addSettleVariables(process):
+    """Add the settle detector configuration and statistics variables to a tuning process"""
+
+    process.add(pr.LocalVariable(
+        name='SettleEnable',
+        value=False,
+        mode='RW',
+        description='When true, each tuning step reads SaOutAdc repeatedly and advances as soon as two consecutive '
+                    'readings agree within SettleTolerance on all enabled columns, instead of waiting a fixed delay.'))
+
+    process.add(pr.LocalVariable(
+        name='SettleTolerance',
+        value=0.001,
+        mode='RW',
+        units='V',
+        description='Maximum change in SaOutAdc between consecutive readings for a step to be considered settled.'))
+
+    process.add(pr.LocalVariable(
+        name='SettleMaxWait',
+        value=0.01,
+        mode='RW',
+        units='s',
+        description='Maximum time to wait for a step to settle. The last reading is used when it expires.'))
+
+    process.add(pr.LocalVariable(
+        name='SettleTimeMean',
+        value=0.0,
+        mode='RO',
+        units='s',
+        disp='{:0.6f}',
+        description='Mean settle time of the steps in the last run.'))
+
+    process.add(pr.LocalVariable(
+        name='SettleTimeMax',
+        value=0.0,
+        mode='RO',
+        units='s',
+        disp='{:0.6f}',
+        description='Longest settle time of the steps in the last run.'))
+
+    process.add(pr.LocalVariable(
+        name='SettleTimeouts',
+        value=0,
+        mode='RO',
+        description='Number of steps in the last run which hit SettleMaxWait.'))
+
+    process.add(pr.LocalVariable(
+        name='SettleSteps',
+        value=0,
+        mode='RO',
+        description='Number of settled steps in the last run.'))
+
+
+class SettleDetector():
+    """Waits for SaOutAdc to stop moving after a tuning step.
+    Keeps the settle time of every step so that statistics can be published on the process.
+    """
+
+    def __init__(self, *, group, process):
+        self._group = group
+        self._process = process
+        self._tolerance = process.SettleTolerance.get()
+        self._maxWait = process.SettleMaxWait.get()
+        self._mask = np.array(group.ColTuneEnable.value(), bool)
+        self._times = []
+        self._timeouts = 0
+
+    @staticmethod
+    def create(*, group, process):
+        """Returns a SettleDetector if settle detection is enabled on process, otherwise None"""
+        if process is None or not process.SettleEnable.get():
+            return None
+        return SettleDetector(group=group, process=process)
+
+    def wait(self):
+        """Returns the settled SaOutAdc array"""
+        start = time.monotonic()
+        last = self._group.SaOutAdc.get()
+
+        while True:
+            current = self._group.SaOutAdc.get()
+            elapsed = time.monotonic() - start
+
+            if np.all(np.abs(current - last)[self._mask] <= self._tolerance):
+                break
+
+            if elapsed >= self._maxWait:
+                self._timeouts += 1
+                break
+
+            last = current
+
+        self._times.append(elapsed)
+        return current
+
+    def publish(self):
+        """Update the settle statistics variables of the process"""
+        if len(self._times) == 0:
+            return
+
+        with self._process.root.updateGroup():
+            self._process.SettleTimeMean.set(float(np.mean(self._times)))
+            self._process.SettleTimeMax.set(float(np.max(self._times)))
+            self._process.SettleTimeouts.set(self._timeouts)
+            self._process.SettleSteps.set(len(self._times))
@@ -96,6 +96,9 @@ class Sq1TuneProcess(pr.Process):
         # Init master class
         pr.Process.__init__(self, function=self._sq1TuneWrap, **kwargs)
 
+        # Set by the Resume command
+        self._resumeRequested = False
+
         # Low offset for SQ1 FB Tuning
         self.add(pr.LocalVariable(
             name='Sq1FbLowOffset',
@@ -149,6 +152,30 @@ class Sq1TuneProcess(pr.Process):
             description='When true, sweep SQ1 bias across the configured range. '
                         'When false, only take curves at the currently loaded SQ1 bias values.'))
 
+        self.add(pr.LocalVariable(
+            name='ParallelRows',
+            value=False,
+            mode='RW',
+            description='When true, all rows are tuned at once while the hardware cycles through the readout sequence. '
+                        'Sq1Bias and Sq1Fb are written per row into the FastDac RAM and the open loop response of every row '
+                        'is read from the AdcDsp AccumError RAM. The servo settings are not used in this mode.'))
+
+        self.add(pr.LocalVariable(
+            name='ParallelSampleDelay',
+            value=0.001,
+            mode='RW',
+            units='s',
+            description='Wait time between writing the per row Sq1Fb values and reading AccumError in ParallelRows mode.'))
+
+        self.add(pr.LocalVariable(
+            name='ServoMode',
+            value=0,
+            enum={0: 'Pid', 1: 'Newton'},
+            mode='RW',
+            description='Pid runs a PID loop on SaFb for every column. Newton steps SaFb by SaOutAdc divided by the slope of the '
+                        'tuned SA curve at its operating point (from SaTuneOutput), which usually converges in one or two reads. '
+                        'Newton falls back to Pid when an enabled column has no SA tuning result.'))
+
         self.add(pr.LocalVariable(
             name='ServoKp',
             value=-0.8,
@@ -170,7 +197,8 @@ class Sq1TuneProcess(pr.Process):
         self.add(pr.LocalVariable(
             name = 'ServoMaxDela',
             value = 100.0,
-            units=u'\u03bcA',))
+            units=u'\u03bcA',
+            description='Largest SaFb step of the Newton servo. Steps are also limited to a quarter of the SA phi0.'))
 
         self.add(pr.LocalVariable(
             name='ServoPrecision',
@@ -191,6 +219,28 @@ class Sq1TuneProcess(pr.Process):
             mode='RW',
             description="Disable the servo and grab SaOutAdc directly"))
 
+        # Bias search in place of the linear bias sweep
+        warm_tdm_api.addBiasSearchVariables(self)
+
+        # Tuning time breakdown
+        warm_tdm_api.addTuneTimingVariables(self)
+
+        # Tune result cache and warm start
+        warm_tdm_api.addWarmStartVariables(self, biasWindow=15.0)
+
+        self.add(pr.LocalVariable(
+            name='CheckpointFile',
+            value='',
+            mode='RW',
+            description='Checkpoint journal file. When set, every completed row is appended to this file '
+                        'so that a stopped or crashed tune can be continued with the Resume command. Empty disables checkpointing.'))
+
+        self.add(pr.LocalCommand(
+            name='Resume',
+            function=self._resume,
+            description='Start the process, skipping the work already recorded in CheckpointFile. '
+                        'A new tune is started if the journal was written with different tuning parameters.'))
+
 
         # SQ1 Tuning Results
         self.add(pr.LocalVariable(
@@ -285,13 +335,54 @@ class Sq1TuneProcess(pr.Process):
     def _saFbGet(self):
         return self._getHelper('yOut')
 
+    def _resume(self):
+        self._resumeRequested = True
+        self.Start()
+
+    def _journalParams(self):
+        group = self.parent
+        return {
+            'Sq1FbLowOffset': self.Sq1FbLowOffset.value(),
+            'Sq1FbHighOffset': self.Sq1FbHighOffset.value(),
+            'Sq1FbNumSteps': self.Sq1FbNumSteps.value(),
+            'Sq1BiasLowOffset': self.Sq1BiasLowOffset.value(),
+            'Sq1BiasHighOffset': self.Sq1BiasHighOffset.value(),
+            'Sq1BiasNumSteps': self.Sq1BiasNumSteps.value(),
+            'DoBiasRamp': self.DoBiasRamp.value(),
+            'BiasSearchMode': self.BiasSearchMode.value(),
+            'BiasSearchPatience': self.BiasSearchPatience.value(),
+            'ServoDisable': self.ServoDisable.value(),
+            'ParallelRows': self.ParallelRows.value(),
+            'WarmStart': self.WarmStart.value(),
+            'TuneCacheFile': self.TuneCacheFile.value(),
+            'RowIndexOrderList': list(group.RowIndexOrderList.value()),
+            'ColTuneEnable': list(group.ColTuneEnable.value()),
+        }
+
     def _sq1TuneWrap(self):
-        with self.root.updateGroup(0.25):
-            ret = warm_tdm_api.sq1Tune(
-                group=self.parent,
-                process=self,
-                doBiasRamp=self.DoBiasRamp.value())
-        self.Sq1TuneOutput.set(value = [[col.asDict() for col in row] for row in ret])
+        resume = self._resumeRequested
+        self._resumeRequested = False
+
+        journal = warm_tdm_api.TuneJournal.create(
+            filename=self.CheckpointFile.value(),
+            params=self._journalParams(),
+            resume=resume)
+
+        cache = warm_tdm_api.TuneCache.create(self.TuneCacheFile.value())
+        self.WarmStartResult.set('')
+
+        try:
+            with self.root.updateGroup(0.25), warm_tdm_api.TuneTimer.get(self).run():
+                ret = warm_tdm_api.sq1Tune(
+                    group=self.parent,
+                    process=self,
+                    doBiasRamp=self.DoBiasRamp.value(),
+                    journal=journal,
+                    cache=cache)
+        finally:
+            if journal is not None:
+                journal.close()
+        self.Sq1TuneOutput.set(value = [row.asDicts() for row in ret])
         print('SQ1Tune Output')
         print(self.Sq1TuneOutput.value())
 
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class StreamSampler():
+    """Samples the per column DSP output from the DataReadout event streams of every column board.
+
+    Used by the tuning sweeps in place of a sleep and a SaOut register read at each step.
+    Only readouts issued after a step has been written are used for that step.
+    The DSPs are switched to the AccumError output mode for the duration of the sweep,
+    and the stream values are mapped onto SaOut units with an affine calibration
+    against SaOut register reads at two points of each sweep.
+    """
+
+    def __init__(self, group):
+        self._group = group
+        self._columnMap = group.config.columnMap
+        self._collectors = group.HardwareGroup.readoutCollectors
+        self._dsps = [group.HardwareGroup.ColumnBoard[board].DataPath.AdcDsp[i]
+                      for board in range(group.config.columnBoards) for i in range(8)]
+        self._settle = group.StreamSettleReadouts.get()
+        self._average = group.StreamAverageReadouts.get()
+        self._timeout = group.StreamTimeout.get()
+        self._outputModes = None
+
+    @staticmethod
+    def enabled(group):
+        """Returns True if stream acquisition is requested and every column board has a collector"""
+        boards = group.config.columnBoards
+        return group.StreamAcquire.get() and boards > 0 and len(group.HardwareGroup.readoutCollectors) == boards
+
+    def __enter__(self):
+        self._outputModes = [dsp.OutputMode.getDisp() for dsp in self._dsps]
+        for dsp in self._dsps:
+            dsp.OutputMode.setDisp('AccumError')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for dsp, mode in zip(self._dsps, self._outputModes):
+            dsp.OutputMode.setDisp(mode)
+
+    def sample(self):
+        """Returns the raw stream value of every column, from readouts issued after the call"""
+        markers = [c.marker() for c in self._collectors]
+        boards = [c.average(after=m + self._settle, count=self._average, timeout=self._timeout)
+                  for c, m in zip(self._collectors, markers)]
+
+        ret = np.zeros(len(self._columnMap), np.float64)
+        for idx, m in enumerate(self._columnMap):
+            ret[idx] = boards[m.board][m.channel]
+        return ret
+
+    def sweep(self, *, variable, values, process=None, overRange=None, recover=None):
+        """Returns a (columns, steps) array of calibrated SaOut values.
+        Sets variable to values[:, step] for each step and samples the streams.
+        overRange is an optional function called after each step which returns True when the
+        step is out of range. recover is then called and the step is repeated once. The steps
+        before it are calibrated first, as recover may move the stream values.
+        When the process is stopped only the steps done are calibrated, the others are left at 0.
+        """
+        colCount, numSteps = values.shape
+        raw = np.zeros((colCount, numSteps), np.float64)
+        ret = np.zeros((colCount, numSteps), np.float64)
+        start = 0
+        step = 0
+
+        while step < numSteps:
+            variable.set(values[:, step])
+            raw[:, step] = self.sample()
+
+            if overRange is not None and overRange():
+                if step > start:
+                    ret[:, start:step] = self.calibrate(raw=raw[:, start:step], variable=variable, values=values[:, start:step])
+                    variable.set(values[:, step])
+                start = step
+
+                if recover is not None:
+                    recover()
+                raw[:, step] = self.sample()
+
+            step += 1
+
+            if process is not None:
+                process._incrementSteps(1)
+                if process._runEn is False:
+                    break
+
+        if step > start:
+            ret[:, start:step] = self.calibrate(raw=raw[:, start:step], variable=variable, values=values[:, start:step])
+        return ret
+
+    def calibrate(self, *, raw, variable, values):
+        """Returns raw converted to SaOut units.
+        The steps with the lowest and highest stream value of each column are revisited
+        and SaOut is read there to get the gain and offset of each column.
+        variable is left at the last step of values.
+        """
+        cols = np.arange(raw.shape[0])
+        ref = []
+        for step in (raw.argmin(axis=1), raw.argmax(axis=1)):
+            variable.set(values[cols, step])
+            ref.append((self.sample(), self._group.SaOut.get()))
+
+        variable.set(values[:, -1])
+
+        (sLow, vLow), (sHigh, vHigh) = ref
+        span = sHigh - sLow
+        gain = np.divide(vHigh - vLow, span, out=np.zeros_like(span), where=span != 0)
+        offset = vLow - gain * sLow
+
+        return raw * gain[:, np.newaxis] + offset[:, np.newaxis]
@@ -12,15 +12,30 @@
 # copied, modified, propagated, or distributed except according to the terms
 # contained in the LICENSE.txt file.
 #-----------------------------------------------------------------------------
+import collections
+
 import pyrogue as pr
 import warm_tdm_lib
 
+ReadoutBlock = collections.namedtuple('ReadoutBlock', ['start', 'depth', 'values', 'readoutCount', 'rowSeqCount', 'runTime'])
+
 class TdmDataReceiver(pr.Device):
+    """Decodes DataReadout frames into a (depth, rows, cols) float32 ring buffer in C++.
+
+    pending() returns numpy views of the unread readouts without copying them. The views
+    share memory with the ring buffer, so the readouts must be used or copied before they are
+    passed to release(). If the reader falls behind the writer overwrites the oldest unread
+    readouts, including ones already returned by pending(). valid() and release() tell whether
+    a block was overwritten, check them after the block has been used and discard the results
+    if it was. Overwritten readouts are counted in OverrunCount, malformed frames in DropCount
+    and samples outside of the buffer rows and cols in SampleDropCount.
+    """
 
-    def __init__(self, **kwargs ):
+    def __init__(self, depth=1024, rows=256, cols=8, **kwargs ):
         pr.Device.__init__(self, **kwargs)
 
         self._processor = warm_tdm_lib.TdmDataReceiver()
+        self._processor.configure(depth, rows, cols)
 
         self.add(pr.LocalVariable(name='FrameCount', description='Frame Count',
                                   mode='RO', value=0, pollInterval=1,
@@ -30,6 +45,65 @@ class TdmDataReceiver(pr.Device):
                                   mode='RO', value=0, pollInterval=1,
                                   localGet=lambda : self._processor.getRxByteCount()))
 
+        self.add(pr.LocalVariable(name='ReadoutIndex', description='Number of readouts written to the ring buffer',
+                                  mode='RO', value=0, pollInterval=1,
+                                  localGet=lambda : self._processor.getWriteIndex()))
+
+        self.add(pr.LocalVariable(name='DropCount', description='Frames dropped because of a frame error or a bad size',
+                                  mode='RO', value=0, pollInterval=1,
+                                  localGet=lambda : self._processor.getDropCount()))
+
+        self.add(pr.LocalVariable(name='OverrunCount', description='Unread readouts overwritten in the ring buffer',
+                                  mode='RO', value=0, pollInterval=1,
+                                  localGet=lambda : self._processor.getOverrunCount()))
+
+        self.add(pr.LocalVariable(name='SampleDropCount', description='Samples dropped because their row or col is outside of the ring buffer',
+                                  mode='RO', value=0, pollInterval=1,
+                                  localGet=lambda : self._processor.getSampleDropCount()))
+
+    @property
+    def depth(self):
+        return self._processor.getDepth()
+
+    def values(self):
+        """Returns the whole (depth, rows, cols) ring buffer, readout index i is at i % depth"""
+        return self._processor.getValues()
+
+    def pending(self):
+        """Returns a list of ReadoutBlock views of the unread readouts, oldest first.
+        There are two blocks when the unread readouts wrap around the end of the ring buffer.
+        """
+        values, readoutCount, rowSeqCount, runTime, start, stop = self._processor.getBuffers()
+        depth = len(values)
+
+        ret = []
+        while start < stop:
+            first = start % depth
+            last = min(first + (stop - start), depth)
+            ret.append(ReadoutBlock(
+                start = start,
+                depth = depth,
+                values = values[first:last],
+                readoutCount = readoutCount[first:last],
+                rowSeqCount = rowSeqCount[first:last],
+                runTime = runTime[first:last]))
+            start += last - first
+        return ret
+
+    def valid(self, block):
+        """Returns True if no readout of block has been overwritten since pending() returned it.
+        A readout slot is reused when the readout depth places later is written.
+        """
+        return self._processor.getWriteIndex() < block.start + block.depth
+
+    def release(self, block):
+        """Mark the readouts of block, and all readouts before it, as read.
+        Returns valid(block), False if the block was overwritten while it was in use.
+        """
+        ret = self.valid(block)
+        self._processor.release(block.start + len(block.values))
+        return ret
+
     def countReset(self):
         self._processor.countReset()
         super().countReset()
@@ -40,4 +114,3 @@ class TdmDataReceiver(pr.Device):
     def __lshift__(self,other):
         pr.streamConnect(other,self)
         return other
-
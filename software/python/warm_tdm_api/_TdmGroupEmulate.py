@@ -16,11 +16,21 @@ import pyrogue as pr
 import warm_tdm_lib
 
 class TdmGroupEmulate(pr.Device):
+    """Emulated DataReadout frames of the column boards of a group.
+
+    Readouts are sent at Rate Hz by a timer in warm_tdm_lib, or one per _request() when
+    Rate is 0. The Signal variables set the signal model of every row, setRowModel()
+    sets the model of a single row.
+    """
+
+    # Signal models of warm_tdm_lib.TdmGroupEmulate
+    MODELS = {0: 'Noise', 1: 'Sine', 2: 'Step'}
 
     def __init__(self, *, groupId, **kwargs ):
         pr.Device.__init__(self, **kwargs)
 
         self._processor = warm_tdm_lib.TdmGroupEmulate(groupId)
+        self._model = {'model': 1, 'offset': 0.0, 'amplitude': 1.0, 'frequency': 1.0, 'noise': 0.01}
 
         self.add(pr.LocalVariable(name='FrameCount', description='Frame Count',
                                   mode='RO', value=0, pollInterval=1,
@@ -40,6 +50,48 @@ class TdmGroupEmulate(pr.Device):
                                   localGet=lambda : self._processor.getNumRows(),
                                   localSet=lambda value: self._processor.setNumRows(value)))
 
+        self.add(pr.LocalVariable(name='Rate', description='Readout rate of the timer, 0 sends readouts on request only',
+                                  mode='RW', value=0.0, units='Hz',
+                                  localGet=lambda : self._processor.getRate(),
+                                  localSet=lambda value: self._processor.setRate(value)))
+
+        self.add(pr.LocalVariable(name='ReadoutCount', description='Readouts sent',
+                                  mode='RO', value=0, pollInterval=1,
+                                  localGet=lambda : self._processor.getReadoutCount()))
+
+        self.add(pr.LocalVariable(name='LateCount', description='Timer readouts skipped and requests dropped because the generator fell behind',
+                                  mode='RO', value=0, pollInterval=1,
+                                  localGet=lambda : self._processor.getLateCount()))
+
+        self.add(pr.LocalVariable(name='SignalModel', description='Signal model of all rows', mode='RW',
+                                  value=1, enum=self.MODELS,
+                                  localSet=lambda value: self._setModels(model=value)))
+
+        self.add(pr.LocalVariable(name='SignalOffset', description='Signal offset of all rows', mode='RW',
+                                  value=0.0,
+                                  localSet=lambda value: self._setModels(offset=value)))
+
+        self.add(pr.LocalVariable(name='SignalAmplitude', description='Sine or step amplitude of all rows', mode='RW',
+                                  value=1.0,
+                                  localSet=lambda value: self._setModels(amplitude=value)))
+
+        self.add(pr.LocalVariable(name='SignalFrequency', description='Sine or step frequency of all rows', mode='RW',
+                                  value=1.0, units='Hz',
+                                  localSet=lambda value: self._setModels(frequency=value)))
+
+        self.add(pr.LocalVariable(name='SignalNoise', description='Gaussian noise sigma of all rows', mode='RW',
+                                  value=0.01,
+                                  localSet=lambda value: self._setModels(noise=value)))
+
+    def _setModels(self, **kwargs):
+        self._model.update(kwargs)
+        m = self._model
+        self._processor.setAllRowModels(m['model'], m['offset'], m['amplitude'], m['frequency'], m['noise'])
+
+    def setRowModel(self, row, model, offset=0.0, amplitude=0.0, frequency=0.0, noise=0.0):
+        """Set the signal model of one row, model is a key of MODELS"""
+        self._processor.setRowModel(row, model, offset, amplitude, frequency, noise)
+
     def _start(self):
         self._processor._start()
 
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+
+import pyrogue as pr
+import numpy as np
+
+
+def addWarmStartVariables(process, *, biasWindow):
+    """Add the tune cache and warm start configuration variables to a tuning process"""
+
+    process.add(pr.LocalVariable(
+        name='TuneCacheFile',
+        value='',
+        mode='RW',
+        description='Tune result cache file. When set, the operating point of every tuned column (and row) is stored '
+                    'in this file after each tune, keyed by group, front end type, column and row. Empty disables the cache.'))
+
+    process.add(pr.LocalVariable(
+        name='WarmStart',
+        value=False,
+        mode='RW',
+        description='When true, columns with an operating point in TuneCacheFile are tuned over a narrowed window '
+                    'around the cached bias and feedback values. A full sweep is run if the narrowed curves fail the quality check.'))
+
+    process.add(pr.LocalVariable(
+        name='WarmStartBiasWindow',
+        value=biasWindow,
+        mode='RW',
+        units=u'\u03bcA',
+        description='Half width of the bias window around the cached bias point. '
+                    'The bias step size of the full sweep is kept.'))
+
+    process.add(pr.LocalVariable(
+        name='WarmStartFbPeriods',
+        value=1.5,
+        mode='RW',
+        description='Length of the narrowed feedback window, in units of the cached phi0. '
+                    'The window starts at the low offset of the full sweep and keeps its step size.'))
+
+    process.add(pr.LocalVariable(
+        name='WarmStartMinPeak',
+        value=0.8,
+        mode='RW',
+        description='Minimum ratio of the narrowed peak to peak amplitude to the cached amplitude.'))
+
+    process.add(pr.LocalVariable(
+        name='WarmStartPhi0Tolerance',
+        value=0.2,
+        mode='RW',
+        description='Maximum fractional difference between the narrowed and cached phi0. '
+                    'phi0 is measured as twice the spacing of the high and low points of the selected curve.'))
+
+    process.add(pr.LocalVariable(
+        name='WarmStartResult',
+        value='',
+        mode='RO',
+        description='Outcome of the warm start in the last run.'))
+
+
+class TuneCache():
+    """Persistent store of tuned operating points.
+
+    The cache is a JSON file holding one entry per column (SA tuning) or per column and
+    row (SQ1 tuning). Each entry holds the selected bias and feedback points along with
+    the peak to peak amplitude and phi0 of the selected curve, which are used to check
+    that a warm started tune found the same operating point.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(filename):
+            try:
+                with open(filename, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f'Could not read tune cache {filename}, starting a new cache')
+
+    @staticmethod
+    def create(filename):
+        """Returns a TuneCache, or None if filename is empty"""
+        if filename is None or filename == '':
+            return None
+        return TuneCache(filename)
+
+    @staticmethod
+    def key(group, col, row=None):
+        """Returns the cache key of a column, or of a column and row"""
+        m = group.config.columnMap[col]
+        frontEnd = type(group.HardwareGroup.ColumnBoard[m.board].AnalogFrontEnd).__name__
+        key = f'{group.path}/{frontEnd}/col{col}'
+        if row is not None:
+            key += f'/row{row}'
+        return key
+
+    def get(self, key):
+        """Returns the cached entry for key or None"""
+        with self._lock:
+            return self.entries.get(key)
+
+    def lookup(self, group, cols, row=None):
+        """Returns the entries of the listed columns, or None if any of them is missing"""
+        entries = [self.get(TuneCache.key(group, col, row)) for col in cols]
+        return None if any(e is None for e in entries) else entries
+
+    def update(self, group, results, enable, row=None):
+        """Store the operating points of the enabled columns of a CurveArray"""
+        with self._lock:
+            for col in np.flatnonzero(enable):
+                if results.bestIndex[col] < 0:
+                    continue
+                self.entries[TuneCache.key(group, col, row)] = {
+                    'biasOut': float(results.biasOut[col]),
+                    'xOut': float(results.xOut[col]),
+                    'yOut': float(results.yOut[col]),
+                    'peak': float(results.bestPeak[col]),
+                    'phi0': float(results.bestPhi0[col]),
+                }
+
+    def save(self):
+        """Write the cache, replacing the file only once it is complete"""
+        with self._lock:
+            tmp = self.filename + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.filename)
+
+
+def warmStartRanges(*, entries, biasLow, biasHigh, numBiasSteps, fbLow, fbHigh, numFbSteps, biasWindow, fbPeriods):
+    """Returns narrowed (biasRange, fbRange) arrays from the cache entries of every column.
+
+    Every column gets its own bias window centered on its cached bias, using the bias step of the full sweep
+    and shifted as needed to stay inside the full bias range.
+    The feedback window keeps the low end and step size of the full sweep, and is long enough to hold
+    fbPeriods of the largest cached phi0, so the curve analysis sees the same points it would in a full sweep.
+    Columns without an entry (columns not enabled for tuning) get the window at the low end of the bias range.
+    """
+    lo, hi = min(biasLow, biasHigh), max(biasLow, biasHigh)
+    biasStep = (hi - lo) / (numBiasSteps - 1) if numBiasSteps > 1 else 0.0
+    nb = min(2 * int(np.ceil(biasWindow / biasStep)) + 1, numBiasSteps) if biasStep > 0.0 else 1
+    half = biasStep * (nb // 2)
+    centers = np.clip([lo if e is None else e['biasOut'] for e in entries], lo + half, hi - half)
+    biasRange = centers[:, np.newaxis] + biasStep * (np.arange(nb) - nb // 2)[np.newaxis, :]
+
+    fullFb = np.linspace(fbLow, fbHigh, numFbSteps, endpoint=True)
+    fbEnd = fbLow + fbPeriods * max(e['phi0'] for e in entries if e is not None)
+    nf = min(max(int(np.searchsorted(fullFb, fbEnd, side='right')), 2), numFbSteps)
+    fbRange = np.repeat(fullFb[np.newaxis, :nf], len(entries), axis=0)
+
+    return biasRange, fbRange
+
+
+def warmStartCheck(*, results, entries, cols, biasLow, biasHigh, minPeak, phi0Tolerance):
+    """Returns a boolean array, true for each column in cols whose narrowed result passes the quality check.
+
+    The peak to peak amplitude of the selected curve must be at least minPeak of the cached amplitude
+    and its phi0 must be within phi0Tolerance of the cached phi0. The selected bias must also not be at
+    the edge of the narrowed bias window, unless that is the edge of the full bias range, as the best
+    bias may then lie outside the window.
+    """
+    lo, hi = min(biasLow, biasHigh), max(biasLow, biasHigh)
+    ok = np.zeros(len(cols), bool)
+
+    for i, (col, e) in enumerate(zip(cols, entries)):
+        best = results.bestIndex[col]
+        if best < 0:
+            continue
+
+        biases = results.biasValues[col]
+        bias = biases[best]
+        edge = len(biases) > 2 and (best == 0 or best == len(biases)-1) and not (np.isclose(bias, lo) or np.isclose(bias, hi))
+
+        peak = results.bestPeak[col]
+        phi0 = results.bestPhi0[col]
+        ok[i] = (not edge and
+                 peak >= minPeak * e['peak'] and
+                 abs(phi0 - e['phi0']) <= phi0Tolerance * abs(e['phi0']))
+
+    return ok
@@ -0,0 +1,79 @@
+import os
+import pickle
+import threading
+
+import numpy as np
+
+
+def _sameParams(a, b):
+    if a.keys() != b.keys():
+        return False
+    return all(np.array_equal(np.asarray(a[k]), np.asarray(b[k])) for k in a)
+
+
+class TuneJournal():
+    """Append-only checkpoint journal of a tuning run.
+
+    The file is a sequence of np.save() records. The first record is a header
+    holding the tuning parameters, each following record is a dictionary describing
+    one completed unit of work (a bias step or a row). Every record is flushed to
+    disk as it is written, so a tune interrupted by a stop or a crash can be resumed
+    by reading the records back and skipping the work they describe.
+    """
+
+    def __init__(self, *, filename, params, resume=False):
+        self.filename = filename
+        self.params = params
+        self.records = []
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(filename):
+            records = TuneJournal.read(filename)
+            if len(records) > 0 and records[0].get('type') == 'header' and _sameParams(records[0]['params'], params):
+                self.records = records[1:]
+                print(f'Resuming from {filename} with {len(self.records)} checkpoint records')
+            else:
+                print(f'Tuning parameters do not match {filename}, starting a new journal')
+
+        # Rewrite the valid records so that a record truncated by a crash is dropped
+        self._file = open(filename, 'wb')
+        self._write(dict(type='header', params=params))
+        for record in self.records:
+            self._write(record)
+
+    @staticmethod
+    def create(*, filename, params, resume=False):
+        """Returns a TuneJournal, or None if filename is empty"""
+        if filename is None or filename == '':
+            return None
+        return TuneJournal(filename=filename, params=params, resume=resume)
+
+    @staticmethod
+    def read(filename):
+        """Returns the list of records in a journal file, ignoring a truncated last record"""
+        records = []
+        with open(filename, 'rb') as f:
+            while True:
+                try:
+                    records.append(np.load(f, allow_pickle=True).item())
+                except (EOFError, ValueError, OSError, pickle.UnpicklingError):
+                    break
+        return records
+
+    def _write(self, record):
+        np.save(self._file, record, allow_pickle=True)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, **record):
+        """Add a record to the journal"""
+        with self._lock:
+            self._write(record)
+
+    def completed(self, recordType, key):
+        """Returns a dictionary of the records of recordType, indexed by the value of key"""
+        return {r[key]: r for r in self.records if r.get('type') == recordType}
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,185 @@
+import contextlib
+import threading
+import time
+
+import pyrogue as pr
+
+
+def addTuneTimingVariables(process):
+    """Add the tuning time breakdown variables to a tuning process"""
+
+    process._tuneTimer = TuneTimer(process)
+
+    for phase, desc in [('Write', 'writing tuning values to the hardware'),
+                        ('Settle', 'waiting for the hardware to settle after a write'),
+                        ('Read', 'reading the SA output'),
+                        ('Analysis', 'curve analysis')]:
+        process.add(pr.LocalVariable(
+            name=f'Time{phase}',
+            value=0.0,
+            mode='RO',
+            units='s',
+            disp='{:0.3f}',
+            description=f'Time spent {desc} in the current or last run.'))
+
+    process.add(pr.LocalVariable(
+        name='TimeOther',
+        value=0.0,
+        mode='RO',
+        units='s',
+        disp='{:0.3f}',
+        description='Run time not assigned to one of the other phases, such as stream sweeps and result publication.'))
+
+    process.add(pr.LocalVariable(
+        name='TimeTotal',
+        value=0.0,
+        mode='RO',
+        units='s',
+        disp='{:0.3f}',
+        description='Wall time of the current or last run. Analysis runs in a background worker during acquisition, '
+                    'so the phase times can add up to more than the total.'))
+
+    process.add(pr.LocalVariable(
+        name='WriteCount',
+        value=0,
+        mode='RO',
+        description='Number of group variable writes in the current or last run.'))
+
+    process.add(pr.LocalVariable(
+        name='ReadCount',
+        value=0,
+        mode='RO',
+        description='Number of group variable reads in the current or last run.'))
+
+    process.add(pr.LocalVariable(
+        name='AccessesPerStep',
+        value=0.0,
+        mode='RO',
+        disp='{:0.2f}',
+        description='Group variable writes and reads per process step in the current or last run.'))
+
+
+# Timer of the run in progress in each thread, so that nested tuning calls made
+# without a process (saOffset from saBiasSweep) are counted in the enclosing run
+_running = threading.local()
+
+
+class TuneTimer():
+    """Splits the wall time of a tuning run into write, settle, read and analysis phases.
+
+    The tuning functions mark their hardware accesses with phase(). Nested phases
+    are counted in the outermost phase only. The Write and Read phases also count
+    the group variable accesses they hold. When the process has the variables added by
+    addTuneTimingVariables, they are updated during the run and at its end.
+    """
+
+    PHASES = ('Write', 'Settle', 'Read', 'Analysis')
+
+    def __init__(self, process=None):
+        self._process = process
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = None
+        self._published = 0.0
+        self.reset()
+
+    @staticmethod
+    def get(process):
+        """Returns the timer of the run in progress in this thread, else the timer of process"""
+        timer = getattr(_running, 'timer', None)
+        if timer is not None:
+            return timer
+        if process is None:
+            return TuneTimer()
+        timer = getattr(process, '_tuneTimer', None)
+        if timer is None:
+            timer = TuneTimer(process)
+            process._tuneTimer = timer
+        return timer
+
+    def reset(self):
+        with self._lock:
+            self.times = {phase: 0.0 for phase in TuneTimer.PHASES}
+            self.writes = 0
+            self.reads = 0
+            self.total = 0.0
+
+    @contextlib.contextmanager
+    def run(self):
+        """Context for a whole tuning run. Resets the timer unless a run is already in progress in this thread."""
+        outer = getattr(_running, 'timer', None)
+        if outer is not None:
+            yield outer
+            return
+
+        self.reset()
+        self._start = time.monotonic()
+        _running.timer = self
+        try:
+            yield self
+        finally:
+            _running.timer = None
+            self.total = time.monotonic() - self._start
+            self._start = None
+            self.publish()
+
+    @contextlib.contextmanager
+    def phase(self, name, count=1):
+        """Context for one phase of a tuning step. count is the number of group variable accesses it holds."""
+        if getattr(self._local, 'phase', None) is not None:
+            yield
+            return
+
+        self._local.phase = name
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self._local.phase = None
+            with self._lock:
+                self.times[name] += elapsed
+                if name == 'Write':
+                    self.writes += count
+                elif name == 'Read':
+                    self.reads += count
+
+            # Live update while running, at most twice per second
+            if self._start is not None and start - self._published > 0.5:
+                self._published = start
+                self.publish()
+
+    def steps(self):
+        """Returns the number of steps completed by the process"""
+        if self._process is None or not hasattr(self._process, 'Step'):
+            return 0
+        return self._process.Step.value()
+
+    def summary(self):
+        """Returns a dict of the phase times and access counts"""
+        with self._lock:
+            total = self.total if self._start is None else time.monotonic() - self._start
+            ret = {phase: self.times[phase] for phase in TuneTimer.PHASES}
+            ret['Other'] = max(total - sum(ret.values()), 0.0)
+            ret['Total'] = total
+            ret['Writes'] = self.writes
+            ret['Reads'] = self.reads
+
+        steps = self.steps()
+        ret['Steps'] = steps
+        ret['AccessesPerStep'] = (ret['Writes'] + ret['Reads']) / steps if steps > 0 else 0.0
+        return ret
+
+    def publish(self):
+        """Update the timing variables of the process"""
+        process = self._process
+        if process is None or not hasattr(process, 'TimeTotal'):
+            return
+
+        s = self.summary()
+        with process.root.updateGroup():
+            for phase in TuneTimer.PHASES + ('Other', 'Total'):
+                process.node(f'Time{phase}').set(s[phase])
+            process.WriteCount.set(s['Writes'])
+            process.ReadCount.set(s['Reads'])
+            process.AccessesPerStep.set(s['AccessesPerStep'])
@@ -0,0 +1,94 @@
+import queue
+import threading
+
+
+class TuneWorker():
+    """Runs curve analysis and result publication jobs of a tuning process in a background thread.
+
+    Jobs are passed through a bounded queue, so acquisition can run at most depth
+    steps ahead of the analysis. When the process is stopped (process._runEn is False)
+    queued jobs are dropped instead of run, and skipped is set so the caller knows
+    the results need a final analysis pass. Jobs queued with submitRequired(),
+    such as checkpoint writes, are always run.
+    Without a process, jobs are run immediately in the calling thread.
+    """
+
+    def __init__(self, *, process, depth=2):
+        self._process = process
+        self._queue = queue.Queue(maxsize=depth)
+        self._error = None
+        self.skipped = False
+
+        self._thread = None
+        if process is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _running(self):
+        return self._process is None or self._process._runEn is not False
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            func, args, kwargs, required = job
+
+            if self._error is not None or (not required and not self._running()):
+                self.skipped = True
+                continue
+
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                self._error = e
+
+    def _submit(self, func, args, kwargs, required):
+        if self._error is not None:
+            raise self._error
+
+        if self._thread is None:
+            func(*args, **kwargs)
+            return
+
+        while True:
+            try:
+                self._queue.put((func, args, kwargs, required), timeout=0.1)
+                return
+            except queue.Full:
+                if not required and not self._running():
+                    self.skipped = True
+                    return
+
+    def submit(self, func, *args, **kwargs):
+        """Queue a job, blocking while the queue is full"""
+        self._submit(func, args, kwargs, False)
+
+    def submitRequired(self, func, *args, **kwargs):
+        """Queue a job which is run even if the process is stopped"""
+        self._submit(func, args, kwargs, True)
+
+    def close(self):
+        """Wait for all queued jobs to finish and raise any error seen by the worker"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._thread is not None:
+            # Let the worker exit without running the remaining jobs
+            self.skipped = True
+            self._error = self._error or exc_value
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
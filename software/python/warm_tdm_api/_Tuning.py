@@ -1,7 +1,6 @@
 import numpy as np
 import time
 
-from simple_pid import PID
 import warm_tdm_api
 
 
@@ -18,59 +17,56 @@ def saOffset(*, group, process=None):
     maxLoops = group.SaOffsetProcess.MaxLoops.get()
     colCount = len(group.ColumnMap.get())    
 
-    # Setup PID controller
-    pid = [PID(kp, ki, kd) for _ in range(len(group.ColumnMap.value()))]
-
-    for p in pid:
-        p.setpoint = 0  # want to zero out SaOut
-        p.output_limits = (-0.5, 0.5)
-        p.sample_time = None
+    # Setup PID controller, all columns are updated together
+    pid = warm_tdm_api.ArrayPid(kp, ki, kd, size=colCount, setpoint=0, output_limits=(-0.5, 0.5))
 
     # Final output should be near SaBias, so start near there
     # Start at half the current bias
     # control = np.zeros(len(group.ColumnMap.value()))
     control = group.SaBiasVoltage.get() * 0.9
 
-    group.SaOffset.set(value=control)
-
+    timer = warm_tdm_api.TuneTimer.get(group.SaOffsetProcess)
 
-    current = group.SaOutAdc.get()
-    masked = current
-#    print('Initial Values')
-#    for i in range(len(control)):
-        #print(f'i= {i}, saOut={masked[i]}, saOffset={control[i]}')
-    #print()
+    with timer.phase('Write'):
+        group.SaOffset.set(value=control)
 
     mult = np.array([1 if en else 0 for en in group.ColTuneEnable.value()],np.float64)
     count = 0
 
-    #print('Starting PID')
+    # Optionally wait for SaOutAdc to settle after each offset update
+    settle = warm_tdm_api.SettleDetector.create(group=group, process=group.SaOffsetProcess)
+
     while count < maxLoops:
         count += 1
-        #print(f'Loop {count}')
 
-        current = group.SaOutAdc.get()
+        if settle is not None:
+            with timer.phase('Settle'):
+                current = settle.wait()
+        else:
+            with timer.phase('Read'):
+                current = group.SaOutAdc.get()
         masked = current * mult
 
         # All channels have converged
-        done = [precision > masked[i] > (-1.0)*precision for i in range(len(masked))]
-        if all(done):
+        done = np.abs(masked) < precision
+        if np.all(done):
             break
-#         if (max(masked) < precision) and (min(masked) > (-1.0*precision)):
-#             break
 
-        for i, p in enumerate(pid):
-            if done[i] == False:
-                change = p(masked[i])
-                control[i] = np.clip(control[i] + change, 0, 4.999)
-                group.SaOffset.set(control[i], index=i)
-                #print(f'i= {i}, saOut={masked[i]}, saOffset={control[i]}, change={change}')
-
-#         group.SaOffset.set(control)
+        # Update the PID state of the unconverged columns and
+        # commit the whole SaOffset array in a single write
+        change = pid(masked, active=~done)
+        control = np.where(done, control, np.clip(control + change, 0, 4.999))
+        with timer.phase('Write'):
+            group.SaOffset.set(control)
 
         if process is not None and process._runEn is False:
+            if settle is not None:
+                settle.publish()
             return control
 
+    if settle is not None:
+        settle.publish()
+
     if count == maxLoops:
         raise Exception(f"saOffset PID loop failed to converge after {maxLoops} loops")
     else:
@@ -82,19 +78,32 @@ def saOffset(*, group, process=None):
 
 
 #SA TUNING
-def saFbSweep(*, group, bias, saFbRange, process):
-    """Returns a list of Curves objects.
-    Iterate over a range of SaFb values for each column at a single SaBias point.
-    Capture SaOut value at each step
-    Return list of Curve objects containing curves for each column
+def _saFbAcquire(*, group, bias, saFbRange, process, settle=None):
+    """Returns a (columns, steps) array of SaOut values.
+    Step SaFb through each column of saFbRange and capture SaOut at each step.
+    When a SettleDetector is passed it replaces the fixed SaFbSampleDelay.
     """
-    row = 0
     colCount = len(group.ColumnMap.get())
-    curves = [warm_tdm_api.Curve(bias[i]) for i in range(colCount)]
-
-    saFbArray = np.zeros(colCount, np.float64)
-
-    numSteps = len(saFbRange[0])
+    numSteps = saFbRange.shape[1]
+    timer = warm_tdm_api.TuneTimer.get(process)
+
+    if warm_tdm_api.StreamSampler.enabled(group):
+        def _highAdc():
+            adcs = group.SaOutAdc.get()
+            if np.any(np.abs(adcs) > 0.8):
+                print('High ADC value seen')
+                print(f'SaBias - {bias}')
+                print(f'ADCs - {adcs}')
+                print('Running SA Offset Process')
+                return True
+            return False
+
+        # The step with a high ADC value is repeated after saOffset
+        with warm_tdm_api.StreamSampler(group) as sampler:
+            return sampler.sweep(variable=group.SaFbForceCurrent, values=saFbRange, process=process,
+                                 overRange=_highAdc, recover=lambda: saOffset(group=group))
+
+    points = np.zeros((colCount, numSteps), np.float64)
 
     sleep = group.SaTuneProcess.SaFbSampleDelay.get()
 
@@ -103,21 +112,27 @@ def saFbSweep(*, group, bias, saFbRange, process):
 
         # Setup data
         #print(f'Writing SaFbForce values = {saFbRange[:, idx]}')
-        group.SaFbForceCurrent.set(saFbRange[:, idx])
-
-        time.sleep(sleep)
-        points = group.SaOut.get() #group.HardwareGroup.ColumnBoard[0].DataPath.WaveformCapture.AdcAverage.get() #group.SaOut.get()
-        
-        #print(f'saFb step {idx} - {points}')
+        with timer.phase('Write'):
+            group.SaFbForceCurrent.set(saFbRange[:, idx])
+
+        if settle is not None:
+            # SaOut is computed from the settled SaOutAdc reading already in shadow memory
+            with timer.phase('Settle'):
+                adcs = settle.wait()
+            points[:, idx] = group.SaOut.get(read=False)
+        else:
+            with timer.phase('Settle'):
+                time.sleep(sleep)
+            with timer.phase('Read', count=2):
+                points[:, idx] = group.SaOut.get() #group.HardwareGroup.ColumnBoard[0].DataPath.WaveformCapture.AdcAverage.get() #group.SaOut.get()
+                adcs = group.SaOutAdc.get()
 
-        for col in range(colCount):
-            curves[col].addPoint(points[col])
+        #print(f'saFb step {idx} - {points[:, idx]}')
 
         if process is not None:
             process._incrementSteps(1)
             #Progress.set(pctLow + pctRange*((idx+1)/numSteps))
 
-        adcs = group.SaOutAdc.get()
         if np.any(np.abs(adcs) > 0.8):
             print('High ADC value seen')
             print(f'SaBias - {bias}')
@@ -130,109 +145,306 @@ def saFbSweep(*, group, bias, saFbRange, process):
             print(f'ADC - {group.SaOutAdc.get()}')
             print(f'SaOut = {group.SaOut.get()}')
 
+    return points
+
+def saFbSweep(*, group, bias, saFbRange, process, settle=None):
+    """Returns a tuple of (columns, steps) arrays, the SaFb values and the SaOut values.
+    Iterate over a range of SaFb values for each column at a single SaBias point.
+    Capture SaOut value at each step
+    """
+    if group.SaTuneProcess.AdaptiveSweep.get():
+        return saFbAdaptiveSweep(group=group, bias=bias, saFbRange=saFbRange, process=process, settle=settle)
+
+    colCount = len(group.ColumnMap.get())
+
+    points = _saFbAcquire(group=group, bias=bias, saFbRange=saFbRange, process=process, settle=settle)
+
     # Reset FB to zero after sweep
-    group.SaFbForceCurrent.set(value=np.zeros(colCount, np.float64))
+    with warm_tdm_api.TuneTimer.get(process).phase('Write'):
+        group.SaFbForceCurrent.set(value=np.zeros(colCount, np.float64))
 
-    return curves
+    return saFbRange, points
+
+def saFbAdaptiveSweep(*, group, bias, saFbRange, process, settle=None):
+    """Returns a tuple of (columns, steps) arrays, the SaFb values and the SaOut values.
+    Coarse to fine version of saFbSweep. A coarse pass over a subset of saFbRange
+    locates phi0 and the curve extrema, then a fine pass samples the saFbRange points
+    closest to the max slope, high and low points of each column.
+    The returned SaFb values are a non-uniform subset of saFbRange.
+    """
+    colCount = len(group.ColumnMap.get())
+    numSteps = saFbRange.shape[1]
+    coarseSteps = min(group.SaTuneProcess.AdaptiveCoarseSteps.get(), numSteps)
+    refineSteps = min(group.SaTuneProcess.AdaptiveRefineSteps.get(), numSteps - coarseSteps)
+
+    # Coarse pass on an evenly spaced subset of the full grid
+    coarseIdx = np.unique(np.linspace(0, numSteps-1, coarseSteps).round().astype(int))
+    coarse = _saFbAcquire(group=group, bias=bias, saFbRange=saFbRange[:, coarseIdx], process=process, settle=settle)
+
+    # Analyze the coarse curves of all columns
+    coarseCurves = warm_tdm_api.CurveArray(xValues=saFbRange[:, coarseIdx], biasValues=bias[:, np.newaxis])
+    coarseCurves.setCurves(0, coarse)
+    with warm_tdm_api.TuneTimer.get(process).phase('Analysis'):
+        coarseCurves.update()
+    features = np.stack((coarseCurves.maxSlopePoints[:, 0, 0],
+                         coarseCurves.highPoints[:, 0, 0],
+                         coarseCurves.lowPoints[:, 0, 0]), axis=1)
+
+    # Pick the same number of fine points for every column so all columns step together
+    candidates = np.setdiff1d(np.arange(numSteps), coarseIdx)
+    refineIdx = np.zeros((colCount, refineSteps), int)
+
+    for col in range(colCount):
+        # Full grid index of each feature found on the coarse curve
+        featureIdx = saFbRange[col].searchsorted(features[col])
+        dist = np.min(np.abs(candidates[:, np.newaxis] - featureIdx[np.newaxis, :]), axis=1)
+        refineIdx[col] = np.sort(candidates[np.argsort(dist, kind='stable')[:refineSteps]])
+
+    rows = np.arange(colCount)[:, np.newaxis]
+    fine = _saFbAcquire(group=group, bias=bias, saFbRange=saFbRange[rows, refineIdx], process=process, settle=settle)
+
+    # Merge both passes in x order
+    idx = np.concatenate((np.broadcast_to(coarseIdx, (colCount, coarseIdx.size)), refineIdx), axis=1)
+    order = np.argsort(idx, axis=1)
+    xValues = np.take_along_axis(saFbRange, np.take_along_axis(idx, order, axis=1), axis=1)
+    points = np.take_along_axis(np.concatenate((coarse, fine), axis=1), order, axis=1)
+
+    # Reset FB to zero after sweep
+    with warm_tdm_api.TuneTimer.get(process).phase('Write'):
+        group.SaFbForceCurrent.set(value=np.zeros(colCount, np.float64))
 
-def saBiasSweep(*, group, process, doBiasRamp=True):
-    """Returns a list of CurveData objects.
-    Creates a list of CurveData objects, corresponding to each column.
+    return xValues, points
+
+def _saAnalyzeStep(*, process, data, biasIndex):
+    """Analyze one SA bias step and publish the partial results"""
+    with warm_tdm_api.TuneTimer.get(process).phase('Analysis'):
+        data.update(biasIndex=biasIndex)
+    if process is not None:
+        process.SaTuneOutput.set(value=data.asDicts())
+
+def saBiasSweep(*, group, process, doBiasRamp=True, journal=None, saBiasRange=None, saFbRange=None, recordType='saBias'):
+    """Returns a CurveArray holding the curves of every column.
     Iterates through SaBias values determined by Rogue variables.
-    Calls saFbSweep to generate curves, adding them
-    to their corresponding data objects
+    Calls saFbSweep to generate curves, storing them in the CurveArray
+    saBiasRange and saFbRange are optional (columns, steps) arrays which replace
+    the ranges set by the Rogue variables, as used by warm start.
+    The bias steps of each column are chosen by the BiasSearch set up by BiasSearchMode.
+    Each completed bias step is recorded in the TuneJournal if one is passed,
+    bias steps already in the journal are restored instead of swept.
     """
 
     # Extract iteration steps from Rogue variables
-    # Create CurveData obects for storing output data
     colCount = len(group.ColumnMap.get())
     colTuneEnable = group.ColTuneEnable.value()    
-    numBiasSteps = group.SaTuneProcess.SaBiasNumSteps.get() if doBiasRamp else 1
-    numFbSteps = group.SaTuneProcess.SaFbNumSteps.get()
-    saBiasRange = np.zeros((colCount, numBiasSteps), np.float64)
-    saFbRange = np.zeros((colCount, numFbSteps), np.float64)
-    loadedBiases = None if doBiasRamp else np.asarray(group.SaBiasCurrent.get(), dtype=np.float64)
 
-    datalist = []    
-    for col in range(colCount):
-        if doBiasRamp:
-            low = group.SaTuneProcess.SaBiasLowOffset.get()
-            high = group.SaTuneProcess.SaBiasHighOffset.get()
-            saBiasRange[col] = np.linspace(low,high,numBiasSteps,endpoint=True)
-        else:
-            # Retune at the bias values already loaded into the readout configuration.
-            saBiasRange[col, 0] = loadedBiases[col]
+    if saBiasRange is None:
+        numBiasSteps = group.SaTuneProcess.SaBiasNumSteps.get() if doBiasRamp else 1
+        saBiasRange = np.zeros((colCount, numBiasSteps), np.float64)
+        loadedBiases = None if doBiasRamp else np.asarray(group.SaBiasCurrent.get(), dtype=np.float64)
 
+        for col in range(colCount):
+            if doBiasRamp:
+                low = group.SaTuneProcess.SaBiasLowOffset.get()
+                high = group.SaTuneProcess.SaBiasHighOffset.get()
+                saBiasRange[col] = np.linspace(low,high,numBiasSteps,endpoint=True)
+            else:
+                # Retune at the bias values already loaded into the readout configuration.
+                saBiasRange[col, 0] = loadedBiases[col]
+
+    if saFbRange is None:
+        numFbSteps = group.SaTuneProcess.SaFbNumSteps.get()
         low = group.SaTuneProcess.SaFbLowOffset.get()
         high = group.SaTuneProcess.SaFbHighOffset.get()
-        saFbRange[col] = np.linspace(low,high,numFbSteps,endpoint=True)
+        saFbRange = np.repeat(np.linspace(low,high,numFbSteps,endpoint=True)[np.newaxis, :], colCount, axis=0)
+
+    numBiasSteps = saBiasRange.shape[1]
+    numFbSteps = saFbRange.shape[1]
+
+    # Create the CurveArray for storing output data
+    data = warm_tdm_api.CurveArray(xValues=saFbRange, biasValues=saBiasRange)
+
+    if group.SaTuneProcess.AdaptiveSweep.get():
+        coarseSteps = min(group.SaTuneProcess.AdaptiveCoarseSteps.get(), numFbSteps)
+        refineSteps = min(group.SaTuneProcess.AdaptiveRefineSteps.get(), numFbSteps - coarseSteps)
+        stepsPerBias = coarseSteps + refineSteps
+    else:
+        stepsPerBias = numFbSteps
 
-        datalist.append(warm_tdm_api.CurveData(xValues=saFbRange[col]))
-    
-            
     if process is not None:
-        process.TotalSteps.set(numBiasSteps * numFbSteps)
+        process.TotalSteps.set(numBiasSteps * stepsPerBias)
+
+    # Bias search steps already completed in the checkpoint journal
+    done = {} if journal is None else journal.completed(recordType, 'step')
 
     #print(f'Bias sweep - {saBiasRange}')
     #print(f'Fb sweep = {saFbRange}')
 
-    # Iterate over each SA Bias point
-    # Set the SaBias, set the proper Offset
-    # Sweep the SaFb range with saFbSweep()
-    for idx in range(numBiasSteps):
-        group.SaFbForceCurrent.set(np.zeros(colCount, np.float64))
-        group.Sq1BiasForceCurrent.set(np.zeros(colCount, np.float64))
-        group.Sq1FbForceCurrent.set(np.zeros(colCount, np.float64))        
-        # Update process message 
-        if process is not None:
-            process.Message.set(f'SaBias step {idx+1} out of {numBiasSteps}')
+    # Optionally replace the fixed SaFbSampleDelay with settle detection
+    settle = warm_tdm_api.SettleDetector.create(group=group, process=process)
+    timer = warm_tdm_api.TuneTimer.get(process)
+
+    # The bias search picks the bias step of each column, every column steps through all biases in Linear mode
+    search = warm_tdm_api.BiasSearch.create(process=process, numSteps=numBiasSteps, enable=colTuneEnable)
+    cols = np.arange(colCount)
+    bias = saBiasRange[:, 0].copy()
+
+    # Curve analysis and result publication run in a background worker
+    with warm_tdm_api.TuneWorker(process=process) as worker:
+        # Iterate over each SA Bias point
+        # Set the SaBias, set the proper Offset
+        # Sweep the SaFb range with saFbSweep()
+        for step in range(numBiasSteps):
+            indices = search.next()
+            if indices is None:
+                break
+            active = indices >= 0
+            enable = active & np.array(colTuneEnable, bool)
+
+            if step in done and np.array_equal(done[step]['indices'], indices):
+                rec = done[step]
+                data.biasValues[cols[active], indices[active]] = rec['bias'][active]
+                data.setCurves(indices, rec['points'], xValues=rec['xValues'], enable=rec['enable'])
+                search.report(rec['points'].max(axis=1) - rec['points'].min(axis=1))
+                worker.submit(_saAnalyzeStep, process=process, data=data, biasIndex=indices)
+                if process is not None:
+                    process._incrementSteps(stepsPerBias)
+                continue
+
+            # Finished columns stay at their last bias
+            bias = np.where(active, saBiasRange[cols, np.maximum(indices, 0)], bias)
+
+            with timer.phase('Write', count=3):
+                group.SaFbForceCurrent.set(np.zeros(colCount, np.float64))
+                group.Sq1BiasForceCurrent.set(np.zeros(colCount, np.float64))
+                group.Sq1FbForceCurrent.set(np.zeros(colCount, np.float64))
+            # Update process message 
+            if process is not None:
+                process.Message.set(f'SaBias step {step+1} out of {numBiasSteps}')
         
 
-        # Only set bias for enabled columns
-        #print(f'Setting SaBias values = {saBiasRange[:, idx]}')
-        group.SaBiasCurrent.set(saBiasRange[:, idx])
-        group.SaOffset.set(value=np.zeros(colCount, np.float64))        
-        adcs = group.SaOutAdc.get()
-        print(f'Starting SA Bias step - ADC Values before offset = {adcs}')
-        #print('Starting saOffset()')
-        saOffset(group=group)
-        #print('Done saOffset()')        
+            # Only set bias for enabled columns
+            #print(f'Setting SaBias values = {bias}')
+            with timer.phase('Write', count=2):
+                group.SaBiasCurrent.set(bias)
+                group.SaOffset.set(value=np.zeros(colCount, np.float64))
+            with timer.phase('Read'):
+                adcs = group.SaOutAdc.get()
+            print(f'Starting SA Bias step - ADC Values before offset = {adcs}')
+            #print('Starting saOffset()')
+            saOffset(group=group)
+            #print('Done saOffset()')        
 
-        curves = saFbSweep(group=group,bias=saBiasRange[:, idx], saFbRange=saFbRange, process=process)
+            xValues, points = saFbSweep(group=group,bias=bias, saFbRange=saFbRange, process=process, settle=settle)
 
-        for col in range(colCount):
-            # Only add the curve if column is enabled for tuning
-            if colTuneEnable[col]:
-                datalist[col].addCurve(curves[col])
+            if settle is not None:
+                settle.publish()
 
-        # check for stopped process
-        if process is not None and process._runEn == False:
-            print('Process stopped, exiting saBiasSweep')
-            break
+            # Curves are only used if column is enabled for tuning
+            # Analysis runs in the worker while the next bias step is acquired
+            data.setCurves(indices, points, xValues=xValues, enable=enable)
+            search.report(points.max(axis=1) - points.min(axis=1))
+            worker.submit(_saAnalyzeStep, process=process, data=data, biasIndex=indices)
+
+            # Checkpoint the completed bias step
+            if journal is not None and (process is None or process._runEn):
+                journal.append(type=recordType, step=step, indices=indices, bias=bias, xValues=xValues,
+                               points=points, enable=enable)
+
+            # check for stopped process
+            if process is not None and process._runEn == False:
+                print('Process stopped, exiting saBiasSweep')
+                break
 
-    for d in datalist:
-        d.update()
+    if process is not None:
+        process.BiasSearchSteps.set(search.steps)
+
+    # Analyze any bias steps skipped by a stopped worker
+    if worker.skipped:
+        with timer.phase('Analysis'):
+            data.update()
 
     # Return SaBias back to initial values
     #group.SaBias.set(start)
     #saOffset(group)
 
 
-    return datalist
+    return data
+
+def _warmStartResult(process, msg):
+    print(msg)
+    process.WarmStartResult.set(msg)
 
-def saTune(*, group, process=None, doSet=True, doBiasRamp=True):
+def _saWarmStartSweep(*, group, process, cache, journal):
+    """Runs saBiasSweep over narrowed windows around the cached operating point of every enabled column.
+    Returns the CurveArray, or None if a column has no cached operating point or fails the quality check.
+    """
+    tp = group.SaTuneProcess
+    colTuneEnable = np.array(group.ColTuneEnable.value(), bool)
+    cols = np.flatnonzero(colTuneEnable)
+    entries = cache.lookup(group, cols)
+
+    if len(cols) == 0 or entries is None:
+        _warmStartResult(tp, 'Warm start - no cached SA operating point, running full sweep')
+        return None
+
+    allEntries = [None] * len(colTuneEnable)
+    for col, e in zip(cols, entries):
+        allEntries[col] = e
+
+    biasLow = tp.SaBiasLowOffset.get()
+    biasHigh = tp.SaBiasHighOffset.get()
+
+    saBiasRange, saFbRange = warm_tdm_api.warmStartRanges(
+        entries=allEntries,
+        biasLow=biasLow,
+        biasHigh=biasHigh,
+        numBiasSteps=tp.SaBiasNumSteps.get(),
+        fbLow=tp.SaFbLowOffset.get(),
+        fbHigh=tp.SaFbHighOffset.get(),
+        numFbSteps=tp.SaFbNumSteps.get(),
+        biasWindow=tp.WarmStartBiasWindow.get(),
+        fbPeriods=tp.WarmStartFbPeriods.get())
+
+    print(f'Warm start - {saBiasRange.shape[1]} SaBias steps, {saFbRange.shape[1]} SaFb steps')
+    results = saBiasSweep(group=group, process=process, journal=journal,
+                          saBiasRange=saBiasRange, saFbRange=saFbRange, recordType='saBiasWarm')
+
+    # A stopped tune is returned as is
+    if process is not None and process._runEn == False:
+        return results
+
+    ok = warm_tdm_api.warmStartCheck(
+        results=results,
+        entries=entries,
+        cols=cols,
+        biasLow=biasLow,
+        biasHigh=biasHigh,
+        minPeak=tp.WarmStartMinPeak.get(),
+        phi0Tolerance=tp.WarmStartPhi0Tolerance.get())
+
+    if np.all(ok):
+        _warmStartResult(tp, 'Warm start accepted')
+        return results
+
+    _warmStartResult(tp, f'Warm start failed quality check for columns {list(cols[~ok])}, running full sweep')
+    return None
+
+def saTune(*, group, process=None, doSet=True, doBiasRamp=True, journal=None, cache=None):
     """
     Initializes group, runs saFluxBias and collects and sets SaFb, SaOffset, and SaBias
-    Returns a list of CurveData objects
+    Returns a CurveArray
     Args
     ----
     group  : group
     pctVar : pr.Variable
         Variable to set current percentage complete
+    cache : TuneCache
+        Optional cache of operating points. The tuned points are stored in it, and
+        the tune is first run around the cached points if WarmStart is set.
 
     Returns
     ----
-    CurveData object where result of saOffset subroutine
+    CurveArray where result of saOffset subroutine
      is plotted against SaFb values, which each curve
      representing a different bias.
     """
@@ -240,15 +452,38 @@ def saTune(*, group, process=None, doSet=True, doBiasRamp=True):
 
     #group.RowTuneIndex.set(0)
     #group.RowTuneMode.set(True)
-    saBiasResults = saBiasSweep(group=group, process=process, doBiasRamp=doBiasRamp)
+    saBiasResults = None
+    if cache is not None and doBiasRamp and group.SaTuneProcess.WarmStart.get():
+        saBiasResults = _saWarmStartSweep(group=group, process=process, cache=cache, journal=journal)
+
+    if saBiasResults is None:
+        saBiasResults = saBiasSweep(group=group, process=process, doBiasRamp=doBiasRamp, journal=journal)
+
+    if journal is not None:
+        journal.append(type='saResult', biasOut=saBiasResults.biasOut, xOut=saBiasResults.xOut, yOut=saBiasResults.yOut)
+
+    # Only completed tunes are cached
+    if cache is not None and (process is None or process._runEn):
+        cache.update(group, saBiasResults, group.ColTuneEnable.value())
+        cache.save()
 
     if doSet:
-        for col in range(len(group.ColumnMap.get())):
-            # xOut represents the tuned saFB. Set it for every row.
-            for row in range(len(group.RowMap.get())):
-                group.SaFbCurrent.set(index=(col,row), value=saBiasResults[col].xOut)
-            # biasOut represents the tuned SA Bias point
-            group.SaBiasCurrent.set(index=col, value=saBiasResults[col].biasOut)
+        rowCount = len(group.RowMap.get())
+        xOut = np.asarray(saBiasResults.xOut, np.float64)
+        biasOut = np.asarray(saBiasResults.biasOut, np.float64)
+        tuned = np.isfinite(xOut) & np.isfinite(biasOut)
+
+        # xOut represents the tuned saFB. Set it for every row of the tuned columns.
+        saFb = group.SaFbCurrent.get(read=False)
+        saFb[tuned, :rowCount] = xOut[tuned, np.newaxis]
+
+        # biasOut represents the tuned SA Bias point
+        saBias = np.where(tuned, biasOut, group.SaBiasCurrent.get(read=False))
+
+        # One write per column
+        with warm_tdm_api.TuneTimer.get(process).phase('Write', count=2):
+            group.SaFbCurrent.set(saFb)
+            group.SaBiasCurrent.set(saBias)
 
         # Run saOffset to zero out the ADC value at the tuned SaBias,SaFb point
         saOffset(group=group)
@@ -257,52 +492,66 @@ def saTune(*, group, process=None, doSet=True, doBiasRamp=True):
 
 
 #FAS TUNING
-def saFbServo(*, group, process):
+def saFbServo(*, group, process, model=None):
     """Returns list of SaFb values which zero out SaOut.
     Each element corresponds with a column
+    With a SaFbServoModel the columns take Newton steps along the measured SA slope,
+    otherwise all columns run a PID loop.
     """
 
-    # Setup PID controller
-    kp = process.ServoKp.get()
-    ki = process.ServoKi.get()
-    kd = process.ServoKd.get()
     precision = process.ServoPrecision.get()
     maxLoops = process.ServoMaxLoops.get()
-    
-    pid = [PID(kp, ki, kd) for _ in range(len(group.ColumnMap.value()))]
+    colCount = len(group.ColumnMap.value())
 
-    for p in pid:
-        p.setpoint = 0 # want to zero out SaOut
-        p.output_limits = (-0.5, 0.5)
-        p.sample_time   = None
+    enable = np.array(group.ColTuneEnable.value(), bool)
+    mult = enable.astype(np.float64)
 
-    control = group.SaFbForceCurrent.get()
+    if model is not None and not model.ready(enable):
+        print('saFbServo - no SA slope for every enabled column, using PID')
+        model = None
 
-    current = group.SaOutAdc.get()
-    masked = current
-    mult = np.array([1 if en else 0 for en in group.ColTuneEnable.value()], np.float64)    
-    count = 0
+    if model is None:
+        # Setup PID controller, all columns are updated together
+        pid = warm_tdm_api.ArrayPid(process.ServoKp.get(), process.ServoKi.get(), process.ServoKd.get(),
+                                    size=colCount, setpoint=0, output_limits=(-0.5, 0.5))
 
-    for count in range(maxLoops):
+    timer = warm_tdm_api.TuneTimer.get(process)
 
+    with timer.phase('Read', count=2):
+        control = group.SaFbForceCurrent.get()
         current = group.SaOutAdc.get()
-        masked = current * mult
+    masked = current * mult
+    count = 0
+
+    for count in range(maxLoops):
 
         # All channels have converged
-        if (max(masked) < precision) and (min(masked) > (-1.0*precision)):
+        done = np.abs(masked) < precision
+        if np.all(done):
             break
 
-        for i, p in enumerate(pid):
-            change = p(masked[i])
-            control[i] = control[i] + change
+        if model is None:
+            change = pid(masked)
+        else:
+            change = np.where(done, 0.0, model.step(masked))
+
+        control = control + change
+        with timer.phase('Write'):
+            group.SaFbForceCurrent.set(control)
+
+        last = current
+        with timer.phase('Read'):
+            current = group.SaOutAdc.get()
+        masked = current * mult
 
-        group.SaFbForceCurrent.set(control)
+        if model is not None:
+            model.learn(change, current - last)
 
     else:
-        print(f"saFb PID loop failed to converge after {maxLoops} loops")
+        print(f"saFb servo loop failed to converge after {maxLoops} loops")
         return control
 
-    #print(f'saFb PID loop Converged after {count} loops')
+    #print(f'saFb servo loop Converged after {count} loops')
 
     return control
 
@@ -327,14 +576,19 @@ def fasSweep(*, group, row, process):
     for col in range(colCount):
         data.addCurve(warm_tdm_api.Curve(col))
 
+    # The servo settings are shared with the SQ1 tune
+    model = warm_tdm_api.SaFbServoModel.create(group=group, process=group.Sq1TuneProcess)
+    timer = warm_tdm_api.TuneTimer.get(process)
+
     # Sweep the flux range
     for step in range(numSteps):
         # Set a the fasFlux value for the row 
         # Below is wrong. Need to drive FAS Flux value       
-        group.FasFluxOn.set(index=row, value=fasFluxRange[step])
+        with timer.phase('Write'):
+            group.FasFluxOn.set(index=row, value=fasFluxRange[step])
 
         # Servo the saFb
-        points = saFbServo(group=group)
+        points = saFbServo(group=group, process=group.Sq1TuneProcess, model=model)
 
         for col in range(colCount):
             data.curveList[col].addPoint(points[col])
@@ -353,6 +607,8 @@ def fasTune(*,group,process=None):
     Iterate through all rows, measuring results from
     fasSweep subroutine, and setting FasFluxOn and FasFluxOff
     accordingly.
+    With ParallelRows set, all rows are tuned at once by fasParallelTune when every row
+    board has the RowDacDriver2 FasOn memory, otherwise the rows are tuned one at a time.
 
     Args
     ----
@@ -367,6 +623,12 @@ def fasTune(*,group,process=None):
         list of CurveData objects where result of saFb
         subroutine is plotted against fasSweep
     """
+    if process is not None and process.ParallelRows.get():
+        # Legacy RowModule boards only have the per row RowFasOn registers
+        if all(hasattr(board.RowDacDriver, 'FasOn') for board in group.HardwareGroup.RowBoard.values()):
+            return fasParallelTune(group=group, process=process)
+        print('Row boards without FasOn memory, running the sequential fasTune()')
+
     curves = []
     numRows = group.NumRows.get()
 
@@ -387,7 +649,8 @@ def fasTune(*,group,process=None):
 
         # Minumum index of the curve is FasFluxOn
         # Use median across all columns as FasFlowOn for that row
-        group.FasFluxOn.set(index=row, value=np.median(curve.argmin(1)))
+        with warm_tdm_api.TuneTimer.get(process).phase('Write'):
+            group.FasFluxOn.set(index=row, value=np.median(curve.argmin(1)))
 
         # check for stopped process
         if process is not None and process._runEn == False:
@@ -398,34 +661,151 @@ def fasTune(*,group,process=None):
     #group.RowForceEn.set(False)
     return curves
 
+def fasParallelTune(*, group, process):
+    """Returns a list of CurveData objects, one per row, tuning the FAS flux of every row at once.
+    The rows are left in the hardware readout sequence. For each step the FAS on value of every row
+    is written into the row board FasOn memory and the SA response of every row is read from the
+    AdcDsp AccumError RAM in a single pass, with the DSP PID loops disabled.
+    The response is converted to the SaFb value a servo would have settled on, using the change in
+    AccumError measured for a FasParallelCalStep change of the per row SaFb values.
+    FasOn of each row is then set to the median over the enabled columns of the curve minimum.
+    """
+    colCount = len(group.ColumnMap.get())
+    colTuneEnable = np.array(group.ColTuneEnable.get(), bool)
+    numRows = group.NumRows.get()
+    numSteps = process.FasFluxNumSteps.get()
+    fasFluxRange = np.linspace(process.FasFluxLowOffset.get(), process.FasFluxHighOffset.get(), numSteps, endpoint=True)
+    delay = process.ParallelSampleDelay.get()
+    calStep = process.FasParallelCalStep.get()
+    rows = list(range(numRows))
+
+    dsps = [group.HardwareGroup.ColumnBoard[m.board].DataPath.AdcDsp[m.channel] for m in group.config.columnMap]
+    pidEnables = [dsp.PidEnable.get() for dsp in dsps]
+
+    # FasOn memory of each row board, and the boards and channels of every row
+    fasOn = [board.RowDacDriver.FasOn.Current for board in group.HardwareGroup.RowBoard.values()]
+    fasOnStart = [np.array(v.get(), np.float64) for v in fasOn]
+    rowBoards = np.array([group.config.rowMap[r].board for r in rows])
+    rowChannels = np.array([group.config.rowMap[r].channel for r in rows])
+
+    timer = warm_tdm_api.TuneTimer.get(process)
+
+    def _setFasOn(values):
+        # One write per row board
+        with timer.phase('Write', count=len(fasOn)):
+            for board, var in enumerate(fasOn):
+                current = fasOnStart[board].copy()
+                sel = rowBoards == board
+                current[rowChannels[sel]] = values[sel]
+                var.set(current)
+
+    def _sample():
+        with timer.phase('Settle'):
+            time.sleep(delay)
+        with timer.phase('Read', count=len(dsps)):
+            return _readAccumErrors(dsps)[:, rows]
+
+    saFb = np.array(group.SaFbCurrent.get(), np.float64)
+    points = np.zeros((colCount, numRows, numSteps), np.float64)
+
+    process.TotalSteps.set(numSteps)
+    stopped = False
+
+    try:
+        for dsp in dsps:
+            dsp.PidEnable.set(False)
+
+        # AccumError change per uA of SaFb for every column and row
+        _setFasOn(np.full(numRows, fasFluxRange[0]))
+        start = _sample()
+        cal = saFb.copy()
+        cal[:, rows] += calStep
+        with timer.phase('Write'):
+            group.SaFbCurrent.set(cal)
+        gain = (_sample() - start) / calStep
+        with timer.phase('Write'):
+            group.SaFbCurrent.set(saFb)
+        gain[gain == 0.0] = np.nan
+
+        for step in range(numSteps):
+            process.Message.set(f'Parallel FAS flux step {step+1} out of {numSteps}')
+
+            _setFasOn(np.full(numRows, fasFluxRange[step]))
+
+            # SaFb which would null the error of each row
+            points[:, :, step] = saFb[:, rows] - _sample() / gain
+
+            process._incrementSteps(1)
+            if process._runEn == False:
+                print('Process stopped, fasParallelTune()')
+                stopped = True
+                break
+
+    finally:
+        group.SaFbCurrent.set(saFb)
+        for dsp, en in zip(dsps, pidEnables):
+            dsp.PidEnable.set(en)
+
+    curves = []
+    for i, row in enumerate(rows):
+        data = warm_tdm_api.CurveData(xValues=fasFluxRange)
+        for col in range(colCount):
+            curve = warm_tdm_api.Curve(col)
+            curve.points = list(np.nan_to_num(points[col, i]))
+            data.addCurve(curve)
+        with timer.phase('Analysis'):
+            data.update()
+        curves.append(data)
+
+    if stopped:
+        for var, start in zip(fasOn, fasOnStart):
+            var.set(start)
+        return curves
+
+    # Median FAS flux minimum of the enabled columns of each row
+    minima = np.array([[c.lowpoint[0] for c in data.curveList] for data in curves])
+    _setFasOn(np.median(minima[:, colTuneEnable], axis=1))
+
+    return curves
+
 #SQ1 TUNING - output vs sq1fb for various values of sq1 bias for every row for every column
 def sq1FbSweep(*, group, bias, fbRange, process):
-    """Returns list of curve objects.
+    """Returns a (columns, steps) array of curve points.
     Iterates through Sq1Fb values determined by lowoffset,
     highoffset,step. Generates curve points with saOffset()
     """
     #print(f'sq1FbSweep({bias=}, {fbRange=})')
     colCount = len(group.ColumnMap.get())
-    curves = [warm_tdm_api.Curve(bias[i]) for i in range(colCount)]
     numSteps = len(fbRange[0])
+    curves = np.zeros((colCount, numSteps), np.float64)
 
     servoDisable = process.ServoDisable.get()
 
+    # Open loop sweeps can be sampled from the readout streams
+    if servoDisable is True and warm_tdm_api.StreamSampler.enabled(group):
+        with warm_tdm_api.StreamSampler(group) as sampler:
+            return sampler.sweep(variable=group.Sq1FbForceCurrent, values=fbRange, process=process)
+
+    # Newton servo model, shared by every point of the sweep
+    model = None if servoDisable else warm_tdm_api.SaFbServoModel.create(group=group, process=process)
+    timer = warm_tdm_api.TuneTimer.get(process)
+
     for fbStep in range(numSteps):
         # Set SQ1 FB
-        group.Sq1FbForceCurrent.set(fbRange[:, fbStep])
+        with timer.phase('Write'):
+            group.Sq1FbForceCurrent.set(fbRange[:, fbStep])
 
 
         if servoDisable is False:
             # Servo saFB            
-            points = saFbServo(group=group, process=process)
+            points = saFbServo(group=group, process=process, model=model)
         else:
             # Open Loop mode - temporary for testing
-            points = group.SaOut.get()
+            with timer.phase('Read'):
+                points = group.SaOut.get()
 
         # Add points to curves
-        for col in range(colCount):
-            curves[col].addPoint(points[col])
+        curves[:, fbStep] = points
 
         process._incrementSteps(1)
 
@@ -437,71 +817,288 @@ def sq1FbSweep(*, group, bias, fbRange, process):
     return curves
 
 
-def sq1BiasSweep(group, process, rowIndex, doBiasRamp=True):
-    """Returns list of CurveData objects, corresponding to each column.
+def sq1BiasSweep(group, process, rowIndex, doBiasRamp=True, worker=None, biasRange=None, fbRange=None):
+    """Returns a CurveArray holding the curves of every column.
     Iterates through Sq1Bias values determined by
     lowoffset,highoffset,step,and gets curves by calling sq1FbSweep
+    The bias steps of each column are chosen by the BiasSearch set up by BiasSearchMode.
+    biasRange and fbRange are optional (columns, steps) arrays which replace
+    the ranges set by the Rogue variables, as used by warm start.
+    When a TuneWorker is passed the curves are analyzed in the worker
+    and may not be complete when this function returns.
     """
 
     # Extract iteration steps from Rogue variables
-    # Create CurveData obects for storing output data
     colCount = len(group.ColumnMap.get())
-    numBiasSteps = process.Sq1BiasNumSteps.get() if doBiasRamp else 1
-    numFbSteps = process.Sq1FbNumSteps.get()
-    biasRange = np.zeros((colCount, numBiasSteps), np.float64)
-    fbRange = np.zeros((colCount, numFbSteps), np.float64)
-    loadedBiases = None if doBiasRamp else np.asarray(group.Sq1BiasCurrent.get(), dtype=np.float64)[:, rowIndex]
 
-    datalist = []    
-    for col in range(colCount):
-        if doBiasRamp:
-            low = process.Sq1BiasLowOffset.get()
-            high = process.Sq1BiasHighOffset.get()
-            biasRange[col] = np.linspace(low, high, numBiasSteps, endpoint=True)
-        else:
-            # Retune at the SQ1 bias already loaded for this row.
-            biasRange[col, 0] = loadedBiases[col]
+    if biasRange is None:
+        numBiasSteps = process.Sq1BiasNumSteps.get() if doBiasRamp else 1
+        biasRange = np.zeros((colCount, numBiasSteps), np.float64)
+        loadedBiases = None if doBiasRamp else np.asarray(group.Sq1BiasCurrent.get(), dtype=np.float64)[:, rowIndex]
 
+        for col in range(colCount):
+            if doBiasRamp:
+                low = process.Sq1BiasLowOffset.get()
+                high = process.Sq1BiasHighOffset.get()
+                biasRange[col] = np.linspace(low, high, numBiasSteps, endpoint=True)
+            else:
+                # Retune at the SQ1 bias already loaded for this row.
+                biasRange[col, 0] = loadedBiases[col]
+
+    if fbRange is None:
+        numFbSteps = process.Sq1FbNumSteps.get()
         low = process.Sq1FbLowOffset.get()
         high = process.Sq1FbHighOffset.get()
-        fbRange[col] = np.linspace(low, high, numFbSteps, endpoint=True)
+        fbRange = np.repeat(np.linspace(low, high, numFbSteps, endpoint=True)[np.newaxis, :], colCount, axis=0)
+
+    numBiasSteps = biasRange.shape[1]
 
-        datalist.append(warm_tdm_api.CurveData(xValues=fbRange[col]))
+    # Create the CurveArray for storing output data
+    data = warm_tdm_api.CurveArray(xValues=fbRange, biasValues=biasRange)
+    colTuneEnable = group.ColTuneEnable.get()
 
+    # The bias search picks the bias step of each column, every column steps through all biases in Linear mode
+    search = warm_tdm_api.BiasSearch.create(process=process, numSteps=numBiasSteps, enable=colTuneEnable)
+    cols = np.arange(colCount)
+    bias = biasRange[:, 0].copy()
+    timer = warm_tdm_api.TuneTimer.get(process)
 
     # Iterate over each bias point
     for biasStep in range(numBiasSteps):
-        # Reset FB to zero
-        # This is probably unnecessary
-        group.Sq1FbForceCurrent.set(np.zeros(colCount, np.float64))
+        indices = search.next()
+        if indices is None:
+            break
+        active = indices >= 0
+
+        # Finished columns stay at their last bias
+        bias = np.where(active, biasRange[cols, np.maximum(indices, 0)], bias)
 
-        # Set SQ1 Bias
-        group.Sq1BiasForceCurrent.set(biasRange[:, biasStep])
+        with timer.phase('Write', count=2):
+            # Reset FB to zero
+            # This is probably unnecessary
+            group.Sq1FbForceCurrent.set(np.zeros(colCount, np.float64))
+
+            # Set SQ1 Bias
+            group.Sq1BiasForceCurrent.set(bias)
 
         # Sweep SQ1 FB at the bias
-        curves = sq1FbSweep(group=group, bias=biasRange[:, biasStep], fbRange=fbRange, process=process)
+        curves = sq1FbSweep(group=group, bias=bias, fbRange=fbRange, process=process)
 
         # Assign curves by column (if enabled for tuning)
-        for col in range(colCount):
-            if group.ColTuneEnable.get()[col]:
-                datalist[col].addCurve(curves[col])
+        data.setCurves(indices, curves, enable=active & np.array(colTuneEnable, bool))
+        search.report(curves.max(axis=1) - curves.min(axis=1))
+        if worker is not None:
+            worker.submit(_sq1AnalyzeStep, process=process, data=data, biasIndex=indices)
 
         # check for stopped process
         if process is not None and process._runEn == False:
             print('Process stopped, sq1BiasSweep()')
             break
 
+    if process is not None:
+        process.BiasSearchSteps.set(search.steps)
+
 
     # Compute best bias point for each column
-    for d in datalist:
-        d.update()
+    if worker is None:
+        with timer.phase('Analysis'):
+            data.update()
+
+    return data
+
+def _sq1AnalyzeStep(*, process, data, biasIndex):
+    """Analyze one SQ1 bias step"""
+    with warm_tdm_api.TuneTimer.get(process).phase('Analysis'):
+        data.update(biasIndex=biasIndex)
+
+def _readAccumErrors(dsps):
+    """Returns a (columns, rows) array of the AccumError RAM of every column DSP.
+    All reads are issued before waiting on any of them.
+    """
+    for dsp in dsps:
+        dsp.AccumError.get(read=True, check=False)
+
+    for dsp in dsps:
+        dsp.checkBlocks()
+
+    return np.array([dsp.AccumError.get(read=False) for dsp in dsps], np.float64)
+
+def sq1ParallelSweep(*, group, process, rows, doBiasRamp=True):
+    """Returns a dictionary of CurveArray objects indexed by row, tuning every row in rows at once.
+    The rows are left in the hardware readout sequence. For each bias and feedback step the per row
+    Sq1Bias and Sq1Fb values are written into the FastDac RAM of every column, and the response of
+    all rows is read back from the AdcDsp AccumError RAM in a single pass. The DSP PID loops are
+    disabled, so the curves are open loop SaOut vs Sq1Fb curves.
+    AccumError is mapped onto SaOut units with an affine calibration of each column, taken against
+    SaOut register reads (the average over all rows) at the lowest and highest points of each sweep.
+    """
+    colCount = len(group.ColumnMap.get())
+    colTuneEnable = group.ColTuneEnable.get()
+    numBiasSteps = process.Sq1BiasNumSteps.get() if doBiasRamp else 1
+    numFbSteps = process.Sq1FbNumSteps.get()
+    delay = process.ParallelSampleDelay.get()
+    rows = list(rows)
+
+    if len(rows) == 0:
+        return {}
 
-    return datalist
+    fbRange = np.repeat(np.linspace(process.Sq1FbLowOffset.get(), process.Sq1FbHighOffset.get(), numFbSteps, endpoint=True)[np.newaxis, :], colCount, axis=0)
 
-def sq1Tune(group, process, doBiasRamp=True):
+    # Per row bias values, columns x rows x steps
+    biasRange = np.zeros((colCount, len(rows), numBiasSteps), np.float64)
+    if doBiasRamp:
+        biasRange[:] = np.linspace(process.Sq1BiasLowOffset.get(), process.Sq1BiasHighOffset.get(), numBiasSteps, endpoint=True)
+    else:
+        # Retune at the SQ1 bias already loaded for each row.
+        biasRange[:, :, 0] = np.asarray(group.Sq1BiasCurrent.get(), np.float64)[:, rows]
+
+    data = {row: warm_tdm_api.CurveArray(xValues=fbRange, biasValues=biasRange[:, i]) for i, row in enumerate(rows)}
+
+    dsps = [group.HardwareGroup.ColumnBoard[m.board].DataPath.AdcDsp[m.channel] for m in group.config.columnMap]
+    pidEnables = [dsp.PidEnable.get() for dsp in dsps]
+
+    # The readout values are restored when done
+    sq1Bias = np.array(group.Sq1BiasCurrent.get(), np.float64)
+    sq1Fb = np.array(group.Sq1FbCurrent.get(), np.float64)
+    biasValues = sq1Bias.copy()
+    fbValues = sq1Fb.copy()
+
+    process.TotalSteps.set(numBiasSteps * numFbSteps)
+    timer = warm_tdm_api.TuneTimer.get(process)
+
+    def _sample():
+        with timer.phase('Settle'):
+            time.sleep(delay)
+        with timer.phase('Read', count=len(dsps)):
+            return _readAccumErrors(dsps)[:, rows]
+
+    try:
+        for dsp in dsps:
+            dsp.PidEnable.set(False)
+
+        for biasStep in range(numBiasSteps):
+            process.Message.set(f'Parallel Sq1Bias step {biasStep+1} out of {numBiasSteps}')
+
+            biasValues[:, rows] = biasRange[:, :, biasStep]
+            with timer.phase('Write'):
+                group.Sq1BiasCurrent.set(biasValues)
+
+            raw = np.zeros((colCount, len(rows), numFbSteps), np.float64)
+
+            for fbStep in range(numFbSteps):
+                fbValues[:, rows] = fbRange[:, fbStep, np.newaxis]
+                with timer.phase('Write'):
+                    group.Sq1FbCurrent.set(fbValues)
+                raw[:, :, fbStep] = _sample()
+
+                process._incrementSteps(1)
+                if process._runEn == False:
+                    break
+
+            # A partial sweep leaves unfilled points at 0, do not calibrate or store it
+            if fbStep < numFbSteps - 1:
+                print('Process stopped, sq1ParallelSweep()')
+                break
+
+            # Calibrate AccumError against SaOut at the lowest and highest row averaged points
+            mean = raw.mean(axis=1)
+            cols = np.arange(colCount)
+            ref = []
+            for fbStep in (mean.argmin(axis=1), mean.argmax(axis=1)):
+                fbValues[:, rows] = fbRange[cols, fbStep][:, np.newaxis]
+                with timer.phase('Write'):
+                    group.Sq1FbCurrent.set(fbValues)
+                samples = _sample().mean(axis=1)
+                with timer.phase('Read'):
+                    ref.append((samples, group.SaOut.get()))
+
+            (sLow, vLow), (sHigh, vHigh) = ref
+            span = sHigh - sLow
+            gain = np.divide(vHigh - vLow, span, out=np.zeros_like(span), where=span != 0)
+            offset = vLow - gain * sLow
+            curves = raw * gain[:, np.newaxis, np.newaxis] + offset[:, np.newaxis, np.newaxis]
+
+            for i, row in enumerate(rows):
+                data[row].setCurves(biasStep, curves[:, i], enable=colTuneEnable)
+
+            if process._runEn == False:
+                print('Process stopped, sq1ParallelSweep()')
+                break
+
+    finally:
+        group.Sq1BiasCurrent.set(sq1Bias)
+        group.Sq1FbCurrent.set(sq1Fb)
+        for dsp, en in zip(dsps, pidEnables):
+            dsp.PidEnable.set(en)
+
+    with timer.phase('Analysis'):
+        for results in data.values():
+            results.update()
+
+    return data
+
+def _sq1WarmStartSweep(*, group, process, rowIndex, cache):
+    """Runs sq1BiasSweep over narrowed windows around the cached operating points of a row.
+    Returns the CurveArray, or None if a column has no cached operating point or fails the quality check.
     """
-    Runs Sq1BiasSweep for each row, collecting CurveData objects.
+    colTuneEnable = np.array(group.ColTuneEnable.value(), bool)
+    cols = np.flatnonzero(colTuneEnable)
+    entries = cache.lookup(group, cols, row=rowIndex)
+
+    if len(cols) == 0 or entries is None:
+        _warmStartResult(process, f'Warm start - no cached SQ1 operating point for row {rowIndex}, running full sweep')
+        return None
+
+    allEntries = [None] * len(colTuneEnable)
+    for col, e in zip(cols, entries):
+        allEntries[col] = e
+
+    biasLow = process.Sq1BiasLowOffset.get()
+    biasHigh = process.Sq1BiasHighOffset.get()
+
+    biasRange, fbRange = warm_tdm_api.warmStartRanges(
+        entries=allEntries,
+        biasLow=biasLow,
+        biasHigh=biasHigh,
+        numBiasSteps=process.Sq1BiasNumSteps.get(),
+        fbLow=process.Sq1FbLowOffset.get(),
+        fbHigh=process.Sq1FbHighOffset.get(),
+        numFbSteps=process.Sq1FbNumSteps.get(),
+        biasWindow=process.WarmStartBiasWindow.get(),
+        fbPeriods=process.WarmStartFbPeriods.get())
+
+    # Analyzed in this thread, the results are needed for the quality check
+    results = sq1BiasSweep(group, process, rowIndex=rowIndex, biasRange=biasRange, fbRange=fbRange)
+
+    # A stopped tune is returned as is
+    if process._runEn == False:
+        return results
+
+    ok = warm_tdm_api.warmStartCheck(
+        results=results,
+        entries=entries,
+        cols=cols,
+        biasLow=biasLow,
+        biasHigh=biasHigh,
+        minPeak=process.WarmStartMinPeak.get(),
+        phi0Tolerance=process.WarmStartPhi0Tolerance.get())
+
+    if np.all(ok):
+        _warmStartResult(process, f'Warm start accepted for row {rowIndex}')
+        return results
+
+    _warmStartResult(process, f'Warm start failed quality check for row {rowIndex} columns {list(cols[~ok])}, running full sweep')
+    return None
+
+def sq1Tune(group, process, doBiasRamp=True, journal=None, cache=None):
+    """
+    Runs Sq1BiasSweep for each row, collecting CurveArray objects.
     During this loop, sets the resulting Sq1Bias and Sq1Fb values
+    Each completed row is recorded in the TuneJournal if one is passed,
+    rows already in the journal are restored instead of swept.
+    When a TuneCache is passed the operating points are stored in it, and rows
+    are first tuned around their cached operating points if WarmStart is set.
+    With ParallelRows set, all rows are swept at once by sq1ParallelSweep.
 
     Args
     ----
@@ -509,7 +1106,7 @@ def sq1Tune(group, process, doBiasRamp=True):
     Returns
     ----
     list
-        list of list of CurveData objects 
+        list of CurveArray objects, one per row
     """
     outputs = []
     numRows = group.NumRows.get()
@@ -519,36 +1116,112 @@ def sq1Tune(group, process, doBiasRamp=True):
     numColumns = group.NumColumns.get()
 
     numBiasSteps = process.Sq1BiasNumSteps.get() if doBiasRamp else 1
-    totalSteps = numEnabledRows * numBiasSteps * process.Sq1FbNumSteps.get()
+    stepsPerRow = numBiasSteps * process.Sq1FbNumSteps.get()
+    totalSteps = numEnabledRows * stepsPerRow
     process.TotalSteps.set(totalSteps)
 
+    # Rows already completed in the checkpoint journal
+    done = {} if journal is None else journal.completed('sq1Row', 'rowIndex')
+
     #group.RowForceEn.set(True)
     saOffset(group=group)
-    
-    for rowIndex in rowTuneList:
-        #Activate the row
-        group.ActivateRowIndex(rowIndex)
-
-        # Run the sq1 bias sweep
-        print(f'sq1BiasSweep({rowIndex=})')        
-        results = sq1BiasSweep(group, process, rowIndex=rowIndex, doBiasRamp=doBiasRamp)
-        for i, r in enumerate(results):
-            print(f'Results col {i}')
-            print(f'bias - {r.biasOut}, xOut - {r.xOut}, yOut - {r.yOut}')
-            
-        outputs.append(results)
-        
-#         for col in range(numColumns):
-#             if colTuneEnable[col]:
-#                 print(f'Seeting results for column {col}')
-#                 group.Sq1BiasCurrent.set(index=(col, rowIndex), value=results[col].biasOut)
-#                 group.Sq1FbCurrent.set(index=(col, rowIndex), value=results[col].xOut)
-#                 group.SaFbCurrent.set(index=(col, rowIndex), value=results[col].yOut)
 
-        group.DeactivateRowIndex(rowIndex)
+    # Curve analysis and result publication run in a background worker
+    # while the next bias step and row are acquired
+    published = []
+    tunedRows = []
+    warmStart = cache is not None and doBiasRamp and process.WarmStart.get()
+
+    # Parallel mode sweeps all remaining rows at once, the row loop then only publishes them
+    parallel = None
+    if process.ParallelRows.get():
+        parallel = sq1ParallelSweep(group=group, process=process, rows=[r for r in rowTuneList if r not in done], doBiasRamp=doBiasRamp)
+
+    with warm_tdm_api.TuneWorker(process=process) as worker:
+        for rowIndex in rowTuneList:
+            if rowIndex in done:
+                results = warm_tdm_api.CurveArray.fromRecord(done[rowIndex])
+                worker.submit(_sq1PublishRow, process=process, published=published, results=results)
+                outputs.append(results)
+                tunedRows.append(rowIndex)
+                if parallel is None:
+                    process._incrementSteps(stepsPerRow)
+                continue
+
+            if parallel is not None:
+                results = parallel[rowIndex]
+            else:
+                #Activate the row
+                with warm_tdm_api.TuneTimer.get(process).phase('Write'):
+                    group.ActivateRowIndex(rowIndex)
+
+                # Run the sq1 bias sweep
+                print(f'sq1BiasSweep({rowIndex=})')        
+                results = None
+                if warmStart:
+                    results = _sq1WarmStartSweep(group=group, process=process, rowIndex=rowIndex, cache=cache)
+                if results is None:
+                    results = sq1BiasSweep(group, process, rowIndex=rowIndex, doBiasRamp=doBiasRamp, worker=worker)
+
+            # Only completed rows are checkpointed, the checkpoint is written even if the process stops
+            if journal is not None and process._runEn:
+                worker.submitRequired(_sq1PublishRow, process=process, published=published, results=results,
+                                      journal=journal, rowIndex=rowIndex)
+            else:
+                worker.submit(_sq1PublishRow, process=process, published=published, results=results)
+
+            outputs.append(results)
+            tunedRows.append(rowIndex)
+        
+#             for col in range(numColumns):
+#                 if colTuneEnable[col]:
+#                     print(f'Seeting results for column {col}')
+#                     group.Sq1BiasCurrent.set(index=(col, rowIndex), value=results[col].biasOut)
+#                     group.Sq1FbCurrent.set(index=(col, rowIndex), value=results[col].xOut)
+#                     group.SaFbCurrent.set(index=(col, rowIndex), value=results[col].yOut)
+
+            if parallel is None:
+                with warm_tdm_api.TuneTimer.get(process).phase('Write'):
+                    group.DeactivateRowIndex(rowIndex)
+
+                # check for stopped process
+                if process is not None and process._runEn == False:
+                    print('Process stopped, sq1Tune()')
+                    break
+
+    # Analyze any rows skipped by a stopped worker
+    if worker.skipped:
+        with warm_tdm_api.TuneTimer.get(process).phase('Analysis'):
+            for results in outputs:
+                results.update()
+
+    # Only completed tunes are cached
+    if cache is not None and process._runEn:
+        for rowIndex, results in zip(tunedRows, outputs):
+            cache.update(group, results, colTuneEnable, row=rowIndex)
+        cache.save()
 
     return outputs
 
+def _sq1PublishRow(*, process, published, results, journal=None, rowIndex=None):
+    """Print the results of a completed row and publish the partial tune output.
+    The row is also recorded in the checkpoint journal if one is passed.
+    """
+    if journal is not None:
+        # Bias steps dropped by a stopped worker still need to be analyzed
+        if not np.all(results.analyzed):
+            with warm_tdm_api.TuneTimer.get(process).phase('Analysis'):
+                results.update()
+        journal.append(type='sq1Row', rowIndex=rowIndex, **results.asRecord())
+
+    for i, r in enumerate(results):
+        print(f'Results col {i}')
+        print(f'bias - {r.biasOut}, xOut - {r.xOut}, yOut - {r.yOut}')
+
+    published.append(results.asDicts())
+    if process is not None:
+        process.Sq1TuneOutput.set(value=list(published))
+
 
 
 #SQ1 DIAGNOSTIC -output vs sq1 feedback for every row  for every column
@@ -8,6 +8,15 @@ from ._SaTune import *
 from ._Sq1Diag import *
 from ._Sq1Tune import *
 from ._TesRamp import *
+from ._ArrayPid import *
+from ._SaFbServoModel import *
+from ._StreamSampler import *
+from ._SettleDetector import *
+from ._TuneWorker import *
+from ._TuneJournal import *
+from ._TuneCache import *
+from ._BiasSearch import *
+from ._TuneTiming import *
 from ._Tuning import *
 from ._ConfigSelect import *
 from ._SaStripChart import *
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# Converts rogue StreamWriter data files to columnar HDF5 or Zarr.
+#
+# Example:
+#    python DataExport.py run.dat run.h5
+#    python DataExport.py run.dat run.zarr --chunkSize 8192
+import argparse
+import sys
+
+import pyrogue
+
+pyrogue.addLibraryPath(f'../python/')
+pyrogue.addLibraryPath(f'../../firmware/python/')
+pyrogue.addLibraryPath(f'../../firmware/submodules/surf/python')
+
+import warm_tdm
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Export a Warm-TDM data file to HDF5 or Zarr')
+    parser.add_argument('dataFile', type=str, help='rogue StreamWriter data file')
+    parser.add_argument('outFile', type=str, help='Output path, paths ending in .zarr are written as Zarr')
+    parser.add_argument('--format', type=str, choices=['hdf5', 'zarr'], default=None, help='Output format, default from the output path')
+    parser.add_argument('--chunkSize', type=int, default=4096, help='Readouts and PID debug entries per chunk')
+    args = parser.parse_args(args)
+
+    warm_tdm.export_data_file(args.dataFile, args.outFile, fmt=args.format, chunkSize=args.chunkSize)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,9 +1,7 @@
 import sys
-from collections import defaultdict
 
+import numpy as np
 import pyrogue
-import rogue.utilities
-import rogue.utilities.fileio
 
 pyrogue.addLibraryPath(f'../python/')
 pyrogue.addLibraryPath(f'../../firmware/python/')
@@ -12,23 +10,33 @@ pyrogue.addLibraryPath(f'../../firmware/submodules/surf/python')
 import warm_tdm_api
 import warm_tdm
 
-nesteddict = lambda:defaultdict(nesteddict)
-
-datadict = nesteddict()
 def main(args):
-    with pyrogue.utilities.fileio.FileReader(files=args) as fd:
-
-        for header, data in fd.records():
-            if header.channel == 9:
-                dr = warm_tdm.DataReadout.from_numpy(data)
-                for s in dr.samples:
-                    #print(s)
-                    if not datadict[s.col][s.row]:
-                        datadict[s.col][s.row] = []
+    """Returns a ReadoutArrays with the channel 9 DataReadout frames of the data files"""
+    batches = []
+    for path in args:
+        # The record index is built on the first open and reused afterwards
+        with warm_tdm.DataFile(path) as f:
+            batches.append(f.readouts())
+
+    rows = max((b.values.shape[1] for b in batches), default=0)
+    cols = max((b.values.shape[2] for b in batches), default=0)
+    values = np.full((sum(len(b) for b in batches), rows, cols), np.nan, np.float32)
+
+    start = 0
+    for b in batches:
+        values[start:start+len(b), :b.values.shape[1], :b.values.shape[2]] = b.values
+        start += len(b)
+
+    # values has shape (readouts, rows, cols)
+    readouts = warm_tdm.ReadoutArrays(
+        readoutCount = np.concatenate([b.readoutCount for b in batches] or [np.zeros(0, np.uint64)]),
+        rowSeqCount = np.concatenate([b.rowSeqCount for b in batches] or [np.zeros(0, np.uint64)]),
+        runTime = np.concatenate([b.runTime for b in batches] or [np.zeros(0, np.uint64)]),
+        values = values)
+    print(f'Read {len(readouts)} readouts, {readouts.values.shape[1]} rows, {readouts.values.shape[2]} cols')
+    return readouts
 
-                    datadict[s.col][s.row].append(s.value)
-                
 
 if __name__ == '__main__':
-    main(sys.argv)
+    main(sys.argv[1:])
         
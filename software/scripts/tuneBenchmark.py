@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+##############################################################################
+## This file is part of 'warm-tdm'.
+## It is subject to the license terms in the LICENSE.txt file found in the
+## top-level directory of this distribution and at:
+##    https://confluence.slac.stanford.edu/display/ppareg/LICENSE.html.
+## No part of 'warm-tdm', including this file,
+## may be copied, modified, propagated, or distributed except according to
+## the terms contained in the LICENSE.txt file.
+##############################################################################
+# Runs the tuning processes against an emulated group and prints where the time goes.
+#
+# The column boards are backed by the SquidEmulate SQUID model, so the tunes see
+# realistic curves. Each tune is run through its Process, and the time breakdown
+# is taken from the process TuneTimer along with the memory transaction counts of
+# the emulated column boards.
+#
+# Example:
+#    python tuneBenchmark.py --columnBoards 2 --columns 16 --rows 4 --saFbSteps 50
+import json
+import time
+
+import pyrogue
+
+pyrogue.addLibraryPath(f'../python/')
+pyrogue.addLibraryPath(f'../../firmware/python/')
+pyrogue.addLibraryPath(f'../../firmware/submodules/surf/python')
+
+import warm_tdm_api
+
+TUNES = {
+    'saOffset': 'SaOffsetProcess',
+    'saTune': 'SaTuneProcess',
+    'sq1Tune': 'Sq1TuneProcess',
+    'fasTune': 'FasTuneProcess'}
+
+parser = warm_tdm_api.WarmTdmArgparse()
+
+parser.add_argument(
+    "--tunes",
+    nargs = '+',
+    choices = list(TUNES.keys()),
+    default = list(TUNES.keys()),
+    help = "Tunes to run, in order")
+
+parser.add_argument(
+    "--columns",
+    type = int,
+    default = None,
+    help = "Number of columns enabled for tuning, default is all columns")
+
+parser.add_argument(
+    "--rows",
+    type = int,
+    default = 1,
+    help = "Number of rows tuned by sq1Tune")
+
+parser.add_argument("--saFbSteps", type=int, default=None)
+parser.add_argument("--saBiasSteps", type=int, default=None)
+parser.add_argument("--sq1FbSteps", type=int, default=None)
+parser.add_argument("--sq1BiasSteps", type=int, default=None)
+parser.add_argument("--fasSteps", type=int, default=None)
+
+parser.add_argument(
+    "--repeat",
+    type = int,
+    default = 1,
+    help = "Number of runs of each tune")
+
+parser.add_argument(
+    "--output",
+    type = str,
+    default = '',
+    help = "Optional JSON file for the results")
+
+args = parser.parse_known_args()[0]
+args.emulate = True
+args.sim = False
+
+arg_dict = warm_tdm_api.arg_dict(args)
+
+def runTune(root, process):
+    emulators = root.Group.HardwareGroup.squidEmulators
+    for emu in emulators:
+        emu.resetCounts()
+
+    process.Start()
+    time.sleep(0.1)
+    while process.Running.value():
+        time.sleep(0.1)
+
+    ret = warm_tdm_api.TuneTimer.get(process).summary()
+    ret['MemReads'] = sum(emu.reads for emu in emulators)
+    ret['MemWrites'] = sum(emu.writes for emu in emulators)
+    steps = max(ret['Steps'], 1)
+    ret['MemTransactionsPerStep'] = (ret['MemReads'] + ret['MemWrites']) / steps
+    return ret
+
+def printResult(name, run, r):
+    phases = ' '.join(f'{p}={r[p]:8.3f}s' for p in warm_tdm_api.TuneTimer.PHASES + ('Other', 'Total'))
+    print(f'{name:<9} run {run}: {phases}')
+    print(f'{"":<16}steps={r["Steps"]} writes={r["Writes"]} reads={r["Reads"]} '
+          f'accesses/step={r["AccessesPerStep"]:0.2f} '
+          f'memWrites={r["MemWrites"]} memReads={r["MemReads"]} '
+          f'transactions/step={r["MemTransactionsPerStep"]:0.2f}')
+
+with warm_tdm_api.GroupRoot(**arg_dict) as root:
+    group = root.Group
+
+    if args.columns is not None:
+        group.ColTuneEnable.set([i < args.columns for i in range(len(group.config.columnMap))])
+
+    group.RowIndexOrderList.set(list(range(args.rows)))
+
+    settings = [
+        (args.saFbSteps, group.SaTuneProcess.SaFbNumSteps),
+        (args.saBiasSteps, group.SaTuneProcess.SaBiasNumSteps),
+        (args.sq1FbSteps, group.Sq1TuneProcess.Sq1FbNumSteps),
+        (args.sq1BiasSteps, group.Sq1TuneProcess.Sq1BiasNumSteps),
+        (args.fasSteps, group.FasTuneProcess.FasFluxNumSteps)]
+
+    for value, var in settings:
+        if value is not None:
+            var.set(value)
+
+    results = {}
+    for name in args.tunes:
+        process = group.node(TUNES[name])
+        results[name] = []
+        for run in range(args.repeat):
+            r = runTune(root, process)
+            results[name].append(r)
+            printResult(name, run, r)
+
+    if args.output != '':
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=1, default=str)